@@ -0,0 +1,337 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import Config
+from app.database import db, AsyncDatabase
+from app.esaj_http import AsyncEsajHttpClient, BrowserRequired, engine_for, search_field
+from app.names import NameSearch
+from app.notifier import PesquisaListener, SweepSchedule
+from app.planner import FILTROS
+from app.metrics import STAGE_SECONDS, LOOKUPS, NAME_PAGES
+from app.events import events
+from app.tracing import tracer
+
+
+class AsyncPipeline:
+    """
+    Modo de execução asyncio do SPVAutomatico. Cada ciclo atende todos os
+    filtros em quatro estágios ligados por filas limitadas:
+
+        reserva (banco) -> consulta (eSAJ) -> classificação -> gravação (banco)
+
+    Cada estágio tem sua própria concorrência. As consultas HTTP não bloqueiam
+    o event loop: rodam no cliente urllib3 do modo síncrono, em um executor
+    do tamanho da concorrência de consultas; o fallback para o Selenoid usa
+    threads à parte, limitado ao tamanho do pool de sessões. A classificação
+    e a compressão das páginas rodam em um executor do tamanho da
+    concorrência de classificação. Documentos já em cache não vão ao eSAJ e
+    consultas simultâneas do mesmo documento são feitas uma única vez.
+    """
+
+    _STOP = object()
+
+    def __init__(self, spv, fetch_batch=None, lookup_concurrency=None,
+                 classify_concurrency=None, persist_concurrency=None):
+        self.spv = spv
+        self.fetch_batch = fetch_batch or Config.ASYNC_FETCH_BATCH
+        self.lookup_concurrency = lookup_concurrency or Config.ASYNC_LOOKUP_CONCURRENCY
+        self.classify_concurrency = classify_concurrency or Config.ASYNC_CLASSIFY_CONCURRENCY
+        self.persist_concurrency = persist_concurrency or Config.ASYNC_PERSIST_CONCURRENCY
+
+        self.adb = AsyncDatabase(db)
+        self.http = None
+        self._browser_executor = ThreadPoolExecutor(
+            max_workers=spv.browser_pool.size,
+            thread_name_prefix="spv-browser"
+        )
+        # Classificação e compressão das páginas (CPU) fora do event loop
+        self._classify_executor = ThreadPoolExecutor(
+            max_workers=self.classify_concurrency,
+            thread_name_prefix="spv-classify"
+        )
+        self._browser_slots = None
+        self._inflight = {}
+
+    async def _lookup(self, search_filter, document):
+        """Consulta o eSAJ, com fallback para o Selenoid quando necessário."""
+        if engine_for(search_filter) == 'http':
+            try:
+                with STAGE_SECONDS.time(stage='lookup_http'):
+                    async with self.spv.http_limiter.slot_async():
+                        page = await self.http.search(search_filter, document)
+                LOOKUPS.inc(engine='http', outcome='ok')
+                return page
+            except BrowserRequired as br:
+                LOOKUPS.inc(engine='http', outcome='browser_required')
+                events.warning('http_navegador', "Consulta HTTP exige navegador. Usando Selenoid.", motivo=str(br))
+            except Exception as e:
+                LOOKUPS.inc(engine='http', outcome='error')
+                events.warning('http_erro', "Erro na consulta HTTP ao eSAJ. Usando Selenoid.", erro=str(e))
+
+        async with self._browser_slots:
+            loop = asyncio.get_running_loop()
+            # A thread do navegador registra eventos com a correlação da consulta
+            return await loop.run_in_executor(
+                self._browser_executor, contextvars.copy_context().run,
+                self.spv._load_site_browser, search_filter, document
+            )
+
+    async def _next_page(self, search_filter, href):
+        """Outra página da lista de resultados, com fallback para o Selenoid como em `_lookup`."""
+        if engine_for(search_filter) == 'http':
+            try:
+                with STAGE_SECONDS.time(stage='lookup_http'):
+                    async with self.spv.http_limiter.slot_async():
+                        page = await self.http.get_page(href)
+                LOOKUPS.inc(engine='http', outcome='ok')
+                return page
+            except BrowserRequired as br:
+                LOOKUPS.inc(engine='http', outcome='browser_required')
+                events.warning('http_navegador', "Página de resultado exige navegador. Usando Selenoid.",
+                               motivo=str(br), pagina=href)
+            except Exception as e:
+                LOOKUPS.inc(engine='http', outcome='error')
+                events.warning('http_erro', "Erro ao obter página de resultado do eSAJ. Usando Selenoid.",
+                               erro=str(e), pagina=href)
+
+        async with self._browser_slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._browser_executor, contextvars.copy_context().run,
+                self.spv._load_next_page_browser, search_filter, href
+            )
+
+    async def _read_name_pages(self, consulta, site_content):
+        """Equivalente assíncrono de SPVAutomatico._read_name_pages()."""
+        search = NameSearch(consulta.document, consulta.pessoas)
+        href = search.feed(site_content)
+        while href:
+            page = await self._next_page(consulta.search_filter, href)
+            href = search.feed(self.spv._checked_page(page, consulta.search_filter, consulta.document))
+        NAME_PAGES.inc(len(search.pages), fim=search.stop)
+        return search
+
+    async def _fetch_stage(self, lookup_queue, cod_pesquisas=None):
+        total = 0
+        while True:
+            qry = await self.adb.run(self.spv._get_pesquisas, self.fetch_batch, FILTROS, cod_pesquisas)
+            if not qry:
+                return total
+            total += len(qry)
+            consultas = await self.adb.run(self.spv._plan_page, qry)
+            for consulta in consultas:
+                await lookup_queue.put(consulta)
+
+    async def _lookup_coalesced(self, consulta):
+        """
+        Consulta o eSAJ, liberada pelo circuit breaker, uma única vez por chave
+        entre as tarefas em andamento; nas consultas por nome, lê as páginas
+        da lista até o resultado estar decidido e só é compartilhada entre
+        consultas das mesmas pessoas. LookupFailed se não houver página
+        utilizável.
+        """
+        key, search_filter, document = consulta.key, consulta.search_filter, consulta.document
+        if search_field(search_filter) == 'NMPARTE':
+            key = (key, tuple(consulta.pessoas))
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            async with self.spv.breaker.guard_async():
+                page = self.spv._checked_page(await self._lookup(search_filter, document), search_filter, document)
+                if search_field(search_filter) == 'NMPARTE':
+                    page = await self._read_name_pages(consulta, page)
+            future.set_result(page)
+            return page
+        except BaseException as e:
+            future.set_exception(e)
+            # Evita o aviso de exceção não recuperada quando ninguém aguardava
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _context(self, consulta, worker_id):
+        """Campos de correlação dos eventos de uma consulta (como em SPVAutomatico._process_consulta)."""
+        return events.context(cod_pesquisa=[cod for cod, _ in consulta.targets],
+                              filtro=consulta.search_filter, worker=worker_id)
+
+    async def _lookup_stage(self, lookup_queue, classify_queue, worker_id):
+        while True:
+            consulta = await lookup_queue.get()
+            if consulta is self._STOP:
+                return
+            site_content = None
+            cached = None
+            error = None
+            started = time.monotonic()
+            # O trace da consulta segue até a classificação, em outra tarefa
+            trace = tracer.start('pesquisa', cod_pesquisa=[cod for cod, _ in consulta.targets],
+                                 filtro=consulta.search_filter, worker=worker_id)
+            with self._context(consulta, worker_id), tracer.attach(trace):
+                try:
+                    cached = await self.adb.run(self.spv.result_cache.get, consulta.key)
+                    if cached is None:
+                        site_content = await self._lookup_coalesced(consulta)
+                except Exception as e:
+                    events.warning('consulta_reagendada', "Erro na consulta; consulta reagendada.",
+                                   erro=str(e), duracao_s=round(time.monotonic() - started, 4))
+                    error = e
+            await classify_queue.put((consulta, site_content, cached, error, worker_id, started, trace))
+
+    async def _classify(self, consulta, site_content):
+        """SPVAutomatico._classify_targets() no executor de classificação, com o contexto da tarefa."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._classify_executor, contextvars.copy_context().run,
+            self.spv._classify_targets, consulta, site_content
+        )
+
+    async def _classify_stage(self, classify_queue, persist_queue):
+        while True:
+            item = await classify_queue.get()
+            if item is self._STOP:
+                return
+            consulta, site_content, cached, error, worker_id, started, trace = item
+            if error is not None:
+                tracer.finish(trace)
+                await persist_queue.put((consulta, None, error))
+                continue
+            with self._context(consulta, worker_id), tracer.attach(trace):
+                try:
+                    if cached is not None:
+                        resultados = [(cached, None, None)] * len(consulta.targets)
+                    elif site_content:
+                        resultados = await self._classify(consulta, site_content)
+                        await self.adb.run(self.spv.result_cache.put, consulta.key, resultados[0][0])
+                    else:
+                        resultados = [(7, None, None)] * len(consulta.targets)
+                except Exception as e:
+                    # Como no modo síncrono: as linhas voltam para a fila em vez de ficarem reservadas
+                    events.warning('consulta_reagendada', "Erro na classificação; consulta reagendada.",
+                                   erro=str(e), duracao_s=round(time.monotonic() - started, 4))
+                    tracer.finish(trace)
+                    await persist_queue.put((consulta, None, e))
+                    continue
+                tracer.finish(trace)
+                events.info('consulta', "Consulta concluída.", sample=Config.LOG_SAMPLE_RATE,
+                            duracao_s=round(time.monotonic() - started, 4),
+                            **self.spv._consulta_fields(resultados))
+            await persist_queue.put((consulta, resultados, None))
+
+    async def _persist_stage(self, persist_queue):
+        while True:
+            item = await persist_queue.get()
+            if item is self._STOP:
+                return
+            consulta, resultados, error = item
+            if error is not None:
+                for codPesquisa, search_filter in consulta.targets:
+                    await self.adb.run(self.spv._retry_spv_result, codPesquisa, search_filter, error)
+                continue
+            for (codPesquisa, search_filter), (result_code, processos, pagina) in zip(consulta.targets, resultados):
+                await self.adb.run(
+                    self.spv._insert_spv_result, codPesquisa, result_code, search_filter, processos, pagina
+                )
+
+    async def _stop_stage(self, queue, tasks):
+        for _ in tasks:
+            await queue.put(self._STOP)
+        await asyncio.gather(*tasks)
+
+    async def process_cycle(self, cod_pesquisas=None):
+        """
+        Processa pelo pipeline todas as pesquisas pendentes, em todos os
+        filtros, ou só as pesquisas de `cod_pesquisas`.
+        """
+        lookup_queue = asyncio.Queue(maxsize=self.lookup_concurrency * 2)
+        classify_queue = asyncio.Queue(maxsize=self.classify_concurrency * 2)
+        persist_queue = asyncio.Queue(maxsize=self.persist_concurrency * 2)
+
+        lookups = [asyncio.create_task(self._lookup_stage(lookup_queue, classify_queue, i))
+                   for i in range(self.lookup_concurrency)]
+        classifiers = [asyncio.create_task(self._classify_stage(classify_queue, persist_queue))
+                       for _ in range(self.classify_concurrency)]
+        persisters = [asyncio.create_task(self._persist_stage(persist_queue))
+                      for _ in range(self.persist_concurrency)]
+
+        started = time.monotonic()
+        try:
+            total = await self._fetch_stage(lookup_queue, cod_pesquisas)
+            await self._stop_stage(lookup_queue, lookups)
+            await self._stop_stage(classify_queue, classifiers)
+            await self._stop_stage(persist_queue, persisters)
+        except BaseException:
+            for task in lookups + classifiers + persisters:
+                task.cancel()
+            raise
+
+        self.spv.cycle_summary(total, time.monotonic() - started)
+        return total
+
+    async def _run_poll(self):
+        while True:
+            events.info('ciclo_inicio', "Iniciando processamento assíncrono das pesquisas pendentes.", motivo='varredura')
+            await self.process_cycle()
+
+            events.info('ciclo_espera', "Todos os filtros foram processados. Aguardando para reiniciar o ciclo.")
+            await asyncio.sleep(Config.CYCLE_SLEEP_SECONDS)
+
+    async def _run_notify(self):
+        """Equivalente assíncrono de SPVAutomatico._run_notify()."""
+        listener = PesquisaListener(db)
+        schedule = SweepSchedule()
+        await self.adb.run(listener.start)
+        try:
+            while True:
+                if schedule.sweep_due():
+                    events.info('ciclo_inicio', "Iniciando varredura assíncrona completa das pesquisas pendentes.",
+                                motivo='varredura')
+                    await self.process_cycle()
+                    schedule.swept()
+
+                retry_in = await self.adb.run(self.spv._next_retry_in)
+                if retry_in == 0:
+                    events.info('ciclo_inicio', "Iniciando as retentativas agendadas.", motivo='retentativas')
+                    schedule.retried(await self.process_cycle())
+                timeout = schedule.timeout()
+                if retry_in is not None:
+                    timeout = min(timeout, schedule.retry_timeout(retry_in))
+
+                ids = schedule.notified(await listener.wait_async(timeout))
+                if ids:
+                    events.info('ciclo_inicio', "Pesquisas notificadas. Iniciando processamento assíncrono.",
+                                motivo='notificacao', pesquisas=len(ids))
+                    await self.process_cycle(ids)
+                    await self.adb.run(self.spv.result_writer.flush)
+        finally:
+            listener.close()
+
+    async def open(self):
+        """Cria os recursos ligados ao event loop (cliente HTTP e vagas do Selenoid)."""
+        self.http = AsyncEsajHttpClient(pool_size=self.lookup_concurrency)
+        self._browser_slots = asyncio.Semaphore(self.spv.browser_pool.size)
+        self.spv.http_limiter.set_maximum(self.lookup_concurrency)
+
+    async def close(self):
+        await self.http.close()
+        self._browser_executor.shutdown(wait=False)
+        self._classify_executor.shutdown(wait=False)
+        self.adb.close()
+        self.spv.close()
+
+    async def run(self):
+        """Equivalente assíncrono de SPVAutomatico.run()."""
+        await self.open()
+        try:
+            if Config.SPV_SCHEDULE_MODE == 'notify':
+                await self._run_notify()
+            else:
+                await self._run_poll()
+        finally:
+            await self.close()
@@ -0,0 +1,194 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from app.config import Config
+from app.events import events
+from app.tracing import span
+
+
+class BrowserSession:
+    """Sessão remota do Selenoid mantida aquecida pelo pool."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.monotonic()
+
+
+class BrowserPool:
+    """
+    Mantém até `size` sessões `webdriver.Remote` abertas e as reutiliza entre
+    pesquisas. Entre um uso e outro a sessão é limpa (cookies e navegação de
+    volta para a página inicial do eSAJ); sessões que não respondem são
+    substituídas e sessões com `max_uses` usos são recicladas.
+    """
+
+    def __init__(self, factory, size=None, max_uses=None, start_url=None, acquire_timeout=None):
+        self.factory = factory
+        self.size = size or Config.SELENOID_POOL_SIZE
+        self.max_uses = max_uses or Config.SELENOID_SESSION_MAX_USES
+        self.start_url = start_url or Config.ESAJ_OPEN_URL
+        self.acquire_timeout = acquire_timeout or Config.SELENOID_ACQUIRE_TIMEOUT
+
+        self._idle = []
+        self._total = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _create_session(self):
+        driver = self.factory()
+        try:
+            driver.get(self.start_url)
+        except Exception:
+            self._quit(driver)
+            raise
+        return BrowserSession(driver)
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            events.warning('sessao_erro', "Erro ao encerrar sessão do Selenoid.", erro=str(e))
+
+    def _is_alive(self, session):
+        """Health-check barato: uma ida e volta ao Selenoid."""
+        try:
+            session.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, session):
+        self._quit(session.driver)
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def acquire(self):
+        """
+        Retorna uma sessão pronta para uso, criando uma nova se o pool ainda
+        não atingiu o tamanho máximo. Bloqueia até `acquire_timeout` segundos
+        quando todas as sessões estão em uso.
+        """
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Pool de sessões do Selenoid já foi encerrado.")
+                session = None
+                if self._idle:
+                    session = self._idle.pop()
+                elif self._total < self.size:
+                    self._total += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Nenhuma sessão do Selenoid disponível no pool.")
+                    self._cond.wait(remaining)
+                    continue
+
+            if session is None:
+                try:
+                    return self._create_session()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+
+            if self._is_alive(session):
+                return session
+
+            events.warning('sessao_substituida', "Sessão do Selenoid não respondeu ao health-check. Substituindo...")
+            self._discard(session)
+
+    def release(self, session, discard=False):
+        """
+        Devolve a sessão ao pool. Sessões com erro ou que atingiram o limite
+        de usos são encerradas; as demais são limpas para a próxima pesquisa.
+        """
+        session.uses += 1
+        if discard or self._closed or session.uses >= self.max_uses:
+            self._discard(session)
+            return
+
+        try:
+            session.driver.delete_all_cookies()
+            session.driver.get(self.start_url)
+        except Exception as e:
+            events.warning('sessao_descartada', "Falha ao limpar sessão do Selenoid, descartando.", erro=str(e))
+            self._discard(session)
+            return
+
+        with self._cond:
+            self._idle.append(session)
+            self._cond.notify()
+
+    @contextmanager
+    def session(self):
+        """
+        Empresta um driver do pool. A sessão volta ao pool mesmo em caso de
+        erro; se ela não sobreviver à limpeza, é descartada em `release`.
+        """
+        with span('session_acquire'):
+            session = self.acquire()
+        try:
+            yield session.driver
+        finally:
+            self.release(session)
+
+    def warm_up(self, count=None):
+        """
+        Cria em paralelo até `count` sessões (padrão: o tamanho do pool), já
+        na página inicial do eSAJ, e as deixa ociosas no pool. Falhas só
+        reduzem o aquecimento: as sessões que faltarem são criadas sob demanda.
+        Retorna quantas sessões foram criadas.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Pool de sessões do Selenoid já foi encerrado.")
+            wanted = min(count or self.size, self.size) - len(self._idle)
+            count = max(0, min(wanted, self.size - self._total))
+            self._total += count
+        if not count:
+            return 0
+
+        created = 0
+        with ThreadPoolExecutor(max_workers=count, thread_name_prefix="spv-browser-warmup") as executor:
+            futures = [executor.submit(self._create_session) for _ in range(count)]
+            for future in futures:
+                try:
+                    session = future.result()
+                except Exception as e:
+                    events.warning('sessao_erro', "Erro ao aquecer sessão do Selenoid.", erro=str(e))
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    continue
+                with self._cond:
+                    closed = self._closed
+                    if not closed:
+                        self._idle.append(session)
+                        self._cond.notify()
+                if closed:
+                    self._discard(session)
+                    continue
+                created += 1
+        return created
+
+    def open_sessions(self):
+        """Sessões abertas no Selenoid por este pool (em uso ou ociosas)."""
+        with self._cond:
+            return self._total
+
+    def close(self):
+        """Encerra todas as sessões ociosas e impede novos empréstimos."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for session in idle:
+            self._quit(session.driver)
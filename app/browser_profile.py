@@ -0,0 +1,123 @@
+from selenium import webdriver
+
+from app.config import Config
+from app.events import events
+
+# Padrões de URL (sintaxe do Network.setBlockedURLs do Chrome) por tipo de recurso
+RESOURCE_PATTERNS = {
+    'images': ('*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.svg*', '*.ico*', '*.webp*'),
+    'fonts': ('*.woff*', '*.ttf*', '*.otf*', '*.eot*'),
+    'stylesheets': ('*.css*',),
+}
+
+# Analytics e afins carregados pelas páginas do eSAJ
+DEFAULT_BLOCKED_URLS = (
+    '*google-analytics.com*',
+    '*googletagmanager.com*',
+    '*doubleclick.net*',
+    '*hotjar.com*',
+)
+
+
+class BrowserProfile:
+    """
+    Configuração das sessões do Chrome no Selenoid: estratégia de carga da
+    página (`normal` espera o evento load, `eager` só o DOM, `none` não
+    espera), tipos de recurso bloqueados, lista de URLs bloqueadas e tamanho
+    do cache em disco (None: padrão do Chrome, 0: desativado).
+
+    O bloqueio é feito pelo Network.setBlockedURLs do DevTools, aplicado em
+    `apply` logo após a criação da sessão; imagens também são desativadas
+    pelas preferências do Chrome, o que vale mesmo sem o DevTools.
+    """
+
+    def __init__(self, name, page_load_strategy='normal', block=(), blocked_urls=(), disk_cache_mb=None):
+        unknown = set(block) - set(RESOURCE_PATTERNS)
+        if unknown:
+            raise ValueError(f"Tipos de recurso desconhecidos no perfil {name}: {sorted(unknown)}")
+        self.name = name
+        self.page_load_strategy = page_load_strategy
+        self.block = tuple(block)
+        self.blocked_urls = tuple(blocked_urls)
+        self.disk_cache_mb = disk_cache_mb
+
+    def __repr__(self):
+        return (f"BrowserProfile({self.name!r}, {self.page_load_strategy}, bloqueia {list(self.block)}, "
+                f"{len(self.blocked_urls)} URLs, cache {self.disk_cache_mb})")
+
+    def blocked_patterns(self):
+        patterns = [pattern for kind in self.block for pattern in RESOURCE_PATTERNS[kind]]
+        patterns.extend(self.blocked_urls)
+        return list(dict.fromkeys(patterns))
+
+    def options(self):
+        options = webdriver.ChromeOptions()
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--headless")
+        options.page_load_strategy = self.page_load_strategy
+
+        if self.block:
+            options.add_argument("--disable-extensions")
+            options.add_argument("--disable-background-networking")
+        if 'images' in self.block:
+            options.add_argument("--blink-settings=imagesEnabled=false")
+            options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        if self.disk_cache_mb == 0:
+            # O Chrome trata 0 como "tamanho padrão"
+            options.add_argument("--disk-cache-size=1")
+            options.add_argument("--media-cache-size=1")
+        elif self.disk_cache_mb:
+            options.add_argument(f"--disk-cache-size={int(self.disk_cache_mb * 1024 * 1024)}")
+        return options
+
+    def apply(self, driver):
+        """
+        Bloqueia as URLs do perfil na sessão recém-criada. O comando do
+        DevTools não faz parte do WebDriver remoto e é registrado aqui; se o
+        hub não o aceitar a sessão segue sem o bloqueio.
+        """
+        patterns = self.blocked_patterns()
+        if not patterns:
+            return
+        executor = driver.command_executor
+        if executor.get_command('executeCdpCommand') is None:
+            executor.add_command('executeCdpCommand', 'POST', '/session/$sessionId/goog/cdp/execute')
+        try:
+            driver.execute('executeCdpCommand', {'cmd': 'Network.enable', 'params': {}})
+            driver.execute('executeCdpCommand', {'cmd': 'Network.setBlockedURLs', 'params': {'urls': patterns}})
+        except Exception as e:
+            events.warning('bloqueio_erro', "Não foi possível bloquear recursos no navegador.", perfil=self.name, erro=str(e))
+
+
+PROFILES = {
+    # Comportamento original: carrega tudo e espera o evento load
+    'full': BrowserProfile('full'),
+    'lean': BrowserProfile(
+        'lean', page_load_strategy='eager', block=('images', 'fonts', 'stylesheets'),
+        blocked_urls=DEFAULT_BLOCKED_URLS, disk_cache_mb=32,
+    ),
+    'minimal': BrowserProfile(
+        'minimal', page_load_strategy='none', block=('images', 'fonts', 'stylesheets'),
+        blocked_urls=DEFAULT_BLOCKED_URLS, disk_cache_mb=0,
+    ),
+}
+
+
+def browser_profile(name=None):
+    """
+    Perfil escolhido por BROWSER_PROFILE, com os ajustes de
+    BROWSER_PAGE_LOAD_STRATEGY, BROWSER_BLOCKED_URLS e BROWSER_DISK_CACHE_MB.
+    """
+    name = name or Config.BROWSER_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Perfil de navegador desconhecido: {name!r} (use {', '.join(PROFILES)})")
+    base = PROFILES[name]
+    extra_urls = tuple(url.strip() for url in Config.BROWSER_BLOCKED_URLS.split(',') if url.strip())
+    return BrowserProfile(
+        base.name,
+        page_load_strategy=Config.BROWSER_PAGE_LOAD_STRATEGY or base.page_load_strategy,
+        block=base.block,
+        blocked_urls=base.blocked_urls + extra_urls,
+        disk_cache_mb=base.disk_cache_mb if Config.BROWSER_DISK_CACHE_MB is None else Config.BROWSER_DISK_CACHE_MB,
+    )
@@ -0,0 +1,179 @@
+import datetime
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+
+from app.config import Config
+
+# Códigos de resultado gravados em pesquisa_spv.Resultado
+NADA_CONSTA = 1
+CONSTA_CRIMINAL = 2
+CONSTA_CIVEL = 5
+ERRO = 7
+
+# Início das capturas de consultas por nome gravadas em spv_pagina (app/names.py)
+NAME_CAPTURE_PREFIX = '<!-- spv-nome '
+
+Processo = namedtuple('Processo', 'numero classe assunto foro area data_distribuicao')
+
+# Todos os marcadores procurados em uma única varredura da página
+_MARKERS = re.compile('|'.join([
+    f"(?P<nada>{re.escape(Config.NADA_CONSTA)})",
+    f"(?P<consta>{re.escape(Config.CONSTA01)}|{re.escape(Config.CONSTA02)})",
+    "(?P<criminal>[Cc]riminal)",
+]))
+
+# Classe CSS (lista de processos) ou id (página de um processo) -> campo do Processo
+_FIELDS = {
+    'linkProcesso': 'numero',
+    'numeroProcesso': 'numero',
+    'classeProcesso': 'classe',
+    'assuntoPrincipalProcesso': 'assunto',
+    'assuntoProcesso': 'assunto',
+    'dataLocalDistribuicaoProcesso': 'distribuicao',
+    'foroProcesso': 'foro',
+    'areaProcesso': 'area',
+    # Parte encontrada, nas consultas por nome (app/names.py)
+    'nomeParte': 'parte',
+    'nomeMaeParte': 'mae',
+    'dataNascimentoParte': 'nascimento',
+}
+
+_VOID_TAGS = {'br', 'img', 'input', 'meta', 'link', 'hr', 'col', 'source', 'wbr'}
+
+
+class Classificacao:
+    """Resultado da classificação de uma página do eSAJ."""
+
+    def __init__(self, result, processos=()):
+        self.result = result
+        self.processos = list(processos)
+
+    def __repr__(self):
+        return f"Classificacao({self.result}, {len(self.processos)} processos)"
+
+
+class _ProcessParser(HTMLParser):
+    """
+    Extrai os processos da lista de resultados (ou da página de um processo
+    único) em uma passada pelo HTML. Cada link de processo abre um novo
+    registro; os campos seguintes são atribuídos a ele.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.processos = []
+        self._current = None
+        self._field = None
+        self._depth = 0
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if self._field is not None:
+            if tag not in _VOID_TAGS:
+                self._depth += 1
+            return
+        attrs = dict(attrs)
+        names = (attrs.get('class') or '').split()
+        if attrs.get('id'):
+            names.append(attrs['id'])
+        for name in names:
+            field = _FIELDS.get(name)
+            if field is None:
+                continue
+            if field == 'numero' or self._current is None:
+                self._current = {}
+                self.processos.append(self._current)
+            self._field, self._depth, self._text = field, 0, []
+            if tag in _VOID_TAGS:
+                self._close_field()
+            return
+
+    def handle_endtag(self, tag):
+        if self._field is None:
+            return
+        if self._depth:
+            self._depth -= 1
+        else:
+            self._close_field()
+
+    def handle_data(self, data):
+        if self._field is not None:
+            self._text.append(data)
+
+    def _close_field(self):
+        self._current[self._field] = ' '.join(''.join(self._text).split())
+        self._field = None
+
+
+def _processo(campos):
+    foro = campos.get('foro')
+    data = None
+    distribuicao = campos.get('distribuicao')
+    if distribuicao:
+        # Ex.: "01/02/2020 - Foro Central Criminal Barra Funda"
+        inicio, _, resto = distribuicao.partition(' - ')
+        try:
+            data = datetime.datetime.strptime(inicio.strip(), '%d/%m/%Y').date()
+        except ValueError:
+            resto = distribuicao
+        foro = foro or resto.strip() or None
+
+    area = campos.get('area')
+    if not area:
+        texto = f"{campos.get('classe', '')} {foro or ''}".lower()
+        area = 'Criminal' if ('criminal' in texto or 'penal' in texto) else 'Cível'
+
+    return Processo(campos.get('numero'), campos.get('classe'), campos.get('assunto'), foro, area, data)
+
+
+def extract_entries(page):
+    """
+    Processos da página de resultado com os dados da parte exibidos em cada
+    item (nome, mãe e nascimento, quando presentes): lista de (Processo, dict).
+    """
+    parser = _ProcessParser()
+    parser.feed(page)
+    parser.close()
+    return [
+        (_processo(campos), {field: campos[field] for field in ('parte', 'mae', 'nascimento') if campos.get(field)})
+        for campos in parser.processos if campos.get('numero')
+    ]
+
+
+def extract_processes(page):
+    """Lista de `Processo` encontrados na página de resultado."""
+    return [processo for processo, _ in extract_entries(page)]
+
+
+def find_markers(page):
+    """Marcadores presentes na página ('nada', 'consta', 'criminal') em uma única varredura."""
+    found = set()
+    for match in _MARKERS.finditer(page):
+        found.add(match.lastgroup)
+        if match.lastgroup == 'nada':
+            # Nada Consta tem precedência sobre os demais marcadores
+            break
+    return found
+
+
+def classify(page):
+    """
+    Enquadra a página de resultado (Nada Consta, Consta Criminal e Consta
+    Cível) com uma única varredura por todos os marcadores e, quando há
+    processos, extrai a lista estruturada. Capturas de consultas por nome
+    (várias páginas, ver app/names.py) são enquadradas por `classify_capture`.
+    """
+    if not page:
+        return Classificacao(ERRO)
+    if page.startswith(NAME_CAPTURE_PREFIX):
+        from app.names import classify_capture
+        return classify_capture(page)
+
+    found = find_markers(page)
+    if 'nada' in found:
+        return Classificacao(NADA_CONSTA)
+    if 'consta' not in found:
+        return Classificacao(ERRO)
+    result = CONSTA_CRIMINAL if 'criminal' in found else CONSTA_CIVEL
+    return Classificacao(result, extract_processes(page))
@@ -0,0 +1,349 @@
+import asyncio
+import json
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from urllib.parse import urlsplit
+
+from app.config import Config
+from app.events import events
+
+OK = 'ok'
+TIMEOUT = 'timeout'
+ERROR = 'error'
+BLOCKED = 'blocked'
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class LookupFailed(Exception):
+    """A consulta ao eSAJ não trouxe uma página utilizável (falha transitória, a retentar)."""
+
+
+class _Slot:
+    """Vaga emprestada pelo limitador; `outcome` pode ser ajustado por quem consulta."""
+
+    def __init__(self):
+        self.outcome = OK
+        self.started = time.monotonic()
+
+
+class AimdLimiter:
+    """
+    Limita as consultas ao eSAJ de um motor (HTTP ou navegador) em duas
+    dimensões: consultas em voo (`limit`) e taxa de início (`rate`, por
+    segundo). Ambas seguem AIMD (aumento aditivo, redução multiplicativa):
+
+    * a cada `limit` consultas bem-sucedidas o limite sobe 1 e a taxa sobe
+      LOOKUP_RATE_STEP, até `maximum` e LOOKUP_RATE_MAX. Até o primeiro
+      sinal de congestionamento (partida lenta, como no TCP) o aumento é
+      por consulta, dobrando os dois a cada janela;
+    * timeout, erro ou bloqueio multiplicam os dois por
+      LOOKUP_DECREASE_FACTOR; latência acima de LOOKUP_LATENCY_TOLERANCE
+      vezes a latência de base (fila se formando) reduz só o limite em voo.
+      A redução ocorre no máximo uma vez a cada LOOKUP_COOLDOWN_SECONDS
+      (uma rajada de falhas conta como um sinal);
+    * bloqueio (captcha, HTTP 403/429) também pausa novas consultas por
+      LOOKUP_BLOCK_PAUSE_SECONDS.
+
+    A latência de base é o menor tempo de resposta recente; ela sobe aos
+    poucos quando o site fica mais lento para todos, sem que isso seja lido
+    como congestionamento. `classify(exc)` traduz a exceção de uma consulta
+    em desfecho (padrão: erro).
+    """
+
+    BASELINE_DRIFT = 0.01
+
+    def __init__(self, name, maximum, initial=None, minimum=None, rate=None, classify=None):
+        self.name = name
+        self.minimum = max(1, Config.LOOKUP_CONCURRENCY_MIN if minimum is None else minimum)
+        self.maximum = max(self.minimum, maximum)
+        initial = Config.LOOKUP_CONCURRENCY_INITIAL if initial is None else initial
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.rate = Config.LOOKUP_RATE_INITIAL if rate is None else rate
+        self.classify = classify or (lambda error: ERROR)
+
+        self.in_flight = 0
+        self.baseline = None
+        self.decreases = 0
+        self._successes = 0
+        self._next_start = 0.0
+        self._last_decrease = float('-inf')
+        self._cond = threading.Condition()
+
+    def set_maximum(self, maximum):
+        """Ajusta o teto do limite (ex.: vagas livres no Selenoid)."""
+        with self._cond:
+            self.maximum = max(self.minimum, maximum)
+            self.limit = min(self.limit, self.maximum)
+            self._cond.notify_all()
+
+    def _try_acquire(self):
+        """Retorna 0 se a vaga foi obtida ou quanto esperar (None: até uma devolução)."""
+        if self.in_flight >= int(self.limit):
+            return None
+        now = time.monotonic()
+        if now < self._next_start:
+            return self._next_start - now
+        self.in_flight += 1
+        self._next_start = max(now, self._next_start) + 1.0 / self.rate
+        return 0
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                wait = self._try_acquire()
+                if wait == 0:
+                    return
+                self._cond.wait(wait)
+
+    async def acquire_async(self):
+        """Equivalente de `acquire` para o event loop (sem ocupar uma thread na espera)."""
+        while True:
+            with self._cond:
+                wait = self._try_acquire()
+            if wait == 0:
+                return
+            await asyncio.sleep(min(wait, 0.05) if wait is not None else 0.01)
+
+    def release(self, outcome, latency=None):
+        with self._cond:
+            self.in_flight -= 1
+            self._feedback(outcome, latency)
+            self._cond.notify_all()
+
+    def _feedback(self, outcome, latency):
+        now = time.monotonic()
+        if outcome == OK and latency is not None:
+            congested = self.baseline is not None and latency > self.baseline * Config.LOOKUP_LATENCY_TOLERANCE
+            if self.baseline is None or latency < self.baseline:
+                self.baseline = latency
+            else:
+                self.baseline += (latency - self.baseline) * self.BASELINE_DRIFT
+            if congested:
+                self._decrease(now, rate=False)
+                return
+        if outcome == OK:
+            self._successes += 1
+            if self.decreases == 0 or self._successes >= self.limit:
+                self._successes = 0
+                self.limit = min(self.maximum, self.limit + 1)
+                self.rate = min(Config.LOOKUP_RATE_MAX, self.rate + Config.LOOKUP_RATE_STEP)
+            return
+        if outcome == BLOCKED:
+            self._next_start = max(self._next_start, now + Config.LOOKUP_BLOCK_PAUSE_SECONDS)
+        self._decrease(now)
+
+    def _decrease(self, now, rate=True):
+        self._successes = 0
+        if now - self._last_decrease < Config.LOOKUP_COOLDOWN_SECONDS:
+            return
+        self._last_decrease = now
+        self.decreases += 1
+        self.limit = max(self.minimum, self.limit * Config.LOOKUP_DECREASE_FACTOR)
+        if rate:
+            self.rate = max(Config.LOOKUP_RATE_MIN, self.rate * Config.LOOKUP_DECREASE_FACTOR)
+
+    def _finish(self, slot, error):
+        if error is not None:
+            slot.outcome = self.classify(error)
+        self.release(slot.outcome, time.monotonic() - slot.started)
+
+    @contextmanager
+    def slot(self):
+        """Empresta uma vaga pelo tempo do bloco e realimenta o controle com o desfecho."""
+        self.acquire()
+        slot = _Slot()
+        try:
+            yield slot
+        except Exception as e:
+            self._finish(slot, e)
+            raise
+        self._finish(slot, None)
+
+    @asynccontextmanager
+    async def slot_async(self):
+        await self.acquire_async()
+        slot = _Slot()
+        try:
+            yield slot
+        except Exception as e:
+            self._finish(slot, e)
+            raise
+        self._finish(slot, None)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'limit': int(self.limit),
+                'maximum': self.maximum,
+                'rate': round(self.rate, 2),
+                'in_flight': self.in_flight,
+                'baseline_ms': round(self.baseline * 1000, 1) if self.baseline is not None else None,
+                'decreases': self.decreases,
+            }
+
+
+class CircuitBreaker:
+    """
+    Interrompe as consultas ao eSAJ quando a fração de falhas nas últimas
+    `window` consultas passa de `failure_ratio` (com pelo menos `min_calls`
+    consultas na janela): durante `open_seconds` nenhuma consulta começa,
+    em vez de abrir navegadores que vão falhar. Passado esse tempo uma única
+    consulta de sonda é liberada (meio-aberto); se ela funcionar as consultas
+    voltam, se falhar o circuito abre de novo.
+
+    `acquire` bloqueia enquanto o circuito não libera a consulta; o desfecho
+    é informado em `record` (ou pelo bloco de `guard`).
+    """
+
+    def __init__(self, name, window=None, min_calls=None, failure_ratio=None, open_seconds=None):
+        self.name = name
+        self.window = window or Config.BREAKER_WINDOW
+        self.min_calls = min(self.window, min_calls or Config.BREAKER_MIN_CALLS)
+        self.failure_ratio = failure_ratio or Config.BREAKER_FAILURE_RATIO
+        self.open_seconds = Config.BREAKER_OPEN_SECONDS if open_seconds is None else open_seconds
+
+        self.state = CLOSED
+        self.opens = 0
+        self._outcomes = deque(maxlen=self.window)
+        self._opened_at = None
+        self._probing = False
+        self._cond = threading.Condition()
+
+    def _try_acquire(self):
+        """Retorna 0 se a consulta pode começar ou quanto esperar (None: até o desfecho da sonda)."""
+        if self.state == OPEN:
+            remaining = self._opened_at + self.open_seconds - time.monotonic()
+            if remaining > 0:
+                return remaining
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return None
+            self._probing = True
+        return 0
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                wait = self._try_acquire()
+                if wait == 0:
+                    return
+                self._cond.wait(wait)
+
+    async def acquire_async(self):
+        while True:
+            with self._cond:
+                wait = self._try_acquire()
+            if wait == 0:
+                return
+            await asyncio.sleep(min(wait, 0.5) if wait is not None else 0.05)
+
+    def record(self, success):
+        with self._cond:
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if success:
+                    events.info('circuito_fechado', "Circuito fechado: a consulta de sonda funcionou.", circuito=self.name)
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                self._cond.notify_all()
+                return
+            if self.state == OPEN:
+                # Consulta iniciada antes da abertura
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures >= self.failure_ratio * len(self._outcomes):
+                self._open()
+
+    def _open(self):
+        events.warning('circuito_aberto', "Circuito aberto: consultas suspensas.", circuito=self.name,
+                       espera_s=self.open_seconds)
+        self.state = OPEN
+        self.opens += 1
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    @contextmanager
+    def guard(self):
+        """Libera a consulta do bloco e registra como falha se ele lançar exceção."""
+        self.acquire()
+        try:
+            yield
+        except BaseException:
+            self.record(False)
+            raise
+        self.record(True)
+
+    @asynccontextmanager
+    async def guard_async(self):
+        await self.acquire_async()
+        try:
+            yield
+        except BaseException:
+            self.record(False)
+            raise
+        self.record(True)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'state': self.state,
+                'calls': len(self._outcomes),
+                'failures': self._outcomes.count(False),
+                'opens': self.opens,
+            }
+
+
+class SelenoidStatus:
+    """
+    Lê as vagas do hub no `/status` do Selenoid (limite definido pelo
+    `-limit` do serviço) a cada SELENOID_STATUS_INTERVAL segundos. Sem
+    resposta do hub, mantém a última leitura.
+    """
+
+    def __init__(self, hub_url=None, interval=None, timeout=2):
+        parts = urlsplit(hub_url or Config.SELENOID_HUB_URL or '')
+        self.url = f"{parts.scheme}://{parts.netloc}/status" if parts.netloc else None
+        self.interval = Config.SELENOID_STATUS_INTERVAL if interval is None else interval
+        self.timeout = timeout
+        self.status = None
+        self._checked = float('-inf')
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock:
+            if self.url is None or time.monotonic() - self._checked < self.interval:
+                return self.status
+            self._checked = time.monotonic()
+        try:
+            with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+                data = json.loads(response.read().decode('utf-8'))
+            status = {key: int(data.get(key) or 0) for key in ('total', 'used', 'queued', 'pending')}
+        except Exception as e:
+            events.warning('selenoid_status', "Não foi possível ler o status do Selenoid.", erro=str(e))
+            return self.status
+        with self._lock:
+            self.status = status
+        return status
+
+    def capacity(self, own_sessions=0):
+        """
+        Sessões que o serviço pode manter no hub: as livres mais as que já são
+        dele (o pool mantém sessões abertas, contadas como usadas pelo hub).
+        None se o status ainda não pôde ser lido.
+        """
+        status = self.refresh()
+        if status is None:
+            return None
+        free = status['total'] - status['used'] - status['pending'] - status['queued']
+        return max(0, free + own_sessions)
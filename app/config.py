@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 load_dotenv() 
@@ -10,7 +11,174 @@ class Config:
     DB_NAME = os.getenv('DB_NAME')
     SELENOID_HUB_URL = os.getenv('SELENOID_HUB_URL')
 
+    # Pool de conexões do PostgreSQL
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+    DB_POOL_MAX_IDLE_SECONDS = float(os.getenv('DB_POOL_MAX_IDLE_SECONDS', '300'))
+    DB_POOL_WAIT_TIMEOUT = float(os.getenv('DB_POOL_WAIT_TIMEOUT', '30'))
+    DB_VALIDATE_IDLE_SECONDS = float(os.getenv('DB_VALIDATE_IDLE_SECONDS', '30'))
+    DB_CONNECT_RETRIES = int(os.getenv('DB_CONNECT_RETRIES', '10'))
+    DB_RETRY_BASE_DELAY = float(os.getenv('DB_RETRY_BASE_DELAY', '0.5'))
+    DB_RETRY_MAX_DELAY = float(os.getenv('DB_RETRY_MAX_DELAY', '10'))
+    DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '5'))
+
+    # Pool de sessões do Selenoid
+    SELENOID_POOL_SIZE = int(os.getenv('SELENOID_POOL_SIZE', '2'))
+    SELENOID_SESSION_MAX_USES = int(os.getenv('SELENOID_SESSION_MAX_USES', '50'))
+    SELENOID_ACQUIRE_TIMEOUT = int(os.getenv('SELENOID_ACQUIRE_TIMEOUT', '120'))
+
+    # Perfil das sessões do Chrome (app/browser_profile.py): 'full' carrega
+    # tudo, 'lean' bloqueia imagens, fontes, CSS e analytics e não espera o
+    # evento load, 'minimal' também não espera o DOM e desativa o cache em disco.
+    # Os demais ajustam o perfil escolhido (vazio: valor do perfil)
+    BROWSER_PROFILE = os.getenv('BROWSER_PROFILE', 'lean')
+    BROWSER_PAGE_LOAD_STRATEGY = os.getenv('BROWSER_PAGE_LOAD_STRATEGY', '')
+    BROWSER_BLOCKED_URLS = os.getenv('BROWSER_BLOCKED_URLS', '')
+    BROWSER_DISK_CACHE_MB = float(os.getenv('BROWSER_DISK_CACHE_MB')) if os.getenv('BROWSER_DISK_CACHE_MB') else None
+
+    # Quantidade de workers paralelos em process_pesquisas (1 = sequencial)
+    SPV_WORKERS = int(os.getenv('SPV_WORKERS', '1'))
+
+    # Reserva (lease) de pesquisas entre réplicas do serviço
+    WORKER_ID = os.getenv('SPV_WORKER_ID', f"{socket.gethostname()}-{os.getpid()}")
+    LEASE_SECONDS = int(os.getenv('SPV_LEASE_SECONDS', '900'))
+
+    # Gravação em lote dos resultados em pesquisa_spv
+    RESULT_BATCH_SIZE = int(os.getenv('RESULT_BATCH_SIZE', '50'))
+    RESULT_FLUSH_SECONDS = float(os.getenv('RESULT_FLUSH_SECONDS', '2'))
+
+    # Cache de resultados das consultas por CPF/RG, pelo documento normalizado (nomes não entram)
+    RESULT_CACHE_TTL_SECONDS = float(os.getenv('RESULT_CACHE_TTL_SECONDS', '86400'))
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '100000'))
+    RESULT_CACHE_PERSISTENT = os.getenv('RESULT_CACHE_PERSISTENT', 'true').lower() == 'true'
+
+    # Consultas por nome (filtro 2, app/names.py): a lista de resultados é
+    # lida página a página até o resultado estar decidido, no máximo
+    # NAME_SEARCH_MAX_PAGES páginas; a reserva de uma pesquisa leva junto até
+    # NAME_SEARCH_SIBLINGS pendências do filtro 2 com o mesmo nome normalizado
+    NAME_SEARCH_MAX_PAGES = int(os.getenv('NAME_SEARCH_MAX_PAGES', '10'))
+    NAME_SEARCH_SIBLINGS = int(os.getenv('NAME_SEARCH_SIBLINGS', '200'))
+
+    # Arquivo das páginas consultadas (spv_pagina), comprimidas com zstd ou
+    # gzip ('auto': zstd se o pacote zstandard estiver instalado) e
+    # deduplicadas pelo hash; usado pela reclassificação offline (app/reclassify.py)
+    PAGE_ARCHIVE = os.getenv('PAGE_ARCHIVE', 'true').lower() == 'true'
+    PAGE_ARCHIVE_CODEC = os.getenv('PAGE_ARCHIVE_CODEC', 'auto')
+    PAGE_ARCHIVE_LEVEL = int(os.getenv('PAGE_ARCHIVE_LEVEL', '3'))
+    RECLASSIFY_PROCESSES = int(os.getenv('RECLASSIFY_PROCESSES', '0'))  # 0: um por CPU
+    RECLASSIFY_CHUNK = int(os.getenv('RECLASSIFY_CHUNK', '200'))
+
+    # Modo de execução: 'sync' (workers com threads) ou 'async' (pipeline asyncio)
+    SPV_RUN_MODE = os.getenv('SPV_RUN_MODE', 'sync')
+    ASYNC_FETCH_BATCH = int(os.getenv('ASYNC_FETCH_BATCH', '100'))
+    ASYNC_LOOKUP_CONCURRENCY = int(os.getenv('ASYNC_LOOKUP_CONCURRENCY', '100'))
+    ASYNC_CLASSIFY_CONCURRENCY = int(os.getenv('ASYNC_CLASSIFY_CONCURRENCY', '4'))
+    ASYNC_PERSIST_CONCURRENCY = int(os.getenv('ASYNC_PERSIST_CONCURRENCY', '4'))
+    ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', '4'))
+    CYCLE_SLEEP_SECONDS = int(os.getenv('CYCLE_SLEEP_SECONDS', '300'))
+
+    # Prioridade da fila: cada pesquisa já à frente na fila do mesmo cliente
+    # adia o prazo virtual da próxima em SLA_FAIRNESS_SECONDS
+    SLA_FAIRNESS_SECONDS = float(os.getenv('SLA_FAIRNESS_SECONDS', '60'))
+    QUEUE_WAIT_WINDOW = int(os.getenv('QUEUE_WAIT_WINDOW', '10000'))
+
+    # Agendamento: 'notify' (LISTEN/NOTIFY com varredura de segurança periódica)
+    # ou 'poll' (varredura completa a cada CYCLE_SLEEP_SECONDS)
+    SPV_SCHEDULE_MODE = os.getenv('SPV_SCHEDULE_MODE', 'notify')
+    NOTIFY_CHANNEL = os.getenv('NOTIFY_CHANNEL', 'pesquisa_pendente')
+    NOTIFY_DEBOUNCE_SECONDS = float(os.getenv('NOTIFY_DEBOUNCE_SECONDS', '0.2'))
+    NOTIFY_MAX_IDS = int(os.getenv('NOTIFY_MAX_IDS', '1000'))
+    SWEEP_INTERVAL_SECONDS = int(os.getenv('SWEEP_INTERVAL_SECONDS', '1800'))
+
+    ESAJ_BASE_URL = os.getenv('ESAJ_BASE_URL', 'https://esaj.tjsp.jus.br/cpopg').rstrip('/')
+    ESAJ_OPEN_URL = f"{ESAJ_BASE_URL}/open.do"
+
+    # Motor de consulta por tipo de pesquisa do eSAJ: 'http' (requisição direta,
+    # com fallback para o navegador) ou 'selenium'
+    ESAJ_ENGINE_DOCPARTE = os.getenv('ESAJ_ENGINE_DOCPARTE', 'http')
+    ESAJ_ENGINE_NMPARTE = os.getenv('ESAJ_ENGINE_NMPARTE', 'selenium')
+    ESAJ_HTTP_POOL_SIZE = int(os.getenv('ESAJ_HTTP_POOL_SIZE', '10'))
+    ESAJ_HTTP_TIMEOUT = float(os.getenv('ESAJ_HTTP_TIMEOUT', '30'))
+
+    # Controle adaptativo (AIMD) das consultas ao eSAJ: o limite de consultas
+    # em voo e a taxa de início crescem aos poucos enquanto o site responde
+    # bem e caem pela metade diante de timeouts, erros, bloqueios ou latência
+    # acima de LOOKUP_LATENCY_TOLERANCE vezes a latência de base
+    LOOKUP_CONCURRENCY_INITIAL = int(os.getenv('LOOKUP_CONCURRENCY_INITIAL', '2'))
+    LOOKUP_CONCURRENCY_MIN = int(os.getenv('LOOKUP_CONCURRENCY_MIN', '1'))
+    LOOKUP_RATE_INITIAL = float(os.getenv('LOOKUP_RATE_INITIAL', '10'))
+    LOOKUP_RATE_MIN = float(os.getenv('LOOKUP_RATE_MIN', '0.2'))
+    LOOKUP_RATE_MAX = float(os.getenv('LOOKUP_RATE_MAX', '200'))
+    LOOKUP_RATE_STEP = float(os.getenv('LOOKUP_RATE_STEP', '1'))
+    LOOKUP_DECREASE_FACTOR = float(os.getenv('LOOKUP_DECREASE_FACTOR', '0.5'))
+    LOOKUP_LATENCY_TOLERANCE = float(os.getenv('LOOKUP_LATENCY_TOLERANCE', '2'))
+    LOOKUP_COOLDOWN_SECONDS = float(os.getenv('LOOKUP_COOLDOWN_SECONDS', '2'))
+    LOOKUP_BLOCK_PAUSE_SECONDS = float(os.getenv('LOOKUP_BLOCK_PAUSE_SECONDS', '10'))
+    # Intervalo de leitura do /status do Selenoid (vagas livres no hub)
+    SELENOID_STATUS_INTERVAL = float(os.getenv('SELENOID_STATUS_INTERVAL', '15'))
+
+    # Retentativa de consultas que falharam (sem página, exceção ou bloqueio):
+    # a (pesquisa, filtro) volta à fila após RETRY_BASE_SECONDS * 2^(falhas - 1),
+    # limitado a RETRY_MAX_SECONDS e com jitter; o resultado 7 só é gravado
+    # após RETRY_MAX_ATTEMPTS falhas
+    RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', '5'))
+    RETRY_BASE_SECONDS = float(os.getenv('RETRY_BASE_SECONDS', '30'))
+    RETRY_MAX_SECONDS = float(os.getenv('RETRY_MAX_SECONDS', '3600'))
+    # Circuit breaker: com BREAKER_FAILURE_RATIO de falhas nas últimas
+    # BREAKER_WINDOW consultas (mínimo BREAKER_MIN_CALLS) as consultas param
+    # por BREAKER_OPEN_SECONDS; depois uma consulta de sonda decide se voltam
+    BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', '20'))
+    BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', '10'))
+    BREAKER_FAILURE_RATIO = float(os.getenv('BREAKER_FAILURE_RATIO', '0.5'))
+    BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', '60'))
+
+    # Espera pela página de resultado no navegador: o timeout acompanha o
+    # percentil da latência recente de cada tipo de consulta
+    READINESS_TIMEOUT_MIN = float(os.getenv('READINESS_TIMEOUT_MIN', '5'))
+    READINESS_TIMEOUT_MAX = float(os.getenv('READINESS_TIMEOUT_MAX', '30'))
+    READINESS_PERCENTILE = float(os.getenv('READINESS_PERCENTILE', '95'))
+    READINESS_TIMEOUT_FACTOR = float(os.getenv('READINESS_TIMEOUT_FACTOR', '3'))
+    READINESS_WINDOW = int(os.getenv('READINESS_WINDOW', '200'))
+    READINESS_MIN_SAMPLES = int(os.getenv('READINESS_MIN_SAMPLES', '20'))
+
+    # Endpoint local de métricas no formato do Prometheus (0 desativa)
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))
+    METRICS_HOST = os.getenv('METRICS_HOST', '0.0.0.0')
+
+    # Inicialização: o banco não é acessado na importação; no aquecimento são
+    # abertas em paralelo WARMUP_DB_CONNECTIONS conexões e
+    # WARMUP_BROWSER_SESSIONS sessões do Selenoid (0: o tamanho de cada pool).
+    # /readyz responde 200 depois do aquecimento, enquanto o banco responder
+    # em HEALTH_DB_TIMEOUT segundos (verificação em cache por HEALTH_CACHE_SECONDS)
+    WARMUP_DB_CONNECTIONS = int(os.getenv('WARMUP_DB_CONNECTIONS', '0'))
+    WARMUP_BROWSER_SESSIONS = int(os.getenv('WARMUP_BROWSER_SESSIONS', '0'))
+    HEALTH_DB_TIMEOUT = float(os.getenv('HEALTH_DB_TIMEOUT', '2'))
+    HEALTH_CACHE_SECONDS = float(os.getenv('HEALTH_CACHE_SECONDS', '5'))
+
+    # Log de eventos em JSON lines (app/events.py), gravado por uma thread
+    # própria em LOG_FILE (vazio: stdout). LOG_SAMPLE_RATE é a fração dos
+    # eventos de sucesso por consulta que é registrada; com a fila de
+    # LOG_QUEUE_SIZE eventos cheia, novos eventos são descartados.
+    # PROGRESS_BARS: barras do tqdm ('auto' só quando o stderr é um terminal)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'info')
+    LOG_FILE = os.getenv('LOG_FILE', '')
+    LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.01'))
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+    PROGRESS_BARS = os.getenv('PROGRESS_BARS', 'auto').lower()
+
+    # Diagnóstico sob demanda. Rastreamento (app/tracing.py): com TRACE_FILE
+    # preenchido (ou após um SIGUSR2) a fração TRACE_SAMPLE_RATE das consultas
+    # é gravada em spans no formato do Chrome, só as que levaram ao menos
+    # TRACE_MIN_SECONDS. Profiler (app/profiler.py): SIGUSR1 (ou
+    # PROFILE_AT_START) amostra as pilhas por PROFILE_SECONDS a cada
+    # PROFILE_INTERVAL_MS. Os arquivos ficam em DIAGNOSTICS_DIR
+    DIAGNOSTICS_DIR = os.getenv('DIAGNOSTICS_DIR', '/tmp/spv')
+    TRACE_FILE = os.getenv('TRACE_FILE', '')
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '1'))
+    TRACE_MIN_SECONDS = float(os.getenv('TRACE_MIN_SECONDS', '0'))
+    PROFILE_SECONDS = float(os.getenv('PROFILE_SECONDS', '30'))
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '10'))
+    PROFILE_AT_START = os.getenv('PROFILE_AT_START', 'false').lower() == 'true'
+
     NADA_CONSTA = 'Não existem informações disponíveis para os parâmetros informados.'
     CONSTA01 = 'Processos encontrados'
     CONSTA02 = 'Audiências'
-    
\ No newline at end of file
@@ -1,87 +1,443 @@
 import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
 from app.config import Config
-import time 
+from app.metrics import DB_SECONDS, DB_ERRORS
+from app.events import events
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 class Database:
-    def __init__(self):
-        self.connection = None        
-        self.connect()
+    """
+    Acesso ao PostgreSQL por um pool limitado de conexões. Cada chamada
+    (fetchall/execute/...) empresta uma conexão do pool só durante a query,
+    então workers e tarefas concorrentes não disputam um único socket.
+    """
 
-    def connect(self):
-        max_retries = 10 
-        retry_delay = 5  
+    def __init__(self, pool_size=None, max_idle=None, wait_timeout=None, lazy=False):
+        self.pool_size = pool_size or Config.DB_POOL_SIZE
+        self.max_idle = max_idle if max_idle is not None else Config.DB_POOL_MAX_IDLE_SECONDS
+        self.wait_timeout = wait_timeout if wait_timeout is not None else Config.DB_POOL_WAIT_TIMEOUT
+
+        self._idle = []       # [(conexão, instante da devolução)]
+        self._opened = 0      # conexões abertas ou sendo abertas
+        self._waiting = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._checkouts = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+        self._connections_created = 0
+
+        # Com `lazy` nenhuma conexão é aberta aqui: a primeira chamada (ou o
+        # `warm_up`) abre as conexões sob demanda
+        if not lazy:
+            self.connect()
+
+    def _new_connection(self, max_retries=None, connect_timeout=None):
+        """
+        Abre uma conexão nova com retentativas e backoff exponencial. Só quem
+        precisa da conexão espera; os demais usuários do pool seguem livres.
+        `connect_timeout` (segundos) substitui DB_CONNECT_TIMEOUT.
+        """
+        max_retries = max_retries or Config.DB_CONNECT_RETRIES
+        retry_delay = Config.DB_RETRY_BASE_DELAY
 
         for i in range(max_retries):
             try:
-                self.connection = psycopg2.connect(
+                connection = psycopg2.connect(
                     host=Config.DB_HOST,
                     user=Config.DB_USER,
                     password=Config.DB_PASSWORD,
-                    dbname=Config.DB_NAME
+                    dbname=Config.DB_NAME,
+                    connect_timeout=connect_timeout or Config.DB_CONNECT_TIMEOUT
                 )
-                print("Conectado ao PostgreSQL com sucesso!")
-                return 
+                events.info('db_conectado', "Conectado ao PostgreSQL com sucesso!")
+                with self._cond:
+                    self._connections_created += 1
+                return connection
             except psycopg2.OperationalError as e:
-                
-                print(f"Tentativa {i+1}/{max_retries}: Erro ao conectar ao PostgreSQL: {e}")
+
                 if i < max_retries - 1:
-                    print(f"Aguardando {retry_delay} segundos antes de tentar novamente...")
+                    events.warning('db_conexao_erro', "Erro ao conectar ao PostgreSQL; nova tentativa após a espera.",
+                                   tentativa=i + 1, tentativas=max_retries, espera_s=round(retry_delay, 1), erro=str(e))
                     time.sleep(retry_delay)
+                    retry_delay = min(retry_delay * 2, Config.DB_RETRY_MAX_DELAY)
                 else:
-                    
-                    print("Número máximo de retentativas de conexão atingido. A aplicação será encerrada.")
-                    raise 
+
+                    events.error('db_conexao_erro', "Número máximo de retentativas de conexão atingido.",
+                                 tentativa=i + 1, tentativas=max_retries, erro=str(e))
+                    raise
 
             except Exception as e:
-                
-                print(f"Erro inesperado durante a conexão ao PostgreSQL: {e}")
+
+                events.error('db_conexao_erro', "Erro inesperado durante a conexão ao PostgreSQL.", erro=str(e))
                 raise
 
+    def connect(self):
+        """Garante ao menos uma conexão aberta no pool (valida o acesso ao banco)."""
+        with self._cond:
+            if self._closed:
+                self._closed = False
+            if self._idle or self._opened >= self.pool_size:
+                return
+            self._opened += 1
+        try:
+            connection = self._new_connection()
+        except Exception:
+            with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+            raise
+        self._checkin(connection)
+
+    def warm_up(self, connections=None):
+        """
+        Abre em paralelo até `connections` conexões (padrão: o tamanho do
+        pool) e as deixa ociosas no pool, para que o primeiro lote não espere
+        pelas conexões. Retorna quantas foram abertas; lança o erro da
+        conexão se nenhuma pôde ser aberta.
+        """
+        with self._cond:
+            self._closed = False
+            wanted = min(connections or self.pool_size, self.pool_size) - len(self._idle)
+            count = max(0, min(wanted, self.pool_size - self._opened))
+            self._opened += count
+        if not count:
+            return 0
+
+        opened, errors = 0, []
+        with ThreadPoolExecutor(max_workers=count, thread_name_prefix="spv-db-warmup") as executor:
+            futures = [executor.submit(self._new_connection) for _ in range(count)]
+            for future in futures:
+                try:
+                    self._checkin(future.result())
+                    opened += 1
+                except Exception as e:
+                    errors.append(e)
+                    with self._cond:
+                        self._opened -= 1
+                        self._cond.notify()
+        if errors and not opened:
+            raise errors[0]
+        return opened
+
+    def ping(self, timeout=None):
+        """
+        Verificação rápida do acesso ao banco (readiness): SELECT 1 em uma
+        conexão do pool, sem retentativas ao abrir uma conexão nova. Com
+        `timeout`, a espera pela conexão, a abertura de uma nova e o próprio
+        SELECT ficam limitados a esse prazo (em segundos).
+        """
+        connect_timeout = max(1, int(timeout)) if timeout is not None else None
+        with self.connection(wait_timeout=timeout, connect_retries=1, connect_timeout=connect_timeout) as connection:
+            with connection.cursor() as cursor:
+                if timeout is not None:
+                    # Vale só nesta transação, desfeita na devolução ao pool
+                    cursor.execute("SET LOCAL statement_timeout = %s", (max(1, int(timeout * 1000)),))
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+
+    def dedicated_connection(self):
+        """
+        Abre uma conexão própria, fora do pool e em autocommit, para usos de
+        longa duração como o LISTEN. Quem abre é responsável por fechá-la.
+        """
+        connection = self._new_connection()
+        connection.autocommit = True
+        return connection
+
+    def _discard(self, connection):
+        try:
+            if not connection.closed:
+                connection.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._opened -= 1
+            self._cond.notify()
+
+    def _is_valid(self, connection, idle_since):
+        """Validação no empréstimo; conexões ociosas há mais tempo recebem um SELECT 1."""
+        if connection.closed:
+            return False
+        if connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.monotonic() - idle_since < Config.DB_VALIDATE_IDLE_SECONDS:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _expired_idle(self):
+        """Remove (com o lock adquirido) as conexões ociosas além de `max_idle`."""
+        now = time.monotonic()
+        expired = []
+        # O pool empresta do fim da lista (LIFO): as mais antigas ficam no início
+        while self._idle and now - self._idle[0][1] > self.max_idle:
+            expired.append(self._idle.pop(0)[0])
+        return expired
+
+    def _checkout(self, wait_timeout=None, connect_retries=None, connect_timeout=None):
+        started = time.monotonic()
+        deadline = started + (self.wait_timeout if wait_timeout is None else wait_timeout)
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise psycopg2.pool.PoolError("Pool de conexões encerrado.")
+                expired = self._expired_idle()
+            for connection in expired:
+                self._discard(connection)
+
+            with self._cond:
+                candidate = None
+                if self._idle:
+                    candidate = self._idle.pop()
+                elif self._opened < self.pool_size:
+                    self._opened += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise psycopg2.pool.PoolError(
+                            f"Nenhuma conexão disponível no pool após {deadline - started:.1f}s."
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                    continue
+
+            if candidate is None:
+                try:
+                    connection = self._new_connection(connect_retries, connect_timeout)
+                except Exception:
+                    with self._cond:
+                        self._opened -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                connection, idle_since = candidate
+                if time.monotonic() - idle_since > self.max_idle or not self._is_valid(connection, idle_since):
+                    self._discard(connection)
+                    continue
+
+            elapsed = time.monotonic() - started
+            DB_SECONDS.observe(elapsed, operation='checkout')
+            with self._cond:
+                self._checkouts += 1
+                self._checkout_time_total += elapsed
+                self._checkout_time_max = max(self._checkout_time_max, elapsed)
+            return connection
+
+    def _checkin(self, connection):
+        if connection.closed:
+            self._discard(connection)
+            return
+        try:
+            # Nenhuma transação fica aberta em uma conexão ociosa
+            if connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except psycopg2.Error:
+            self._discard(connection)
+            return
+        with self._cond:
+            if self._closed:
+                self._opened -= 1
+                connection.close()
+                return
+            self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, wait_timeout=None, connect_retries=None, connect_timeout=None):
+        """
+        Empresta uma conexão do pool pelo tempo do bloco. Conexões que falham
+        por erro de rede/servidor são descartadas em vez de voltarem ao pool.
+        """
+        connection = self._checkout(wait_timeout, connect_retries, connect_timeout)
+        broken = False
+        try:
+            yield connection
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if broken:
+                self._discard(connection)
+            else:
+                self._checkin(connection)
+
+    def stats(self):
+        """Tamanho do pool, conexões em uso/ociosas, espera e latência de empréstimo."""
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'pool_size': self.pool_size,
+                'opened': self._opened,
+                'idle': idle,
+                'in_use': self._opened - idle,
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'connections_created': self._connections_created,
+                'checkout_avg_ms': (self._checkout_time_total / self._checkouts * 1000) if self._checkouts else 0.0,
+                'checkout_max_ms': self._checkout_time_max * 1000,
+            }
+
     def close(self):
-        """Fecha a conexão com o banco de dados se estiver aberta."""
-        if self.connection and not self.connection.closed:
-            self.connection.close()
-            self.connection = None 
+        """Fecha todas as conexões ociosas; as emprestadas são fechadas na devolução."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+            self._cond.notify_all()
+        for connection, _ in idle:
+            if not connection.closed:
+                connection.close()
+
     def fetchall(self, sql, params=None):
         """
         Executa uma query SELECT e retorna todos os resultados.
-        Tenta reconectar se a conexão estiver fechada.
         """
-        cursor = None
-        try:
-            
-            if not self.connection or self.connection.closed:
-                self.connect()
-            cursor = self.connection.cursor()
-            cursor.execute(sql, params)
-            return cursor.fetchall()
-        except psycopg2.Error as e:
-            print(f"Error executing query: {e}")
-            raise 
-        finally:
-            if cursor:
-                cursor.close()
+        with DB_SECONDS.time(operation='fetchall'), self.connection() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    return cursor.fetchall()
+            except psycopg2.Error as e:
+                DB_ERRORS.inc(operation='fetchall')
+                events.error('db_erro', "Erro ao executar comando no PostgreSQL.", operacao='fetchall', erro=str(e))
+                raise
+
+    def iterate(self, sql, params=None, batch_size=1000):
+        """
+        Executa um SELECT por um cursor do lado do servidor e entrega os
+        resultados em listas de até `batch_size` linhas, sem carregar tudo na
+        memória. A conexão fica emprestada até o fim da iteração.
+        """
+        with self.connection() as connection:
+            try:
+                with connection.cursor(name=f"spv_iterate_{id(connection)}") as cursor:
+                    cursor.itersize = batch_size
+                    cursor.execute(sql, params)
+                    while True:
+                        with DB_SECONDS.time(operation='iterate'):
+                            rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        yield rows
+            except psycopg2.Error as e:
+                DB_ERRORS.inc(operation='iterate')
+                events.error('db_erro', "Erro ao executar comando no PostgreSQL.", operacao='iterate', erro=str(e))
+                raise
+            finally:
+                if not connection.closed:
+                    connection.rollback()
 
     def execute(self, sql, params=None):
         """
         Executa uma query de INSERT, UPDATE ou DELETE e faz commit.
-        Tenta reconectar se a conexão estiver fechada.
         """
-        cursor = None
-        try:
-            # Verifica se a conexão está ativa; se não, tenta reconectar
-            if not self.connection or self.connection.closed:
-                self.connect()
-            cursor = self.connection.cursor()
-            cursor.execute(sql, params)
-            self.connection.commit() 
-            return cursor.rowcount 
-        except psycopg2.Error as e:
-            print(f"Error executing update/insert: {e}")
-            self.connection.rollback() 
-            raise 
-        finally:
-            if cursor:
-                cursor.close()
+        with DB_SECONDS.time(operation='execute'), self.connection() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    connection.commit()
+                    return cursor.rowcount
+            except psycopg2.Error as e:
+                DB_ERRORS.inc(operation='execute')
+                events.error('db_erro', "Erro ao executar comando no PostgreSQL.", operacao='execute', erro=str(e))
+                if not connection.closed:
+                    connection.rollback()
+                raise
+
+    def execute_returning(self, sql, params=None):
+        """
+        Executa um comando que altera dados e retorna linhas (RETURNING ou
+        CTEs com INSERT/UPDATE), faz commit e retorna todos os resultados.
+        """
+        with DB_SECONDS.time(operation='execute_returning'), self.connection() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    rows = cursor.fetchall()
+                    connection.commit()
+                    return rows
+            except psycopg2.Error as e:
+                DB_ERRORS.inc(operation='execute_returning')
+                events.error('db_erro', "Erro ao executar comando no PostgreSQL.", operacao='execute_returning', erro=str(e))
+                if not connection.closed:
+                    connection.rollback()
+                raise
+
+    def execute_values(self, sql, argslist, template=None, fetch=False):
+        """
+        Executa um INSERT/UPDATE com várias linhas em um único comando
+        (`VALUES %s` expandido por psycopg2.extras.execute_values) e faz commit.
+        Retorna a quantidade de linhas afetadas ou, com `fetch`, as linhas do
+        RETURNING.
+        """
+        with DB_SECONDS.time(operation='execute_values'), self.connection() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    rows = psycopg2.extras.execute_values(
+                        cursor, sql, argslist, template=template, page_size=max(len(argslist), 1), fetch=fetch
+                    )
+                    connection.commit()
+                    return rows if fetch else cursor.rowcount
+            except psycopg2.Error as e:
+                DB_ERRORS.inc(operation='execute_values')
+                events.error('db_erro', "Erro ao executar comando no PostgreSQL.", operacao='execute_values', erro=str(e))
+                if not connection.closed:
+                    connection.rollback()
+                raise
+
+class AsyncDatabase:
+    """
+    Camada asyncio sobre o `Database`: as chamadas ao psycopg2 rodam em um
+    executor dedicado, sem bloquear o event loop do pipeline assíncrono.
+    """
+
+    def __init__(self, database, max_workers=None):
+        self.database = database
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.ASYNC_DB_THREADS,
+            thread_name_prefix="spv-db"
+        )
+
+    async def run(self, fn, *args):
+        """
+        Executa `fn(*args)` (que acessa o banco) no executor do banco, com o
+        contexto da tarefa (correlação dos eventos e trace da consulta).
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(contextvars.copy_context().run, fn, *args)
+        )
+
+    async def fetchall(self, sql, params=None):
+        return await self.run(self.database.fetchall, sql, params)
+
+    async def execute(self, sql, params=None):
+        return await self.run(self.database.execute, sql, params)
+
+    async def execute_returning(self, sql, params=None):
+        return await self.run(self.database.execute_returning, sql, params)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
 
-db = Database()
\ No newline at end of file
+# Sem conexão na importação: o pool abre as conexões no primeiro uso ou no
+# aquecimento da inicialização (SPVAutomatico.warm_up)
+db = Database(lazy=True)
\ No newline at end of file
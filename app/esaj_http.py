@@ -0,0 +1,195 @@
+import asyncio
+import contextvars
+import functools
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import urllib3
+
+from app.config import Config
+
+
+# Tipo de consulta do eSAJ (campo cbPesquisa) para cada filtro
+SEARCH_FIELDS = {
+    0: 'DOCPARTE',  # CPF
+    1: 'DOCPARTE',  # RG
+    2: 'NMPARTE',   # Nome completo
+    3: 'DOCPARTE',  # RG
+}
+
+# Contêiner do desafio renderizado (o mesmo seletor de app/readiness.py). Só o
+# elemento conta: páginas normais do eSAJ podem carregar o script do reCAPTCHA
+# ou citar "captcha" em scripts e CSS sem exigir o desafio
+CAPTCHA_CONTAINER = re.compile(
+    r'<[a-z][^>]*\b(?:class|id)\s*=\s*["\'][^"\']*\b(?:g-recaptcha|h-captcha)\b[^"\']*["\']',
+    re.IGNORECASE,
+)
+
+
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0 Safari/537.36'
+
+
+class BrowserRequired(Exception):
+    """A resposta do eSAJ exige o navegador (JavaScript, captcha ou página inesperada)."""
+
+
+class SiteBlocked(BrowserRequired):
+    """O eSAJ bloqueou ou limitou a consulta (captcha, HTTP 403 ou 429)."""
+
+
+class SiteError(BrowserRequired):
+    """O eSAJ respondeu com erro de servidor (HTTP 5xx)."""
+
+
+def search_field(search_type):
+    """Retorna o tipo de consulta do eSAJ (DOCPARTE ou NMPARTE) usado pelo filtro."""
+    return SEARCH_FIELDS[search_type]
+
+
+def build_params(search_type, document):
+    """Parâmetros do GET em `cpopg/search.do` equivalentes ao formulário do eSAJ."""
+    field = search_field(search_type)
+    params = {
+        'conversationId': '',
+        'cbPesquisa': field,
+        'dadosConsulta.valorConsulta': document,
+        'cdForo': '-1',
+    }
+    if field == 'NMPARTE':
+        params['chNmCompleto'] = 'true'
+    return params
+
+
+def check_page(status, page):
+    """
+    Valida a resposta do eSAJ e retorna o HTML. Lança `BrowserRequired`
+    quando a página não pode ser interpretada sem o navegador (captcha,
+    conteúdo montado por JavaScript ou erro HTTP).
+    """
+    if status in (403, 429):
+        raise SiteBlocked(f"eSAJ respondeu HTTP {status}")
+    if status >= 500:
+        raise SiteError(f"eSAJ respondeu HTTP {status}")
+    if status != 200:
+        raise BrowserRequired(f"eSAJ respondeu HTTP {status}")
+    if is_blocked(page):
+        raise SiteBlocked("Página de resultado exige captcha")
+    if not any(marker in page for marker in (Config.NADA_CONSTA, Config.CONSTA01, Config.CONSTA02)):
+        raise BrowserRequired("Página de resultado sem marcadores conhecidos (possível conteúdo via JavaScript)")
+    return page
+
+
+def is_blocked(page):
+    """Indica se a página é de captcha (bloqueio do eSAJ): tem o contêiner do desafio."""
+    return CAPTCHA_CONTAINER.search(page) is not None
+
+
+def lookup_outcome(error):
+    """Desfecho de uma consulta HTTP que falhou, usado pelo controle de concorrência."""
+    if isinstance(error, SiteBlocked):
+        return 'blocked'
+    if isinstance(error, SiteError):
+        return 'error'
+    if isinstance(error, BrowserRequired):
+        # O site respondeu normalmente; a página só não serve sem o navegador
+        return 'ok'
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, urllib3.exceptions.TimeoutError)):
+        return 'timeout'
+    if isinstance(error, urllib3.exceptions.MaxRetryError) and isinstance(error.reason, urllib3.exceptions.TimeoutError):
+        return 'timeout'
+    return 'error'
+
+
+def _charset(content_type):
+    if 'charset=' in content_type:
+        return content_type.split('charset=')[-1].split(';')[0].strip()
+    return 'utf-8'
+
+
+def engine_for(search_type):
+    """Motor configurado ('http' ou 'selenium') para o tipo de consulta do filtro."""
+    if search_field(search_type) == 'NMPARTE':
+        return Config.ESAJ_ENGINE_NMPARTE
+    return Config.ESAJ_ENGINE_DOCPARTE
+
+
+class EsajHttpClient:
+    """
+    Consulta o `cpopg/search.do` do eSAJ com requisições GET diretas, sem
+    navegador, reaproveitando conexões keep-alive de um pool do urllib3.
+    """
+
+    def __init__(self, base_url=None, pool_size=None, timeout=None):
+        self.base_url = (base_url or Config.ESAJ_BASE_URL).rstrip('/')
+        self.http = urllib3.PoolManager(
+            maxsize=pool_size or Config.ESAJ_HTTP_POOL_SIZE,
+            block=True,
+            retries=urllib3.Retry(total=2, connect=2, read=0, redirect=5, backoff_factor=0.5),
+            timeout=urllib3.Timeout(total=timeout or Config.ESAJ_HTTP_TIMEOUT),
+            headers={
+                'User-Agent': USER_AGENT,
+                'Accept': 'text/html,application/xhtml+xml',
+                'Accept-Language': 'pt-BR,pt;q=0.9',
+            },
+        )
+
+    def search(self, search_type, document):
+        """
+        Executa a consulta e retorna o HTML da página de resultado.
+        Lança `BrowserRequired` quando a página exige o navegador.
+        """
+        response = self.http.request(
+            'GET',
+            f"{self.base_url}/search.do",
+            fields=build_params(search_type, document),
+        )
+        page = response.data.decode(_charset(response.headers.get('Content-Type', '')), errors='replace')
+        return check_page(response.status, page)
+
+    def get_page(self, href):
+        """Outra página da lista de resultados, pelo link de paginação do eSAJ (relativo ao cpopg)."""
+        response = self.http.request('GET', urljoin(f"{self.base_url}/", href))
+        page = response.data.decode(_charset(response.headers.get('Content-Type', '')), errors='replace')
+        return check_page(response.status, page)
+
+    def close(self):
+        self.http.clear()
+
+
+class AsyncEsajHttpClient:
+    """
+    Versão asyncio do `EsajHttpClient`: as requisições são feitas pelo mesmo
+    cliente do urllib3 (pool keep-alive, retentativas, redirecionamentos,
+    TLS e decodificação idênticos aos do modo síncrono) em um executor de
+    `pool_size` threads, sem bloquear o event loop. O executor e o pool de
+    conexões têm o mesmo tamanho, o que limita as consultas em voo.
+    """
+
+    def __init__(self, base_url=None, pool_size=None, timeout=None):
+        pool_size = pool_size or Config.ESAJ_HTTP_POOL_SIZE
+        self.client = EsajHttpClient(base_url=base_url, pool_size=pool_size, timeout=timeout)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="spv-http")
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(contextvars.copy_context().run, fn, *args)
+        )
+
+    async def search(self, search_type, document):
+        """
+        Executa a consulta sem bloquear o event loop e retorna o HTML da
+        página de resultado. Lança `BrowserRequired` quando a página exige o
+        navegador.
+        """
+        return await self._run(self.client.search, search_type, document)
+
+    async def get_page(self, href):
+        """Versão asyncio de `EsajHttpClient.get_page`."""
+        return await self._run(self.client.get_page, href)
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+        self.client.close()
@@ -0,0 +1,167 @@
+"""
+Log de eventos estruturado (JSON lines) do processamento.
+
+Cada evento é uma linha JSON com o instante, o nível, o nome do evento, a
+mensagem e os campos de correlação (Cod_Pesquisa, filtro, worker, durações).
+Quem registra só monta o dicionário e o coloca em uma fila; a serialização
+e a escrita ficam com uma thread própria, de modo que o log não toma tempo
+das consultas. Com a fila cheia o evento é descartado e contado em
+spv_log_events_dropped_total.
+
+Os campos de correlação do trecho em andamento são definidos com
+`events.context(...)` e acompanham todos os eventos registrados dentro do
+bloco (inclusive nas funções chamadas), por thread ou tarefa asyncio.
+Eventos de sucesso por consulta são amostrados (`sample`): só uma fração
+é registrada, com o campo `amostra` para a contagem ser reescalada.
+
+    events.info('consulta', "Consulta concluída.", sample=Config.LOG_SAMPLE_RATE, resultado=1)
+"""
+import atexit
+import contextvars
+import datetime
+import json
+import queue
+import random
+import sys
+import threading
+from contextlib import contextmanager
+
+from app.config import Config
+from app.metrics import registry
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+
+DROPPED = registry.counter('spv_log_events_dropped_total', 'Eventos de log descartados com a fila do escritor cheia.')
+
+_context = contextvars.ContextVar('spv_event_context', default={})
+
+
+class EventLog:
+    """
+    Registro assíncrono de eventos: `emit` enfileira, a thread do escritor
+    grava em `stream` (padrão: stdout, ou LOG_FILE) em blocos. `close()`
+    (também registrado no atexit) grava o que restou na fila.
+    """
+
+    _STOP = object()
+
+    def __init__(self, stream=None, level=None, queue_size=None, batch_size=256):
+        self.stream = stream
+        self.level = LEVELS[(level or Config.LOG_LEVEL).lower()]
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=queue_size or Config.LOG_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        atexit.register(self.close)
+
+    @contextmanager
+    def context(self, **fields):
+        """Campos de correlação acrescentados a todos os eventos registrados no bloco."""
+        token = _context.set({**_context.get(), **fields})
+        try:
+            yield
+        finally:
+            _context.reset(token)
+
+    def emit(self, level, event, message=None, sample=None, **fields):
+        """
+        Enfileira um evento. Com `sample` (fração entre 0 e 1) o evento só é
+        registrado nessa proporção. Nunca bloqueia: com a fila cheia o evento
+        é descartado.
+        """
+        if LEVELS[level] < self.level:
+            return
+        if sample is not None:
+            if sample <= 0 or random.random() >= sample:
+                return
+            fields['amostra'] = sample
+        record = {'ts': datetime.datetime.now(datetime.timezone.utc), 'level': level, 'event': event}
+        if message is not None:
+            record['msg'] = message
+        record.update(_context.get())
+        record.update(fields)
+
+        if self._closed:
+            # Depois do close (fim do processo) o evento é gravado direto
+            self._write([record])
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.inc()
+
+    def debug(self, event, message=None, **fields):
+        self.emit('debug', event, message, **fields)
+
+    def info(self, event, message=None, **fields):
+        self.emit('info', event, message, **fields)
+
+    def warning(self, event, message=None, **fields):
+        self.emit('warning', event, message, **fields)
+
+    def error(self, event, message=None, **fields):
+        self.emit('error', event, message, **fields)
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._run, name="spv-event-log", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Tudo o que já está na fila vai no mesmo bloco (uma escrita e um flush)
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(record is self._STOP for record in batch)
+            self._write([record for record in batch if record is not self._STOP])
+            if stop:
+                return
+
+    def _format(self, record):
+        record['ts'] = record['ts'].isoformat(timespec='milliseconds')
+        return json.dumps(record, ensure_ascii=False, default=str)
+
+    def _write(self, records):
+        if not records:
+            return
+        stream = self._stream()
+        try:
+            stream.write(''.join(self._format(record) + '\n' for record in records))
+            stream.flush()
+        except Exception as e:
+            print(f"Erro ao gravar eventos de log: {e}", file=sys.stderr)
+
+    def _stream(self):
+        if self.stream is None and Config.LOG_FILE:
+            self.stream = open(Config.LOG_FILE, 'a', encoding='utf-8')
+        return self.stream or sys.stdout
+
+    def close(self):
+        """Grava os eventos pendentes e para a thread do escritor."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(self._STOP)
+            thread.join()
+        # Eventos enfileirados por quem ainda não tinha visto o close
+        late = []
+        while True:
+            try:
+                late.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._write([record for record in late if record is not self._STOP])
+
+
+events = EventLog()
@@ -0,0 +1,76 @@
+import threading
+import time
+
+from app.config import Config
+
+
+class Health:
+    """
+    Estado do serviço exposto em `GET /healthz` (liveness: o processo está
+    respondendo) e `GET /readyz` (readiness: o aquecimento terminou e as
+    verificações registradas, como o acesso ao banco, passam).
+
+    As verificações são funções que lançam exceção em caso de falha; o
+    resultado fica em cache por HEALTH_CACHE_SECONDS, de modo que sondas
+    frequentes não disputam as conexões do pool com o processamento.
+    """
+
+    def __init__(self, cache_seconds=None):
+        self.cache_seconds = Config.HEALTH_CACHE_SECONDS if cache_seconds is None else cache_seconds
+        self.started = time.monotonic()
+        self._ready = False
+        self._phase = 'iniciando'
+        self._checks = {}
+        self._cached = None  # (instante, {verificação: erro ou None})
+        self._lock = threading.Lock()
+
+    def add_check(self, name, check):
+        with self._lock:
+            self._checks[name] = check
+            self._cached = None
+
+    def set_phase(self, phase):
+        """Fase da inicialização informada enquanto o serviço não está pronto."""
+        with self._lock:
+            self._phase = phase
+
+    def set_ready(self, ready=True):
+        with self._lock:
+            self._ready = ready
+            self._phase = 'pronto' if ready else 'parado'
+            self._cached = None
+
+    def _run_checks(self):
+        with self._lock:
+            cached = self._cached
+            checks = dict(self._checks)
+        if cached is not None and time.monotonic() - cached[0] < self.cache_seconds:
+            return cached[1]
+        results = {}
+        for name, check in checks.items():
+            try:
+                check()
+                results[name] = None
+            except Exception as e:
+                results[name] = str(e) or type(e).__name__
+        with self._lock:
+            self._cached = (time.monotonic(), results)
+        return results
+
+    def liveness(self):
+        """(status HTTP, corpo) do /healthz."""
+        return 200, {'status': 'ok', 'uptime_seconds': round(time.monotonic() - self.started, 1)}
+
+    def readiness(self):
+        """(status HTTP, corpo) do /readyz: 503 durante o aquecimento ou com alguma verificação falhando."""
+        with self._lock:
+            ready, phase = self._ready, self._phase
+        if not ready:
+            return 503, {'ready': False, 'phase': phase}
+        results = self._run_checks()
+        failed = {name: error for name, error in results.items() if error is not None}
+        body = {'ready': not failed, 'phase': phase, 'checks': {name: error or 'ok' for name, error in results.items()}}
+        return (503 if failed else 200), body
+
+
+health = Health()
@@ -1,14 +1,69 @@
 from app.spv_scraper import SPVAutomatico
+from app.async_pipeline import AsyncPipeline
+from app.config import Config
+from app.health import health
+from app.events import events
+from app.profiler import profiler
+from app.tracing import tracer
+from app.metrics import MetricsServer
+import asyncio
+import os
+import signal
+import sys
+import threading
 import time
 
+
+def _stop(signum, frame):
+    health.set_ready(False)
+    sys.exit(0)
+
+
+def _toggle_trace():
+    if tracer.enabled:
+        tracer.disable()
+        events.info('trace_fim', "Rastreamento desligado.")
+    else:
+        path = Config.TRACE_FILE or os.path.join(Config.DIAGNOSTICS_DIR, 'spv-trace.json')
+        tracer.enable(path)
+        events.info('trace_inicio', "Rastreamento ligado.", arquivo=path, amostra=tracer.sample_rate)
+
+
+def _diagnostics(signum, frame):
+    # kill -USR1: perfil das pilhas pelos próximos PROFILE_SECONDS;
+    # kill -USR2: liga ou desliga o rastreamento das consultas. Em outra
+    # thread: o handler roda na thread principal, que pode estar com os locks
+    # do log ou do tracer
+    target = profiler.start if signum == signal.SIGUSR1 else _toggle_trace
+    threading.Thread(target=target, name="spv-diagnostics", daemon=True).start()
+
+
 if __name__ == "__main__":
-    print("Iniciando a aplicação SPVAutomatico...")
-    # A instância inicial pode ser com um filtro padrão, a lógica de iteração    
-    spv_app = SPVAutomatico(initial_filter=0)
+    events.info('inicio', "Iniciando a aplicação SPVAutomatico...")
+    # As sondas respondem desde o início: /healthz já é 200 e /readyz fica
+    # 503 até o fim do aquecimento
+    if Config.METRICS_PORT:
+        MetricsServer().start()
+    # docker stop envia SIGTERM: convertido em SystemExit para que os blocos
+    # finally gravem os resultados pendentes antes de encerrar
+    signal.signal(signal.SIGTERM, _stop)
+    # Diagnóstico sem reiniciar o serviço (app/profiler.py e app/tracing.py)
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, _diagnostics)
+        signal.signal(signal.SIGUSR2, _diagnostics)
+    if Config.PROFILE_AT_START:
+        profiler.start()
     try:
-        spv_app.run()
+        # A instância inicial pode ser com um filtro padrão, a lógica de iteração
+        spv_app = SPVAutomatico(initial_filter=0)
+        health.set_phase('aquecimento')
+        spv_app.warm_up()
+        health.set_ready()
+        if Config.SPV_RUN_MODE == 'async':
+            asyncio.run(AsyncPipeline(spv_app).run())
+        else:
+            spv_app.run()
     except Exception as e:
-        print(f"Erro fatal na aplicação: {e}")
-        print("A aplicação será encerrada. Verifique os logs.")
+        health.set_ready(False)
+        events.error('erro_fatal', "Erro fatal na aplicação. A aplicação será encerrada.", erro=str(e))
         time.sleep(10) 
-        
\ No newline at end of file
@@ -0,0 +1,294 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.config import Config
+from app.health import health
+from app import tracing
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def values(self):
+        """Cópia dos valores atuais: {((label, valor), ...): contagem}."""
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [contagem por bucket..., soma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observa a duração do bloco, inclusive quando ele lança exceção. Em uma
+        consulta rastreada o bloco também vira um span (app/tracing.py).
+        """
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self.observe(elapsed, **labels)
+            tracing.record(elapsed, self.name, labels)
+
+    def count(self, **labels):
+        with self._lock:
+            series = self._series.get(tuple(sorted(labels.items())))
+            return series[-1] if series else 0
+
+    def counts(self):
+        """Total de observações por conjunto de labels."""
+        with self._lock:
+            return {key: series[-1] for key, series in self._series.items()}
+
+    def quantile(self, q, **labels):
+        """
+        Estimativa do quantil `q` (0-1) a partir dos buckets, interpolando
+        dentro do bucket como o histogram_quantile do Prometheus. Acima do
+        último bucket retorna o limite dele. None sem observações.
+        """
+        with self._lock:
+            series = self._series.get(tuple(sorted(labels.items())))
+            series = list(series) if series else None
+        if not series or not series[-1]:
+            return None
+        rank = q * series[-1]
+        cumulative, lower = 0, 0.0
+        for bound, count in zip(self.buckets, series):
+            if count and cumulative + count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound
+        return float(self.buckets[-1])
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = key + (('le', _format_value(float(bound))),)
+                lines.append(f"{self.name}_bucket{_format_labels(labels)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(float(series[-2]))}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Valor lido na hora da coleta: `fn()` retorna um número ou {labels: valor}."""
+
+    def __init__(self, name, documentation, fn):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.fn()
+        except Exception as e:
+            # app.events importa este módulo (contadores de eventos)
+            from app.events import events
+            events.error('metrica_erro', "Erro ao coletar a métrica.", metrica=self.name, erro=str(e))
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            if value is not None:
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas do processo, exposto no formato texto do Prometheus."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, name, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(self, name, documentation):
+        return self._register(name, lambda: Counter(name, documentation))
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        return self._register(name, lambda: Histogram(name, documentation, buckets))
+
+    def gauge(self, name, documentation, fn):
+        """Registra (ou substitui) um gauge calculado na coleta."""
+        with self._lock:
+            metric = self._metrics[name] = Gauge(name, documentation, fn)
+            return metric
+
+    def reset(self):
+        """Zera contadores e histogramas (benchmarks e testes); gauges não guardam estado."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            if hasattr(metric, 'reset'):
+                metric.reset()
+
+    def expose(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# Latência por estágio do processamento (reserva, consulta, espera pela
+# página, classificação, gravação...) e das operações no banco
+STAGE_SECONDS = registry.histogram('spv_stage_seconds', 'Duração de cada estágio do processamento das pesquisas.')
+DB_SECONDS = registry.histogram('spv_db_query_seconds', 'Duração das operações no PostgreSQL por tipo de chamada.')
+DB_ERRORS = registry.counter('spv_db_errors_total', 'Erros nas operações no PostgreSQL por tipo de chamada.')
+RESULTS = registry.counter('spv_results_total', 'Resultados registrados por filtro e código de resultado.')
+LOOKUPS = registry.counter('spv_lookups_total', 'Consultas ao eSAJ por motor e desfecho.')
+RETRIES = registry.counter('spv_retries_total', 'Consultas que falharam, reagendadas ou esgotadas (resultado 7).')
+NAME_PAGES = registry.counter('spv_name_search_pages_total', 'Páginas lidas nas consultas por nome, por motivo do fim da leitura.')
+
+
+def error_ratio():
+    """Fração dos resultados de cada filtro que terminaram em erro (código 7)."""
+    totals, errors = {}, {}
+    for key, value in RESULTS.values().items():
+        labels = dict(key)
+        filtro = (('filtro', str(labels.get('filtro'))),)
+        totals[filtro] = totals.get(filtro, 0) + value
+        if str(labels.get('resultado')) == '7':
+            errors[filtro] = errors.get(filtro, 0) + value
+    return {filtro: errors.get(filtro, 0) / total for filtro, total in totals.items() if total}
+
+
+registry.gauge('spv_error_ratio', 'Fração dos resultados de cada filtro gravados como erro.', error_ratio)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/metrics':
+            self._send(200, 'text/plain; version=0.0.4; charset=utf-8', registry.expose())
+        elif path in ('/healthz', '/readyz'):
+            status, body = health.liveness() if path == '/healthz' else health.readiness()
+            self._send(status, 'application/json', json.dumps(body))
+        else:
+            self.send_error(404)
+
+    def _send(self, status, content_type, text):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """
+    Servidor HTTP local, em uma thread própria, que expõe `GET /metrics` e as
+    sondas `GET /healthz` e `GET /readyz` (app/health.py).
+    """
+
+    def __init__(self, port=None, host=None):
+        self.port = Config.METRICS_PORT if port is None else port
+        self.host = host or Config.METRICS_HOST
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="spv-metrics", daemon=True)
+        self.thread.start()
+        from app.events import events
+        events.info('metricas_servidor', "Métricas disponíveis em /metrics (sondas em /healthz e /readyz).",
+                    url=f"http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
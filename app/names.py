@@ -0,0 +1,241 @@
+"""
+Consultas por nome (filtro 2, NMPARTE) ao eSAJ.
+
+O nome é normalizado para uma forma canônica (sem acentos, pontuação nem
+espaços extras, em maiúsculas), de modo que variações do mesmo nome caiam em
+uma única consulta; pesquisa_pendente.Nome_Normalizado traz a mesma forma,
+calculada no banco por normaliza_nome(), para agrupar as pendências iguais.
+As duas implementações seguem os mesmos passos, sem depender do locale do
+Python ou do banco, e precisam continuar iguais (ver tests/test_database.py).
+
+Nomes comuns retornam listas com muitas páginas. `NameSearch` lê as páginas
+uma a uma e para assim que o resultado está decidido (Nada Consta ou um
+processo criminal da pessoa). Itens cuja parte não é a pessoa pesquisada
+(nome diferente, ou mãe/nascimento exibidos e diferentes dos da pesquisa)
+são descartados como homônimos; pesquisas diferentes com o mesmo nome
+compartilham as páginas lidas, mas cada uma é classificada com a sua pessoa.
+"""
+import datetime
+import json
+import re
+import string
+import unicodedata
+from collections import namedtuple
+from html import unescape
+
+from app.config import Config
+from app.classifier import (
+    NAME_CAPTURE_PREFIX, NADA_CONSTA, CONSTA_CRIMINAL, CONSTA_CIVEL, ERRO,
+    Classificacao, extract_entries, find_markers,
+)
+
+_NAO_ALFANUMERICO = re.compile(r'[^0-9A-Z]+')
+_APOSTROFOS = re.compile(r"['´`’]")
+# Blocos de diacríticos combinantes, os mesmos removidos por normaliza_nome()
+_DIACRITICOS = re.compile('[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]')
+# Só as letras ASCII vão para maiúsculas (upper() do banco depende do locale)
+_MAIUSCULAS = str.maketrans(string.ascii_lowercase, string.ascii_uppercase)
+
+# Link de paginação da lista de resultados do eSAJ
+_PAGE_LINK = re.compile(r'href="([^"]*trocarPagina\.do\?[^"]*?paginaConsulta=(\d+)[^"]*)"')
+
+# Separador das páginas dentro de uma captura
+_PAGE_SEPARATOR = '\n<!-- spv-pagina -->\n'
+
+# Dados usados para distinguir homônimos: nome da mãe normalizado e data de nascimento
+Pessoa = namedtuple('Pessoa', 'mae nascimento')
+
+
+def normalize_name(nome):
+    """
+    Forma canônica de um nome: sem apóstrofos (D'Ávila -> DAVILA), sem
+    acentos, em maiúsculas, demais sinais (e letras que não se reduzem a
+    A-Z, como ß ou Ø) trocados por espaço e espaços simples.
+    """
+    if not nome:
+        return ''
+    text = unicodedata.normalize('NFKD', _APOSTROFOS.sub('', nome))
+    text = _DIACRITICOS.sub('', text).translate(_MAIUSCULAS)
+    return ' '.join(_NAO_ALFANUMERICO.sub(' ', text).split())
+
+
+def _date(value):
+    if value is None or isinstance(value, datetime.date):
+        return value
+    for fmt in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def pessoa(mae, nascimento):
+    """Pessoa com a mãe normalizada e o nascimento como data (None quando ausentes)."""
+    return Pessoa(normalize_name(mae) or None, _date(nascimento))
+
+
+def next_page_link(page, number):
+    """Link (relativo, como no HTML) da página `number` da lista de resultados ou None."""
+    for match in _PAGE_LINK.finditer(page):
+        if int(match.group(2)) == number:
+            return unescape(match.group(1))
+    return None
+
+
+class _Alvo:
+    """Estado da leitura para um alvo da consulta (uma pessoa, ou qualquer parte com o nome)."""
+
+    def __init__(self, pessoas):
+        self.pessoas = pessoas
+        self.processos = []
+        self.homonimos = 0
+        self.decided = None
+
+    def matches(self, mae, nascimento):
+        if (mae is None and nascimento is None) or not self.pessoas:
+            return True
+        return any(
+            (mae is None or p.mae is None or p.mae == mae)
+            and (nascimento is None or p.nascimento is None or p.nascimento == nascimento)
+            for p in self.pessoas
+        )
+
+
+class NameSearch:
+    """
+    Resultado de uma consulta por nome montado página a página: `feed`
+    recebe cada página e retorna o link da próxima que precisa ser lida, ou
+    None quando o resultado já está decidido, a lista acabou ou o limite de
+    NAME_SEARCH_MAX_PAGES foi atingido (`stop` guarda o motivo).
+
+    `pessoas` são as pessoas atendidas pela consulta (pesquisas diferentes
+    com o mesmo nome). As páginas são lidas uma única vez para todas, mas
+    cada pessoa tem a sua própria classificação e lista de processos: um
+    item é homônimo para as pessoas com quem a mãe ou o nascimento não
+    conferem, e a leitura só para quando o resultado de todas está decidido.
+    Com `juntas`, as pessoas formam um único alvo e um item vale para todas
+    se puder ser de qualquer uma delas (capturas antigas, ver `classify_capture`).
+    """
+
+    def __init__(self, nome, pessoas=(), max_pages=None, juntas=False):
+        self.nome = normalize_name(nome)
+        self.pessoas = list(dict.fromkeys(pessoas))
+        self.max_pages = max_pages or Config.NAME_SEARCH_MAX_PAGES
+        self.pages = []
+        self.stop = None
+        if juntas or not self.pessoas:
+            self.alvos = {tuple(self.pessoas): _Alvo(tuple(self.pessoas))}
+        else:
+            self.alvos = {(p,): _Alvo((p,)) for p in self.pessoas}
+
+    def __repr__(self):
+        return (f"NameSearch({self.nome!r}, {len(self.pages)} páginas, {len(self.alvos)} alvos, "
+                f"{len(self.processos)} processos, {self.homonimos} homônimos, {self.stop})")
+
+    def _alvo(self, pessoa=None):
+        if pessoa is None:
+            return next(iter(self.alvos.values()))
+        return self.alvos[(pessoa,)]
+
+    @property
+    def processos(self):
+        """Processos do primeiro alvo (o único quando a consulta atende uma pessoa)."""
+        return self._alvo().processos
+
+    @property
+    def homonimos(self):
+        """Itens descartados como homônimos no primeiro alvo."""
+        return self._alvo().homonimos
+
+    def feed(self, page):
+        self.pages.append(page)
+        if len(self.pages) == 1:
+            found = find_markers(page)
+            decided = None
+            if 'nada' in found:
+                decided = NADA_CONSTA
+            elif 'consta' not in found:
+                decided = ERRO
+            if decided is not None:
+                for alvo in self.alvos.values():
+                    alvo.decided = decided
+                self.stop = 'decidido'
+                return None
+
+        pendentes = [alvo for alvo in self.alvos.values() if alvo.decided is None]
+        for processo, partes in extract_entries(page):
+            parte = partes.get('parte')
+            if parte and normalize_name(parte) != self.nome:
+                for alvo in pendentes:
+                    alvo.homonimos += 1
+                continue
+            mae = normalize_name(partes.get('mae')) or None
+            nascimento = _date(partes.get('nascimento'))
+            for alvo in pendentes:
+                if not alvo.matches(mae, nascimento):
+                    alvo.homonimos += 1
+                    continue
+                alvo.processos.append(processo)
+                if processo.area == 'Criminal':
+                    # Nenhuma página seguinte muda um Consta Criminal
+                    alvo.decided = CONSTA_CRIMINAL
+        if all(alvo.decided is not None for alvo in self.alvos.values()):
+            self.stop = 'decidido'
+            return None
+
+        link = next_page_link(page, len(self.pages) + 1)
+        if link is None:
+            self.stop = 'ultima'
+            return None
+        if len(self.pages) >= self.max_pages:
+            self.stop = 'limite'
+            return None
+        return link
+
+    def classificacao(self, pessoa=None):
+        """Classificação de `pessoa` (uma das pessoas da consulta) ou do primeiro alvo."""
+        alvo = self._alvo(pessoa)
+        if alvo.decided in (NADA_CONSTA, ERRO):
+            return Classificacao(alvo.decided)
+        if alvo.decided == CONSTA_CRIMINAL:
+            return Classificacao(CONSTA_CRIMINAL, alvo.processos)
+        if alvo.processos:
+            return Classificacao(CONSTA_CIVEL, alvo.processos)
+        if alvo.homonimos:
+            # Todos os processos listados são de homônimos
+            return Classificacao(NADA_CONSTA)
+        # Lista sem itens reconhecíveis: vale só o marcador da primeira página
+        found = find_markers(self.pages[0])
+        return Classificacao(CONSTA_CRIMINAL if 'criminal' in found else CONSTA_CIVEL)
+
+    def capture(self, pessoa=None):
+        """
+        Documento arquivado em spv_pagina para `pessoa` (ou o primeiro alvo):
+        o contexto da consulta (nome e a pessoa) seguido das páginas lidas,
+        reclassificável por `classify_capture`.
+        """
+        context = {
+            'nome': self.nome,
+            'pessoas': [[p.mae, p.nascimento.isoformat() if p.nascimento else None]
+                        for p in self._alvo(pessoa).pessoas],
+        }
+        # Nomes normalizados não contêm '--', então o JSON não fecha o comentário
+        header = f"{NAME_CAPTURE_PREFIX}{json.dumps(context, sort_keys=True)} -->"
+        return header + _PAGE_SEPARATOR + _PAGE_SEPARATOR.join(self.pages)
+
+
+def classify_capture(document):
+    """Classificação de uma captura de `NameSearch.capture`, página a página como na consulta."""
+    header, *pages = document.split(_PAGE_SEPARATOR)
+    context = json.loads(header[len(NAME_CAPTURE_PREFIX):-len(' -->')])
+    search = NameSearch(
+        context['nome'], [pessoa(mae, nascimento) for mae, nascimento in context['pessoas']],
+        max_pages=max(len(pages), 1), juntas=True,
+    )
+    for page in pages:
+        if search.feed(page) is None:
+            break
+    if not search.pages:
+        return Classificacao(ERRO)
+    return search.classificacao()
@@ -0,0 +1,181 @@
+import asyncio
+import select
+import time
+
+import psycopg2
+
+from app.config import Config
+from app.events import events
+
+
+class PesquisaListener:
+    """
+    Escuta (LISTEN) o canal notificado pelo trigger de `pesquisa` e entrega os
+    Cod_Pesquisa de pesquisas novas ou alteradas. Usa uma conexão dedicada,
+    fora do pool. Se a conexão cair, notificações podem ter sido perdidas:
+    `wait` retorna None para que quem chama faça uma varredura completa.
+    """
+
+    def __init__(self, database, channel=None, debounce=None):
+        self.database = database
+        self.channel = channel or Config.NOTIFY_CHANNEL
+        self.debounce = Config.NOTIFY_DEBOUNCE_SECONDS if debounce is None else debounce
+        self.connection = None
+
+    def _connect(self):
+        self.connection = self.database.dedicated_connection()
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {self.channel}")
+        events.info('listen', "Aguardando notificações.", canal=self.channel)
+
+    def start(self):
+        """Abre a conexão e executa o LISTEN. Retorna False se não conseguiu."""
+        try:
+            self._connect()
+            return True
+        except psycopg2.Error as e:
+            self._reset(e)
+            return False
+
+    def _reset(self, error):
+        events.warning('listen_erro', "Conexão do LISTEN perdida. Reconectando na próxima espera.",
+                       canal=self.channel, erro=str(error))
+        self.close()
+
+    def _drain(self, ids):
+        self.connection.poll()
+        while self.connection.notifies:
+            notify = self.connection.notifies.pop(0)
+            try:
+                ids.add(int(notify.payload))
+            except ValueError:
+                events.warning('notificacao_ignorada', "Notificação ignorada.", canal=self.channel, payload=notify.payload)
+
+    def _collect(self, ids):
+        """Após a primeira notificação, agrega a rajada pelo tempo de debounce."""
+        deadline = time.monotonic() + self.debounce
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return ids
+            if select.select([self.connection], [], [], remaining)[0]:
+                self._drain(ids)
+
+    def wait(self, timeout):
+        """
+        Aguarda até `timeout` segundos por notificações. Retorna o conjunto de
+        Cod_Pesquisa notificados (vazio se nada chegou) ou None se a conexão
+        foi reaberta e notificações podem ter sido perdidas.
+        """
+        if self.connection is None:
+            if self.start():
+                return None
+            time.sleep(min(timeout, Config.DB_RETRY_MAX_DELAY))
+            return set()
+
+        ids = set()
+        try:
+            self._drain(ids)
+            if not ids and select.select([self.connection], [], [], timeout)[0]:
+                self._drain(ids)
+            if ids:
+                self._collect(ids)
+        except (psycopg2.Error, OSError) as e:
+            self._reset(e)
+            return None
+        return ids
+
+    async def _wait_readable(self, readable, timeout):
+        ids = set()
+        self._drain(ids)
+        if not ids:
+            try:
+                await asyncio.wait_for(readable.wait(), timeout)
+            except asyncio.TimeoutError:
+                return ids
+            self._drain(ids)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.debounce
+        while ids and (remaining := deadline - loop.time()) > 0:
+            readable.clear()
+            try:
+                await asyncio.wait_for(readable.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+            self._drain(ids)
+        return ids
+
+    async def wait_async(self, timeout):
+        """Equivalente de `wait` para o event loop, sem ocupar uma thread na espera."""
+        loop = asyncio.get_running_loop()
+        if self.connection is None:
+            return await loop.run_in_executor(None, self.wait, timeout)
+
+        fd = self.connection.fileno()
+        readable = asyncio.Event()
+        loop.add_reader(fd, readable.set)
+        error = None
+        try:
+            ids = await self._wait_readable(readable, timeout)
+        except (psycopg2.Error, OSError) as e:
+            ids, error = None, e
+        finally:
+            loop.remove_reader(fd)
+        if error is not None:
+            self._reset(error)
+        return ids
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except psycopg2.Error:
+                pass
+            self.connection = None
+
+
+class SweepSchedule:
+    """
+    Decide entre processar só as pesquisas notificadas e fazer a varredura
+    completa de segurança: a varredura roda a cada `interval` segundos e é
+    antecipada quando notificações podem ter sido perdidas ou quando a
+    rajada é grande demais para ser tratada por Cod_Pesquisa.
+
+    Também espaça os ciclos de retentativas: um ciclo que não reservou nada
+    (a retentativa vencida está travada por outra réplica) dobra a espera
+    até o próximo, de 1s até RETRY_BASE_SECONDS.
+    """
+
+    def __init__(self, interval=None, max_ids=None):
+        self.interval = interval or Config.SWEEP_INTERVAL_SECONDS
+        self.max_ids = max_ids or Config.NOTIFY_MAX_IDS
+        self.next_sweep = 0.0
+        self.retry_backoff = 0.0
+
+    def sweep_due(self):
+        return time.monotonic() >= self.next_sweep
+
+    def swept(self):
+        self.next_sweep = time.monotonic() + self.interval
+
+    def timeout(self):
+        """Tempo máximo de espera por notificações até a próxima varredura."""
+        return max(0.0, self.next_sweep - time.monotonic())
+
+    def retried(self, processed):
+        """Registra um ciclo de retentativas que reservou `processed` pesquisas."""
+        if processed:
+            self.retry_backoff = 0.0
+        else:
+            self.retry_backoff = min(max(self.retry_backoff * 2, 1.0), Config.RETRY_BASE_SECONDS)
+
+    def retry_timeout(self, retry_in):
+        """Espera até o próximo ciclo de retentativas (`retry_in`: de `_next_retry_in`)."""
+        return max(retry_in, self.retry_backoff, 1.0)
+
+    def notified(self, ids):
+        """Retorna as pesquisas a processar agora ou None se a varredura foi antecipada."""
+        if ids is None or len(ids) > self.max_ids:
+            self.next_sweep = 0.0
+            return None
+        return ids
@@ -0,0 +1,64 @@
+import gzip
+import hashlib
+
+from app.config import Config
+
+try:
+    import zstandard
+except ImportError:  # zstd é opcional; sem ele as páginas são gravadas com gzip
+    zstandard = None
+
+CODECS = ('zstd', 'gzip')
+
+
+class PaginaArquivada:
+    """Página do eSAJ comprimida, identificada pelo SHA-256 do HTML original."""
+
+    __slots__ = ('hash', 'codec', 'conteudo', 'tamanho')
+
+    def __init__(self, hash, codec, conteudo, tamanho):
+        self.hash = hash
+        self.codec = codec
+        self.conteudo = conteudo
+        self.tamanho = tamanho
+
+    def __repr__(self):
+        return f"PaginaArquivada({self.hash.hex()[:12]}, {self.codec}, {len(self.conteudo)}/{self.tamanho} bytes)"
+
+
+def default_codec():
+    """PAGE_ARCHIVE_CODEC; 'auto' usa zstd quando o pacote zstandard está instalado."""
+    codec = Config.PAGE_ARCHIVE_CODEC
+    if codec == 'auto':
+        return 'zstd' if zstandard is not None else 'gzip'
+    if codec not in CODECS:
+        raise ValueError(f"Compressão de páginas desconhecida: {codec!r} (use auto, {', '.join(CODECS)})")
+    if codec == 'zstd' and zstandard is None:
+        raise ValueError("PAGE_ARCHIVE_CODEC=zstd exige o pacote zstandard")
+    return codec
+
+
+def compress(data, codec):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=Config.PAGE_ARCHIVE_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=min(Config.PAGE_ARCHIVE_LEVEL, 9), mtime=0)
+
+
+def decompress(data, codec):
+    """HTML original de uma página arquivada com `codec`."""
+    data = bytes(data)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError("Página comprimida com zstd e o pacote zstandard não está instalado")
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return gzip.decompress(data).decode('utf-8')
+
+
+def archive(page, codec=None):
+    """
+    Comprime a página para gravação em spv_pagina. Páginas iguais têm o mesmo
+    hash e são gravadas uma única vez.
+    """
+    data = page.encode('utf-8')
+    codec = codec or default_codec()
+    return PaginaArquivada(hashlib.sha256(data).digest(), codec, compress(data, codec), len(data))
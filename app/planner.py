@@ -0,0 +1,57 @@
+from app.names import pessoa
+from app.result_cache import cache_key
+
+# Filtros consultados em cada ciclo (0: CPF, 1 e 3: RG, 2: nome)
+FILTROS = (0, 1, 2, 3)
+
+
+class Consulta:
+    """
+    Uma consulta distinta ao eSAJ, (tipo de consulta, documento normalizado),
+    e todas as linhas (Cod_Pesquisa, filtro) que recebem o seu resultado.
+    Consultas por nome levam também as pessoas (mãe e nascimento) das
+    pesquisas atendidas, usadas para descartar homônimos.
+    """
+
+    def __init__(self, key, search_filter, document):
+        self.key = key
+        self.search_filter = search_filter
+        self.document = document
+        self.targets = []
+        self.pessoas = []
+
+    def __repr__(self):
+        return f"Consulta({self.key!r}, {len(self.targets)} destinos)"
+
+
+def plan(rows, document_for):
+    """
+    Agrupa as pesquisas reservadas em consultas distintas ao eSAJ.
+
+    `rows` são as linhas de `SPVAutomatico._get_pesquisas`, cuja última coluna
+    traz os filtros ainda sem resultado de cada pesquisa. Filtros que geram a
+    mesma consulta (1 e 3 buscam o mesmo RG, pesquisas com o mesmo CPF ou
+    com variações do mesmo nome) são resolvidos por uma única consulta; as
+    consultas por nome vão ao eSAJ com o nome normalizado. Retorna
+    (consultas, sem_documento), em que `sem_documento` lista os
+    (Cod_Pesquisa, filtro) sem o dado exigido.
+    """
+    consultas = {}
+    sem_documento = []
+    for dados in rows:
+        codPesquisa = dados[1]
+        for search_filter in dados[-1]:
+            document = document_for(dados, search_filter)
+            key = cache_key(search_filter, document) if document else None
+            if not key or not key[1]:
+                sem_documento.append((codPesquisa, search_filter))
+                continue
+            consulta = consultas.get(key)
+            if consulta is None:
+                if key[0] == 'NMPARTE':
+                    document = key[1]
+                consulta = consultas[key] = Consulta(key, search_filter, document)
+            consulta.targets.append((codPesquisa, search_filter))
+            if key[0] == 'NMPARTE':
+                consulta.pessoas.append(pessoa(dados[8], dados[7]))
+    return list(consultas.values()), sem_documento
@@ -0,0 +1,92 @@
+"""
+Profiler por amostragem, ligado sob demanda.
+
+Enquanto roda, uma thread lê a pilha de todas as threads do processo
+(`sys._current_frames`) a cada PROFILE_INTERVAL_MS e conta as pilhas. Ao
+fim de PROFILE_SECONDS grava em DIAGNOSTICS_DIR um arquivo no formato
+"collapsed" (uma pilha por linha, quadros separados por ';', seguida da
+contagem), aceito por flamegraph.pl, speedscope e inferno. Disparado por
+SIGUSR1 (app/main.py) ou no início com PROFILE_AT_START, sem reiniciar o
+serviço e sem dependências externas.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from app.config import Config
+from app.events import events
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame, thread_name):
+    """Pilha de `frame` no formato collapsed, da thread até a função em execução."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ';'.join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Uma sessão de amostragem por vez; `start` durante uma sessão é ignorado."""
+
+    def __init__(self, interval=None, seconds=None, directory=None):
+        self.interval = (interval or Config.PROFILE_INTERVAL_MS) / 1000
+        self.seconds = seconds or Config.PROFILE_SECONDS
+        self.directory = directory or Config.DIAGNOSTICS_DIR
+        self.samples = Counter()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=None):
+        """Começa a amostrar em segundo plano por `seconds`. Retorna False se já está rodando."""
+        with self._lock:
+            if self.running:
+                return False
+            self._thread = threading.Thread(
+                target=self._run, args=(seconds or self.seconds,), name="spv-profiler", daemon=True
+            )
+            self._thread.start()
+        return True
+
+    def sample(self):
+        """Conta a pilha atual de cada thread (menos a do profiler)."""
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != own:
+                self.samples[collapse(frame, names.get(ident, str(ident)))] += 1
+
+    def _run(self, seconds):
+        self.samples = Counter()
+        events.info('perfil_inicio', "Profiler iniciado.", duracao_s=seconds, intervalo_ms=self.interval * 1000)
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self.sample()
+            time.sleep(self.interval)
+        path = self.dump()
+        events.info('perfil_fim', "Perfil gravado.", arquivo=path, amostras=sum(self.samples.values()))
+
+    def dump(self, path=None):
+        """Grava as pilhas contadas no formato collapsed e retorna o caminho."""
+        if path is None:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"spv-profile-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.folded")
+        with open(path, 'w', encoding='utf-8') as output:
+            for stack, count in self.samples.most_common():
+                output.write(f"{stack} {count}\n")
+        return path
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,104 @@
+import math
+import threading
+import time
+from collections import deque
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from app.config import Config
+
+# Marcadores de uma página de resultado do eSAJ já renderizada: mensagem de
+# retorno (Nada Consta), lista de processos, bloco de audiências do processo
+# único ou captcha (que encerra a espera para o resultado ser tratado como erro)
+RESULT_MARKERS = (
+    (By.ID, 'mensagemRetorno'),
+    (By.ID, 'listagemDeProcessos'),
+    (By.XPATH, f"//*[contains(text(), '{Config.CONSTA02}')]"),
+    (By.CSS_SELECTOR, '.g-recaptcha, .h-captcha'),
+)
+
+
+def percentile(samples, pct):
+    """Percentil (método nearest-rank) de uma sequência de amostras."""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class LatencyTracker:
+    """
+    Janela móvel das latências de espera por tipo de consulta. O timeout de
+    cada espera é o percentil configurado da janela multiplicado por um
+    fator de folga, limitado a [minimum, maximum]. Enquanto não há amostras
+    suficientes, vale o máximo.
+    """
+
+    def __init__(self, window=None, pct=None, factor=None, minimum=None, maximum=None, min_samples=None):
+        self.window = window or Config.READINESS_WINDOW
+        self.pct = pct or Config.READINESS_PERCENTILE
+        self.factor = factor or Config.READINESS_TIMEOUT_FACTOR
+        self.minimum = minimum or Config.READINESS_TIMEOUT_MIN
+        self.maximum = maximum or Config.READINESS_TIMEOUT_MAX
+        self.min_samples = min_samples or Config.READINESS_MIN_SAMPLES
+
+        self._samples = {}
+        self._timeouts = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds, timed_out=False):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+            if timed_out:
+                self._timeouts[key] = self._timeouts.get(key, 0) + 1
+
+    def timeout(self, key):
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return self.maximum
+        return min(self.maximum, max(self.minimum, percentile(samples, self.pct) * self.factor))
+
+    def stats(self):
+        """p50/p95, amostras, esperas estouradas e timeout atual por tipo de consulta."""
+        with self._lock:
+            snapshot = {key: list(samples) for key, samples in self._samples.items()}
+            timeouts = dict(self._timeouts)
+        return {
+            key: {
+                'samples': len(samples),
+                'p50': percentile(samples, 50),
+                'p95': percentile(samples, 95),
+                'timeouts': timeouts.get(key, 0),
+                'timeout': self.timeout(key),
+            }
+            for key, samples in snapshot.items()
+        }
+
+
+def wait_for_result(driver, previous, tracker, key):
+    """
+    Aguarda a página de resultado após a submissão do formulário: o elemento
+    `previous` (o botão de consulta) sai do DOM e algum marcador de resultado
+    aparece. A duração é registrada em `tracker` como amostra de latência de
+    `key`; em caso de timeout, o próprio timeout é registrado, o que aumenta
+    o prazo das próximas esperas. Relança TimeoutException.
+    """
+    timeout = tracker.timeout(key)
+    started = time.monotonic()
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(EC.all_of(
+            EC.staleness_of(previous),
+            EC.any_of(*(EC.presence_of_element_located(marker) for marker in RESULT_MARKERS))
+        ))
+    except TimeoutException:
+        tracker.record(key, timeout, timed_out=True)
+        raise
+    tracker.record(key, time.monotonic() - started)
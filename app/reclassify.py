@@ -0,0 +1,198 @@
+"""
+Reclassificação offline das páginas arquivadas em spv_pagina.
+
+Quando o texto do eSAJ muda ou o classificador é corrigido, os resultados
+já gravados são recalculados a partir das páginas guardadas, sem consultar
+o site: cada página distinta é descomprimida e classificada uma vez, em um
+pool de processos, e o novo resultado é gravado em todas as linhas de
+pesquisa_spv que apontam para ela (com os processos encontrados).
+
+    python -m app.reclassify
+    python -m app.reclassify --filtro 2 --desde 2024-01-01 --dry-run
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from app.config import Config
+from app.database import db
+from app.classifier import classify
+from app.page_archive import decompress
+from app.result_writer import ResultWriter
+
+# Páginas referenciadas pelas linhas de pesquisa_spv selecionadas
+PAGES_SQL = """
+    SELECT pg.Hash, pg.Compressao, pg.Conteudo
+    FROM spv_pagina pg
+    WHERE EXISTS (
+        SELECT 1 FROM pesquisa_spv ps
+        WHERE ps.Hash_Pagina = pg.Hash
+          AND (%(filtro)s::int IS NULL OR ps.Filtro = %(filtro)s::int)
+          AND (%(desde)s::timestamp IS NULL OR ps.Data_Registro >= %(desde)s::timestamp)
+    )
+"""
+
+# Os filtros da seleção acompanham cada linha de VALUES (execute_values só expande `VALUES %s`)
+_NOVOS = """
+    WITH novos (Hash_Pagina, Resultado, Filtro, Desde, Todos) AS (
+        VALUES %s
+    )
+"""
+_SELECIONADAS = """
+    ps.Hash_Pagina = n.Hash_Pagina
+    AND (n.Filtro IS NULL OR ps.Filtro = n.Filtro)
+    AND (n.Desde IS NULL OR ps.Data_Registro >= n.Desde)
+    AND (n.Todos OR ps.Resultado IS DISTINCT FROM n.Resultado)
+"""
+NOVOS_TEMPLATE = "(%s::bytea, %s::int, %s::int, %s::timestamp, %s::boolean)"
+
+UPDATE_SQL = _NOVOS + f"""
+    UPDATE pesquisa_spv ps
+    SET Resultado = n.Resultado,
+        Data_Registro = CURRENT_TIMESTAMP
+    FROM novos n, pesquisa_spv antigo
+    WHERE antigo.Cod_Pesquisa_SPV = ps.Cod_Pesquisa_SPV
+      AND {_SELECIONADAS}
+    RETURNING ps.Cod_Pesquisa, ps.Filtro, ps.Hash_Pagina, antigo.Resultado, n.Resultado
+"""
+
+PREVIEW_SQL = _NOVOS + f"""
+    SELECT ps.Cod_Pesquisa, ps.Filtro, ps.Hash_Pagina, ps.Resultado, n.Resultado
+    FROM pesquisa_spv ps
+    INNER JOIN novos n ON {_SELECIONADAS}
+"""
+
+CLEAR_PROCESSES_SQL = """
+    DELETE FROM pesquisa_spv_processo pp
+    USING (VALUES %s) AS v (Cod_Pesquisa, Filtro)
+    WHERE pp.Cod_Pesquisa = v.Cod_Pesquisa AND pp.Filtro = v.Filtro
+"""
+
+
+def classify_pages(rows):
+    """
+    Executado nos processos do pool: (hash, compressão, conteúdo) ->
+    (hash, resultado, processos). Páginas que não podem ser lidas ficam de fora.
+    """
+    classified = []
+    for page_hash, codec, data in rows:
+        try:
+            classificacao = classify(decompress(data, codec))
+        except Exception as e:
+            print(f"Página {page_hash.hex()[:12]} não pôde ser reclassificada: {e}")
+            continue
+        classified.append((page_hash, classificacao.result, [tuple(p) for p in classificacao.processos]))
+    return classified
+
+
+class Reclassifier:
+    """
+    Lê as páginas em blocos por um cursor do servidor, classifica os blocos
+    em paralelo (no máximo 2 blocos por processo em andamento, para não
+    acumular páginas na memória) e grava os resultados que mudaram.
+    Com `todos` as linhas são regravadas (e os processos substituídos) mesmo
+    sem mudança no resultado; com `dry_run` nada é gravado.
+    """
+
+    def __init__(self, database, processes=None, chunk=None, filtro=None, desde=None, todos=False, dry_run=False):
+        self.database = database
+        self.processes = processes or Config.RECLASSIFY_PROCESSES or os.cpu_count() or 1
+        self.chunk = chunk or Config.RECLASSIFY_CHUNK
+        self.filtro = filtro
+        self.desde = desde
+        self.todos = todos
+        self.dry_run = dry_run
+
+        self.pages = 0
+        self.rows = 0
+        self.transitions = Counter()  # (resultado antigo, novo) -> linhas
+
+    def apply(self, classified):
+        """Grava (ou só conta, em dry-run) os novos resultados de um bloco de páginas."""
+        if not classified:
+            return
+        self.pages += len(classified)
+        values = [(page_hash, result, self.filtro, self.desde, self.todos) for page_hash, result, _ in classified]
+        if self.dry_run:
+            changed = self.database.execute_values(PREVIEW_SQL, values, template=NOVOS_TEMPLATE, fetch=True)
+        else:
+            changed = self.database.execute_values(UPDATE_SQL, values, template=NOVOS_TEMPLATE, fetch=True)
+        changed = changed or []
+        self.rows += len(changed)
+        self.transitions.update((antigo, novo) for _, _, _, antigo, novo in changed)
+        if not self.dry_run and changed:
+            self._write_processes(changed, {page_hash: processos for page_hash, _, processos in classified})
+
+    def _write_processes(self, changed, processos_by_hash):
+        process_rows, empty = [], []
+        for cod_pesquisa, search_filter, page_hash, _, _ in changed:
+            processos = processos_by_hash.get(bytes(page_hash))
+            if processos:
+                process_rows.extend((cod_pesquisa, search_filter) + processo for processo in processos)
+            else:
+                empty.append((cod_pesquisa, search_filter))
+        if process_rows:
+            self.database.execute_values(
+                ResultWriter.PROCESS_SQL, process_rows, template=ResultWriter.PROCESS_TEMPLATE
+            )
+        if empty:
+            self.database.execute_values(CLEAR_PROCESSES_SQL, empty, template="(%s::int, %s::int)")
+
+    def run(self):
+        params = {'filtro': self.filtro, 'desde': self.desde}
+        started = time.monotonic()
+        with ProcessPoolExecutor(max_workers=self.processes) as executor:
+            pending = set()
+            for rows in self.database.iterate(PAGES_SQL, params, batch_size=self.chunk):
+                # memoryview (bytea) não é serializável para os processos
+                chunk = [(bytes(page_hash), codec, bytes(data)) for page_hash, codec, data in rows]
+                pending.add(executor.submit(classify_pages, chunk))
+                if len(pending) >= self.processes * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.apply(future.result())
+                    print(f"{self.pages} páginas reclassificadas, {self.rows} resultados alterados...")
+            for future in pending:
+                self.apply(future.result())
+        return time.monotonic() - started
+
+    def summary(self, elapsed):
+        verb = "seriam alterados" if self.dry_run else "alterados"
+        lines = [f"{self.pages} páginas reclassificadas em {elapsed:.1f}s "
+                 f"({self.pages / elapsed if elapsed else 0:.0f}/s); {self.rows} resultados {verb}."]
+        for (antigo, novo), total in sorted(self.transitions.items(), key=lambda item: (-item[1], item[0])):
+            lines.append(f"  {antigo} -> {novo}: {total}")
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reclassifica os resultados a partir das páginas arquivadas.")
+    parser.add_argument('--filtro', type=int, help="só as linhas deste filtro")
+    parser.add_argument('--desde', help="só as linhas registradas a partir desta data (AAAA-MM-DD)")
+    parser.add_argument('--processes', type=int, help="processos de classificação (padrão: RECLASSIFY_PROCESSES)")
+    parser.add_argument('--chunk', type=int, help="páginas por bloco (padrão: RECLASSIFY_CHUNK)")
+    parser.add_argument('--all', dest='todos', action='store_true',
+                        help="regrava todas as linhas e processos, mesmo sem mudança no resultado")
+    parser.add_argument('--dry-run', action='store_true', help="só conta o que mudaria")
+    parser.add_argument('--clear-cache', action='store_true',
+                        help="esvazia spv_cache_consulta ao final (o cache não guarda a página de origem)")
+    args = parser.parse_args(argv)
+
+    reclassifier = Reclassifier(
+        db, processes=args.processes, chunk=args.chunk, filtro=args.filtro, desde=args.desde,
+        todos=args.todos, dry_run=args.dry_run,
+    )
+    print(f"Reclassificando páginas arquivadas com {reclassifier.processes} processos...")
+    elapsed = reclassifier.run()
+    print(reclassifier.summary(elapsed))
+    if args.clear_cache and not args.dry_run:
+        removed = db.execute("DELETE FROM spv_cache_consulta")
+        print(f"{removed} entradas removidas do cache de consultas.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
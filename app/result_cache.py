@@ -0,0 +1,191 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import Config
+from app.esaj_http import search_field
+from app.names import normalize_name
+from app.events import events
+
+
+def normalize_document(field, document):
+    """
+    Normaliza o documento consultado para que variações de formatação caiam
+    na mesma chave: CPF/RG só com letras e dígitos, nomes na forma canônica
+    de app.names (sem acento e pontuação, em maiúsculas e com espaços simples).
+    """
+    if field == 'DOCPARTE':
+        return re.sub(r'[^0-9A-Za-z]', '', document).upper()
+    return normalize_name(document)
+
+
+def cache_key(search_filter, document):
+    """
+    Chave da consulta: (tipo de consulta do eSAJ, documento normalizado). Agrupa
+    as consultas iguais no planejamento; só as DOCPARTE vão para o cache.
+    """
+    field = search_field(search_filter)
+    return field, normalize_document(field, document)
+
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    """
+    Cache do resultado das consultas ao eSAJ por (tipo de consulta, documento).
+
+    Camada em memória com TTL e descarte LRU e, opcionalmente, uma camada
+    persistente na tabela spv_cache_consulta, compartilhada entre réplicas e
+    reinícios. `get_or_load` coalesce consultas simultâneas da mesma chave:
+    só a primeira vai ao eSAJ, as demais aguardam o resultado dela.
+    Resultados de erro (7) não são armazenados.
+
+    Só as consultas por documento (DOCPARTE) são armazenadas. O resultado de
+    uma consulta por nome depende da pessoa pesquisada (homônimos são
+    separados pela mãe e pelo nascimento), então não pode ser reaproveitado
+    por outra pesquisa com o mesmo nome: chaves NMPARTE sempre carregam.
+    """
+
+    UNCACHEABLE = (None, 7)
+    CACHED_FIELDS = ('DOCPARTE',)
+
+    def __init__(self, database=None, ttl=None, max_entries=None, persistent=None):
+        self.database = database
+        self.ttl = ttl or Config.RESULT_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or Config.RESULT_CACHE_MAX_ENTRIES
+        self.persistent = (Config.RESULT_CACHE_PERSISTENT if persistent is None else persistent) and database is not None
+
+        self._entries = OrderedDict()  # chave -> (valor, expira_em)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _put_memory(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + (ttl or self.ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_persistent(self, key):
+        sql = """
+            SELECT Resultado, EXTRACT(EPOCH FROM (Data_Consulta + make_interval(secs => %s) - CURRENT_TIMESTAMP))
+            FROM spv_cache_consulta
+            WHERE Tipo_Consulta = %s AND Documento = %s
+              AND Data_Consulta > CURRENT_TIMESTAMP - make_interval(secs => %s)
+        """
+        try:
+            rows = self.database.fetchall(sql, (self.ttl, key[0], key[1], self.ttl))
+        except Exception as e:
+            events.warning('cache_erro', "Erro ao consultar cache persistente.", erro=str(e))
+            return None
+        if not rows:
+            return None
+        value, remaining = rows[0]
+        # Na memória a entrada vale só pelo tempo que resta no cache persistente
+        self._put_memory(key, value, ttl=float(remaining))
+        return value
+
+    def _put_persistent(self, key, value):
+        sql = """
+            INSERT INTO spv_cache_consulta (Tipo_Consulta, Documento, Resultado, Data_Consulta)
+            VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (Tipo_Consulta, Documento) DO UPDATE
+                SET Resultado = EXCLUDED.Resultado, Data_Consulta = EXCLUDED.Data_Consulta
+        """
+        try:
+            self.database.execute(sql, (key[0], key[1], value))
+        except Exception as e:
+            events.warning('cache_erro', "Erro ao gravar cache persistente.", erro=str(e))
+
+    def cacheable(self, key):
+        return key[0] in self.CACHED_FIELDS
+
+    def get(self, key):
+        """Retorna o valor em cache (memória e depois persistente) ou None."""
+        if not self.cacheable(key):
+            return None
+        value = self._get_memory(key)
+        if value is None and self.persistent:
+            value = self._get_persistent(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if value in self.UNCACHEABLE or not self.cacheable(key):
+            return
+        self._put_memory(key, value)
+        if self.persistent:
+            self._put_persistent(key, value)
+
+    def get_or_load(self, key, loader):
+        """
+        Retorna o valor da chave, chamando `loader()` só em caso de miss.
+        Chamadas concorrentes para a mesma chave aguardam a carga em andamento.
+        Chaves que não vão para o cache chamam sempre o `loader`.
+        """
+        if not self.cacheable(key):
+            return loader()
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            owner = inflight is None
+            if owner:
+                inflight = self._inflight[key] = _InFlight()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            inflight.event.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.value
+
+        try:
+            inflight.value = loader()
+            self.put(key, inflight.value)
+            return inflight.value
+        except Exception as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            inflight.event.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+            }
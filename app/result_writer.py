@@ -0,0 +1,260 @@
+import atexit
+import threading
+
+from app.config import Config
+from app.metrics import STAGE_SECONDS, RESULTS, RETRIES
+from app.events import events
+
+
+class ResultWriter:
+    """
+    Acumula os resultados das pesquisas e os grava em lote em pesquisa_spv,
+    quando o buffer atinge `batch_size` ou a cada `flush_interval` segundos.
+
+    A gravação usa ON CONFLICT na chave (Cod_Pesquisa, Cod_SPV, Filtro), então
+    repetir um lote (retentativa após falha, workers paralelos, réplicas) não
+    cria linhas duplicadas. O trigger de pesquisa_spv tira cada (pesquisa,
+    filtro) gravada de pesquisa_pendente, o que também libera o lease. Se o
+    lote falhar os resultados voltam ao buffer para a próxima tentativa em
+    vez de serem descartados. `close()` (também registrado no atexit)
+    garante o flush final no encerramento.
+
+    Os processos extraídos da página acompanham o resultado e são gravados
+    no mesmo flush em pesquisa_spv_processo, substituindo a lista anterior
+    da mesma (pesquisa, filtro). A página comprimida (app/page_archive.py)
+    vai para spv_pagina no mesmo comando do resultado, que passa a
+    referenciá-la em Hash_Pagina.
+
+    Consultas que falharam entram pelo `retry`: no flush a linha de
+    pesquisa_pendente tem o lease liberado e volta à fila só em
+    Proxima_Tentativa, com espera exponencial pelo número de falhas e
+    jitter. Ao atingir RETRY_MAX_ATTEMPTS falhas o resultado 7 é gravado no
+    mesmo comando.
+    """
+
+    # Valores fixos gravados pelo robô: Cod_SPV, Cod_spv_computador, Cod_Funcionario e Website_ID
+    COD_SPV = 1
+    COD_SPV_COMPUTADOR = 36
+    COD_FUNCIONARIO = -1
+    WEBSITE_ID = 1
+
+    SQL = """
+        WITH novos (Cod_Pesquisa, Cod_SPV, Cod_spv_computador, Cod_Spv_Tipo, Resultado, Cod_Funcionario, Filtro, Website_ID,
+                    Hash_Pagina, Compressao, Conteudo, Tamanho) AS (
+            VALUES %s
+        ),
+        paginas AS (
+            INSERT INTO spv_pagina (Hash, Compressao, Conteudo, Tamanho)
+            SELECT DISTINCT ON (Hash_Pagina) Hash_Pagina, Compressao, Conteudo, Tamanho
+            FROM novos
+            WHERE Hash_Pagina IS NOT NULL
+            ON CONFLICT (Hash) DO NOTHING
+        )
+        INSERT INTO pesquisa_spv
+            (Cod_Pesquisa, Cod_SPV, Cod_spv_computador, Cod_Spv_Tipo, Resultado, Cod_Funcionario, Filtro, Website_ID,
+             Hash_Pagina)
+        SELECT Cod_Pesquisa, Cod_SPV, Cod_spv_computador, Cod_Spv_Tipo, Resultado, Cod_Funcionario, Filtro, Website_ID,
+               Hash_Pagina
+        FROM novos
+        ON CONFLICT (Cod_Pesquisa, Cod_SPV, Filtro) DO UPDATE
+            SET Resultado = EXCLUDED.Resultado,
+                -- Resultado vindo do cache não traz página: mantém a anterior
+                Hash_Pagina = COALESCE(EXCLUDED.Hash_Pagina, pesquisa_spv.Hash_Pagina),
+                Data_Registro = CURRENT_TIMESTAMP
+            WHERE (pesquisa_spv.Resultado, pesquisa_spv.Hash_Pagina)
+                IS DISTINCT FROM (EXCLUDED.Resultado, COALESCE(EXCLUDED.Hash_Pagina, pesquisa_spv.Hash_Pagina))
+    """
+    TEMPLATE = ("(%s::int, %s::int, %s::int, %s::int, %s::int, %s::int, %s::int, %s::int, "
+                "%s::bytea, %s, %s::bytea, %s::int)")
+
+    PROCESS_SQL = """
+        WITH novos (Cod_Pesquisa, Filtro, Numero_Processo, Classe, Assunto, Foro, Area, Data_Distribuicao) AS (
+            VALUES %s
+        ),
+        removidos AS (
+            DELETE FROM pesquisa_spv_processo pp
+            USING (SELECT DISTINCT Cod_Pesquisa, Filtro FROM novos) n
+            WHERE pp.Cod_Pesquisa = n.Cod_Pesquisa AND pp.Filtro = n.Filtro
+              AND NOT EXISTS (
+                  SELECT 1 FROM novos x
+                  WHERE x.Cod_Pesquisa = pp.Cod_Pesquisa AND x.Filtro = pp.Filtro
+                    AND x.Numero_Processo = pp.Numero_Processo
+              )
+        )
+        INSERT INTO pesquisa_spv_processo
+            (Cod_Pesquisa, Filtro, Numero_Processo, Classe, Assunto, Foro, Area, Data_Distribuicao)
+        SELECT DISTINCT ON (Cod_Pesquisa, Filtro, Numero_Processo) * FROM novos
+        ON CONFLICT (Cod_Pesquisa, Filtro, Numero_Processo) DO UPDATE
+            SET Classe = EXCLUDED.Classe,
+                Assunto = EXCLUDED.Assunto,
+                Foro = EXCLUDED.Foro,
+                Area = EXCLUDED.Area,
+                Data_Distribuicao = EXCLUDED.Data_Distribuicao
+    """
+    PROCESS_TEMPLATE = "(%s::int, %s::int, %s, %s, %s, %s, %s, %s::date)"
+
+    RETRY_SQL = f"""
+        WITH falhas (Cod_Pesquisa, Filtro, Erro, Base, Maximo, Max_Tentativas) AS (
+            VALUES %s
+        ),
+        adiadas AS (
+            -- Espera de Base * 2^(falhas anteriores), até Maximo, sorteada entre metade e o total
+            UPDATE pesquisa_pendente pp
+            SET Tentativas = pp.Tentativas + 1,
+                Proxima_Tentativa = CURRENT_TIMESTAMP + make_interval(
+                    secs => LEAST(f.Maximo, f.Base * power(2, pp.Tentativas)) * (0.5 + random() / 2)
+                ),
+                Ultimo_Erro = f.Erro,
+                Worker_ID = NULL,
+                Lease_Ate = NULL
+            FROM falhas f
+            WHERE pp.Cod_Pesquisa = f.Cod_Pesquisa AND pp.Filtro = f.Filtro
+            RETURNING pp.Cod_Pesquisa, pp.Filtro, pp.Tentativas >= f.Max_Tentativas AS Esgotada
+        ),
+        esgotadas AS (
+            INSERT INTO pesquisa_spv
+                (Cod_Pesquisa, Cod_SPV, Cod_spv_computador, Cod_Spv_Tipo, Resultado, Cod_Funcionario, Filtro, Website_ID)
+            SELECT Cod_Pesquisa, {COD_SPV}, {COD_SPV_COMPUTADOR}, NULL, 7, {COD_FUNCIONARIO}, Filtro, {WEBSITE_ID}
+            FROM adiadas
+            WHERE Esgotada
+            ON CONFLICT (Cod_Pesquisa, Cod_SPV, Filtro) DO UPDATE
+                SET Resultado = EXCLUDED.Resultado,
+                    Data_Registro = CURRENT_TIMESTAMP
+                WHERE pesquisa_spv.Resultado IS DISTINCT FROM EXCLUDED.Resultado
+        )
+        SELECT Cod_Pesquisa, Filtro, Esgotada FROM adiadas
+    """
+    RETRY_TEMPLATE = "(%s::int, %s::int, %s, %s::float8, %s::float8, %s::int)"
+
+    def __init__(self, database, batch_size=None, flush_interval=None):
+        self.database = database
+        self.batch_size = batch_size or Config.RESULT_BATCH_SIZE
+        self.flush_interval = flush_interval or Config.RESULT_FLUSH_SECONDS
+
+        # Chave -> linha; um resultado mais novo para a mesma chave substitui o anterior
+        self._buffer = {}
+        # (Cod_Pesquisa, Filtro) -> linhas de pesquisa_spv_processo
+        self._processes = {}
+        # (Cod_Pesquisa, Filtro) -> falha a reagendar
+        self._retries = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        atexit.register(self.close)
+
+    def _row(self, cod_pesquisa, result, search_filter, pagina=None):
+        row = (cod_pesquisa, self.COD_SPV, self.COD_SPV_COMPUTADOR, None,
+               result, self.COD_FUNCIONARIO, search_filter, self.WEBSITE_ID)
+        if pagina is None:
+            return row + (None, None, None, None)
+        return row + (pagina.hash, pagina.codec, pagina.conteudo, pagina.tamanho)
+
+    def _ensure_thread(self):
+        if self._thread is None and not self._stop.is_set():
+            self._thread = threading.Thread(target=self._run, name="spv-result-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def add(self, cod_pesquisa, result, search_filter, processos=None, pagina=None):
+        """
+        Enfileira um resultado (e os processos encontrados e a página
+        arquivada, se houver); grava o lote se o buffer estiver cheio.
+        """
+        with self._lock:
+            self._ensure_thread()
+            self._buffer[(cod_pesquisa, self.COD_SPV, search_filter)] = self._row(
+                cod_pesquisa, result, search_filter, pagina
+            )
+            self._retries.pop((cod_pesquisa, search_filter), None)
+            if processos:
+                self._processes[(cod_pesquisa, search_filter)] = [
+                    (cod_pesquisa, search_filter) + tuple(processo) for processo in processos
+                ]
+            else:
+                self._processes.pop((cod_pesquisa, search_filter), None)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def retry(self, cod_pesquisa, search_filter, error):
+        """
+        Enfileira a falha de uma consulta: no flush a (pesquisa, filtro) é
+        reagendada ou, esgotadas as tentativas, recebe o resultado 7.
+        """
+        with self._lock:
+            self._ensure_thread()
+            self._buffer.pop((cod_pesquisa, self.COD_SPV, search_filter), None)
+            self._processes.pop((cod_pesquisa, search_filter), None)
+            self._retries[(cod_pesquisa, search_filter)] = (
+                cod_pesquisa, search_filter, str(error)[:255],
+                Config.RETRY_BASE_SECONDS, Config.RETRY_MAX_SECONDS, Config.RETRY_MAX_ATTEMPTS,
+            )
+            full = len(self._buffer) + len(self._retries) >= self.batch_size
+        if full:
+            self.flush()
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer) + len(self._retries)
+
+    def flush(self):
+        """Grava tudo o que está no buffer. Retorna a quantidade de resultados gravados."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer and not self._processes and not self._retries:
+                    return 0
+                batch, self._buffer = self._buffer, {}
+                processes, self._processes = self._processes, {}
+                retries, self._retries = self._retries, {}
+
+            written = len(batch)
+            try:
+                with STAGE_SECONDS.time(stage='persist'):
+                    if batch:
+                        self.database.execute_values(self.SQL, list(batch.values()), template=self.TEMPLATE)
+                        events.debug('lote_gravado', "Resultados gravados em pesquisa_spv.", resultados=written)
+                        # Se só os processos falharem, apenas eles voltam ao buffer
+                        batch = {}
+                    if processes:
+                        rows = [row for linhas in processes.values() for row in linhas]
+                        self.database.execute_values(self.PROCESS_SQL, rows, template=self.PROCESS_TEMPLATE)
+                        processes = {}
+                    if retries:
+                        self._write_retries(retries)
+                return written
+            except Exception as e:
+                events.error('lote_erro', "Erro ao gravar lote; será regravado no próximo flush.",
+                             resultados=len(batch), processos=len(processes), retentativas=len(retries), erro=str(e))
+                with self._lock:
+                    # Resultados mais novos que chegaram durante a falha têm precedência
+                    batch.update(self._buffer)
+                    self._buffer = batch
+                    processes.update(self._processes)
+                    self._processes = processes
+                    retries.update(self._retries)
+                    self._retries = retries
+                return 0
+
+    def _write_retries(self, retries):
+        rows = self.database.execute_values(
+            self.RETRY_SQL, list(retries.values()), template=self.RETRY_TEMPLATE, fetch=True
+        ) or []
+        exhausted = [(cod_pesquisa, search_filter) for cod_pesquisa, search_filter, esgotada in rows if esgotada]
+        for cod_pesquisa, search_filter in exhausted:
+            RESULTS.inc(filtro=search_filter, resultado=7)
+        RETRIES.inc(len(rows) - len(exhausted), outcome='rescheduled')
+        RETRIES.inc(len(exhausted), outcome='exhausted')
+        events.info('retentativas', "Consultas reagendadas; as com tentativas esgotadas recebem o resultado 7.",
+                    reagendadas=len(rows) - len(exhausted), esgotadas=[cod for cod, _ in exhausted])
+
+    def close(self):
+        """Para o flush periódico e grava o que restou no buffer."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
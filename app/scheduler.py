@@ -0,0 +1,39 @@
+import threading
+from collections import deque
+
+from app.config import Config
+from app.readiness import percentile
+
+
+class QueueWaitTracker:
+    """
+    Espera na fila (Data_Entrada até a reserva pelo serviço) das últimas
+    pesquisas reservadas, para acompanhar o tempo de atendimento da fila.
+    """
+
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self, window=None):
+        self._samples = deque(maxlen=window or Config.QUEUE_WAIT_WINDOW)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record_many(self, seconds):
+        with self._lock:
+            for value in seconds:
+                self._samples.append(float(value))
+                self.count += 1
+
+    def percentiles(self):
+        """Percentis (em segundos) da espera na janela recente, ou {} sem amostras."""
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return {}
+        return {f"p{pct}": percentile(samples, pct) for pct in self.PERCENTILES}
+
+    def summary(self):
+        stats = self.percentiles()
+        if not stats:
+            return "Espera na fila: sem amostras."
+        return "Espera na fila: " + ", ".join(f"{name} {value:.1f}s" for name, value in stats.items())
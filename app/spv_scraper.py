@@ -1,239 +1,750 @@
 import datetime
 import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from tqdm import tqdm
+from selenium.common.exceptions import TimeoutException
 import sys
 import os
 
 from app.config import Config
 from app.database import db 
+from app.browser_pool import BrowserPool
+from app.browser_profile import browser_profile
+from app.workers import WorkerPool, progress_bar
+from app.result_writer import ResultWriter
+from app.result_cache import ResultCache
+from app.planner import FILTROS, plan
+from app.scheduler import QueueWaitTracker
+from app.classifier import classify
+from app.notifier import PesquisaListener, SweepSchedule
+from app.esaj_http import EsajHttpClient, BrowserRequired, engine_for, search_field, is_blocked, lookup_outcome
+from app.concurrency import AimdLimiter, CircuitBreaker, LookupFailed, SelenoidStatus, BLOCKED, ERROR, TIMEOUT
+from app.readiness import LatencyTracker, wait_for_result
+from app.page_archive import archive
+from app.names import NameSearch
+from app.metrics import registry, STAGE_SECONDS, LOOKUPS, RESULTS, NAME_PAGES
+from app.health import health
+from app.events import events
+from app.tracing import span, tracer
 
 class SPVAutomatico:
-    def __init__(self, initial_filter=0):
+    def __init__(self, initial_filter=0, workers=None):
         self.current_filter = initial_filter
-        self.driver = None 
+        self.workers = workers or Config.SPV_WORKERS
+        self.browser_profile = browser_profile()
+        # Cada worker precisa de uma sessão própria do navegador
+        self.browser_pool = BrowserPool(
+            self._init_selenium_driver,
+            size=max(Config.SELENOID_POOL_SIZE, self.workers)
+        )
+        self.http_client = EsajHttpClient(pool_size=max(Config.ESAJ_HTTP_POOL_SIZE, self.workers))
+        self.result_writer = ResultWriter(db)
+        self.result_cache = ResultCache(db)
+        self.readiness = LatencyTracker()
+        self.queue_wait = QueueWaitTracker()
+        # Consultas em voo e taxa ajustadas pelo comportamento do eSAJ; no
+        # navegador o teto também acompanha as vagas livres no Selenoid
+        self.http_limiter = AimdLimiter(
+            'http', maximum=max(Config.ESAJ_HTTP_POOL_SIZE, self.workers), classify=lookup_outcome
+        )
+        self.browser_limiter = AimdLimiter(
+            'selenium', maximum=self.browser_pool.size,
+            classify=lambda error: TIMEOUT if isinstance(error, TimeoutException) else ERROR
+        )
+        self.selenoid = SelenoidStatus()
+        # Suspende as consultas ao eSAJ quando a maioria delas está falhando
+        self.breaker = CircuitBreaker('esaj')
+        self._register_metrics()
+        # /readyz só responde 200 enquanto o banco atende dentro do prazo
+        health.add_check('database', lambda: db.ping(Config.HEALTH_DB_TIMEOUT))
+
+    def warm_up(self):
+        """
+        Aquecimento antes do primeiro ciclo: abre em paralelo as conexões do
+        pool do banco e, se algum tipo de consulta usa o navegador como motor,
+        as sessões do Selenoid. Nada é aberto no construtor nem na importação.
+        Lança o erro de conexão se o banco não puder ser acessado; sessões que
+        falharem são criadas depois, sob demanda.
+        """
+        browser = any(engine_for(search_filter) == 'selenium' for search_filter in FILTROS)
+        started = time.monotonic()
+        with STAGE_SECONDS.time(stage='warm_up'), \
+                ThreadPoolExecutor(max_workers=2, thread_name_prefix="spv-warmup") as executor:
+            connections = executor.submit(db.warm_up, Config.WARMUP_DB_CONNECTIONS or None)
+            sessions = None
+            if browser:
+                sessions = executor.submit(self.browser_pool.warm_up, Config.WARMUP_BROWSER_SESSIONS or None)
+            opened = connections.result()
+            created = sessions.result() if sessions else 0
+        events.info('aquecimento', "Aquecimento concluído.", duracao_s=round(time.monotonic() - started, 3),
+                    conexoes=opened, sessoes=created)
+
+    def _register_metrics(self):
+        """Gauges lidos a cada coleta do endpoint de métricas."""
+        registry.gauge('spv_db_pool_connections', 'Conexões do pool do PostgreSQL por estado.',
+                       lambda: {(('estado', estado),): db.stats()[estado] for estado in ('in_use', 'idle', 'waiting')})
+        registry.gauge('spv_queue_wait_seconds', 'Percentis da espera na fila das pesquisas reservadas.',
+                       lambda: {(('percentil', name),): value for name, value in self.queue_wait.percentiles().items()})
+        registry.gauge('spv_readiness_timeout_seconds', 'Timeout atual da espera pelo resultado por tipo de consulta.',
+                       lambda: {(('consulta', key),): stats['timeout'] for key, stats in self.readiness.stats().items()})
+        registry.gauge('spv_result_cache', 'Entradas, acertos e faltas do cache de resultados.',
+                       lambda: {(('tipo', name),): value for name, value in self.result_cache.stats().items()})
+        registry.gauge('spv_result_writer_pending', 'Resultados aguardando gravação em lote.',
+                       self.result_writer.pending)
+        registry.gauge('spv_lookup_limit', 'Limites atuais do controle de consultas por motor.',
+                       lambda: {
+                           (('engine', limiter.name), ('tipo', name)): limiter.stats()[name]
+                           for limiter in (self.http_limiter, self.browser_limiter)
+                           for name in ('limit', 'maximum', 'rate', 'in_flight')
+                       })
+        registry.gauge('spv_circuit_open', 'Circuit breaker das consultas: 0 fechado, 1 meio-aberto, 2 aberto.',
+                       lambda: {(('circuito', self.breaker.name),): ('closed', 'half_open', 'open').index(self.breaker.state)})
 
     def _init_selenium_driver(self):
-        """Inicializa o driver do Selenium para Selenoid."""
-        options = webdriver.ChromeOptions() 
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--headless") 
+        """
+        Cria uma nova sessão do Selenium no Selenoid (usado pelo pool de
+        sessões) com as opções e o bloqueio de recursos do perfil BROWSER_PROFILE.
+        """
+        options = self.browser_profile.options()
 
         try:
-            self.driver = webdriver.Remote(
-                command_executor=Config.SELENOID_HUB_URL,
-                options=options
-            )
-            print("Driver Selenium conectado ao Selenoid.")
+            with STAGE_SECONDS.time(stage='session_create'):
+                driver = webdriver.Remote(
+                    command_executor=Config.SELENOID_HUB_URL,
+                    options=options
+                )
+                self.browser_profile.apply(driver)
+            events.info('sessao_criada', "Driver Selenium conectado ao Selenoid.", perfil=self.browser_profile.name)
+            return driver
             
         except Exception as e:
-            print(f"Erro ao conectar ao Selenoid: {e}")            
+            events.error('sessao_erro', "Erro ao conectar ao Selenoid.", erro=str(e))
             raise ConnectionError(f"Não foi possível conectar ao Selenoid: {e}")
 
     def _close_selenium_driver(self):
-        """Fecha o driver do Selenium."""
-        if self.driver:
-            self.driver.quit()
-            self.driver = None
+        """Encerra as sessões do Selenium mantidas pelo pool e as conexões HTTP."""
+        self.browser_pool.close()
+        self.http_client.close()
 
-    def _get_pesquisas(self, offset, limit):
+    def close(self):
+        """Grava os resultados pendentes e libera navegadores e conexões."""
+        self.result_writer.close()
+        self._close_selenium_driver()
+
+    @staticmethod
+    def _claim_query(limit, filtros=FILTROS, cod_pesquisas=None):
         """
-        Consulta as pesquisas em aberto no banco de dados com paginação.
-        Retorna uma lista de tuplas com os dados das pesquisas.
+        SQL e parâmetros da reserva feita por `_get_pesquisas`, separados da
+        execução para o benchmark do banco (benchmarks/bench_db.py) poder
+        medi-la e examinar o plano dentro de uma transação desfeita ao final.
         """
-        cond_rg = ''
-        if (self.current_filter == 1 or self.current_filter == 3):
-            
-            cond_rg = ' AND p.rg IS NOT NULL AND p.rg <> \'\' '
+        def disponivel(alias):
+            return f"""
+                {alias}.Filtro = ANY(%(filtros)s::int[])
+                AND ({alias}.Lease_Ate IS NULL OR {alias}.Lease_Ate <= CURRENT_TIMESTAMP)
+                AND ({alias}.Proxima_Tentativa IS NULL OR {alias}.Proxima_Tentativa <= CURRENT_TIMESTAMP)
+            """
 
-        
         sql = f"""
+            WITH RECURSIVE clientes AS (
+                -- Clientes com pesquisas na fila, saltando pelo índice (loose index scan)
+                SELECT MIN(Cod_Cliente) AS Cliente
+                FROM pesquisa_pendente
+                UNION ALL
+                SELECT (
+                    SELECT MIN(pp.Cod_Cliente)
+                    FROM pesquisa_pendente pp
+                    WHERE pp.Cod_Cliente > c.Cliente
+                )
+                FROM clientes c
+                WHERE c.Cliente IS NOT NULL
+            ),
+            janela AS (
+                -- Os filtros pendentes mais antigos de cada cliente
+                SELECT q.*
+                FROM clientes c
+                CROSS JOIN LATERAL (
+                    SELECT pp.Cod_Pesquisa, pp.Cod_Cliente AS Cliente, pp.Data_Entrada, pp.Cod_Lote, pp.Data_Lote
+                    FROM pesquisa_pendente pp
+                    WHERE pp.Cod_Cliente = c.Cliente
+                      AND {disponivel('pp')}
+                      AND (%(cods)s::int[] IS NULL OR pp.Cod_Pesquisa = ANY(%(cods)s::int[]))
+                    ORDER BY pp.Data_Entrada, pp.Cod_Pesquisa
+                    LIMIT %(janela)s
+                ) q
+                WHERE c.Cliente IS NOT NULL
+            ),
+            fila AS (
+                -- Prazo virtual: a n-ésima pesquisa do cliente conta como n intervalos
+                -- mais nova, intercalando clientes; dentro do cliente, o lote mais
+                -- antigo é atendido primeiro e as pesquisas do mesmo lote ficam juntas
+                SELECT j.Cod_Pesquisa,
+                       j.Data_Entrada + (row_number() OVER (
+                           PARTITION BY j.Cliente
+                           ORDER BY COALESCE(j.Data_Lote, j.Data_Entrada), j.Cod_Lote, j.Data_Entrada, j.Cod_Pesquisa
+                       ) - 1) * make_interval(secs => %(intervalo)s) AS Prazo
+                FROM (SELECT DISTINCT * FROM janela) j
+            ),
+            candidatas AS (
+                SELECT p.Cod_Pesquisa
+                FROM fila f
+                INNER JOIN pesquisa p ON p.Cod_Pesquisa = f.Cod_Pesquisa
+                ORDER BY f.Prazo, p.Cod_Pesquisa
+                LIMIT %(limit)s
+                FOR UPDATE OF p SKIP LOCKED
+            ),
+            reservadas AS (
+                UPDATE pesquisa_pendente pp
+                SET Worker_ID = %(worker)s,
+                    Lease_Ate = CURRENT_TIMESTAMP + make_interval(secs => %(lease)s),
+                    Proxima_Tentativa = NULL
+                FROM candidatas c
+                WHERE pp.Cod_Pesquisa = c.Cod_Pesquisa
+                  AND {disponivel('pp')}
+                RETURNING pp.*
+            ),
+            homonimas AS (
+                -- Pendências do filtro 2 com o mesmo nome normalizado das reservadas,
+                -- atendidas pela mesma consulta ao eSAJ
+                UPDATE pesquisa_pendente pp
+                SET Worker_ID = %(worker)s,
+                    Lease_Ate = CURRENT_TIMESTAMP + make_interval(secs => %(lease)s),
+                    Proxima_Tentativa = NULL
+                WHERE (pp.Cod_Pesquisa, pp.Filtro) IN (
+                    SELECT h.Cod_Pesquisa, h.Filtro
+                    FROM pesquisa_pendente h
+                    WHERE h.Filtro = 2
+                      AND h.Nome_Normalizado IN (SELECT Nome_Normalizado FROM reservadas WHERE Filtro = 2)
+                      AND {disponivel('h')}
+                      AND NOT EXISTS (
+                          SELECT 1 FROM reservadas r WHERE r.Cod_Pesquisa = h.Cod_Pesquisa AND r.Filtro = h.Filtro
+                      )
+                    LIMIT %(homonimas)s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING pp.*
+            )
             SELECT
-                p.Cod_Cliente, p.Cod_Pesquisa, e.UF, p.Data_Entrada,
-                COALESCE(p.nome_corrigido, p.nome) AS Nome, p.CPF,
-                COALESCE(p.rg_corrigido, p.rg) AS RG, p.Nascimento,
-                COALESCE(p.mae_corrigido, p.mae) AS Mae, p.anexo AS Anexo,
-                ps.Resultado, ps.cod_spv_tipo
-            FROM pesquisa p
-            INNER JOIN servico s ON p.Cod_Servico = s.Cod_Servico
-            LEFT JOIN lote_pesquisa lp ON p.Cod_Pesquisa = lp.Cod_Pesquisa
-            LEFT JOIN lote l ON l.cod_lote = lp.cod_lote
+                p.Cod_Cliente, r.Cod_Pesquisa, e.UF, r.Data_Entrada,
+                r.Nome, r.CPF, r.RG, r.Nascimento, r.Mae, p.anexo AS Anexo,
+                NULL AS Resultado, NULL AS cod_spv_tipo, -- Sempre nulos em pesquisas pendentes
+                EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - r.Data_Entrada) AS Espera,
+                r.Filtros
+            FROM (
+                SELECT Cod_Pesquisa, Data_Entrada, Nome, CPF, RG, Nascimento, Mae,
+                       array_agg(Filtro ORDER BY Filtro) AS Filtros
+                FROM (SELECT * FROM reservadas UNION ALL SELECT * FROM homonimas) rh
+                GROUP BY Cod_Pesquisa, Data_Entrada, Nome, CPF, RG, Nascimento, Mae
+            ) r
+            INNER JOIN pesquisa p ON p.Cod_Pesquisa = r.Cod_Pesquisa
             LEFT JOIN estado e ON e.Cod_UF = p.Cod_UF
-            LEFT JOIN pesquisa_spv ps ON ps.Cod_Pesquisa = p.Cod_Pesquisa AND ps.Cod_SPV = 1 AND ps.filtro = %s
-            WHERE p.Data_Conclusao IS NULL
-              AND ps.resultado IS NULL
-              AND p.tipo = 0
-              AND p.cpf IS NOT NULL AND p.cpf <> ''
-              {cond_rg} -- A condição dinâmica é injetada aqui
-              AND (e.UF = 'SP' OR p.Cod_UF_Nascimento = 26 OR p.Cod_UF_RG = 26)
-            GROUP BY 
-                p.Cod_Cliente, p.Cod_Pesquisa, e.UF, p.Data_Entrada,
-                p.nome_corrigido, p.nome, p.CPF, p.rg_corrigido, p.rg,
-                p.Nascimento, p.mae_corrigido, p.mae, p.anexo,
-                ps.Resultado, ps.cod_spv_tipo
-            ORDER BY Nome ASC, Resultado DESC
-            LIMIT %s OFFSET %s
+            ORDER BY r.Cod_Pesquisa
         """
         
-        params = (self.current_filter, limit, offset)
-        return db.fetchall(sql, params)
+        params = {
+            'filtros': list(filtros),
+            'cods': sorted(cod_pesquisas) if cod_pesquisas is not None else None,
+            'limit': limit,
+            # Linhas por (pesquisa, filtro), com folga para as réplicas que
+            # disputam o topo da fila (SKIP LOCKED)
+            'janela': limit * 2 * len(filtros),
+            'intervalo': Config.SLA_FAIRNESS_SECONDS,
+            'worker': Config.WORKER_ID,
+            'lease': Config.LEASE_SECONDS,
+            'homonimas': Config.NAME_SEARCH_SIBLINGS,
+        }
+        return sql, params
+
+    def _get_pesquisas(self, limit, filtros=FILTROS, cod_pesquisas=None):
+        """
+        Reserva (claim) um lote de pesquisas em aberto em uma única varredura
+        para todos os filtros. A fila de trabalho é a tabela pesquisa_pendente,
+        mantida por triggers em pesquisa, pesquisa_spv e lote_pesquisa, com
+        uma linha por (pesquisa, filtro) ainda sem resultado e os dados já
+        resolvidos (nome, RG e mãe corrigidos), de modo que o custo da reserva
+        depende do tamanho do lote e não do tamanho de pesquisa.
+
+        A ordem segue um prazo virtual (fair queuing): a idade de Data_Entrada,
+        penalizada em SLA_FAIRNESS_SECONDS por pesquisa já à frente na fila do
+        mesmo cliente, de modo que um lote grande não bloqueia os demais
+        clientes. Dentro do cliente os lotes mais antigos vêm primeiro.
+
+        As pesquisas são travadas com FOR UPDATE SKIP LOCKED e cada (pesquisa,
+        filtro) recebe um lease na própria linha da fila, de modo que várias
+        réplicas podem consumir a mesma fila sem consultas duplicadas. Leases
+        vencidos (réplica que caiu no meio do lote) voltam a ficar disponíveis;
+        a gravação do resultado remove a linha da fila. Linhas de consultas
+        que falharam só voltam a ser reservadas a partir de Proxima_Tentativa.
+        Junto com cada pendência do filtro 2 são reservadas as demais com o
+        mesmo nome normalizado (até NAME_SEARCH_SIBLINGS), que o planejamento
+        resolve com uma única consulta.
+        Com `cod_pesquisas` (pesquisas notificadas pelo trigger) a reserva se
+        restringe a essas pesquisas.
+        Retorna uma lista de tuplas com os dados das pesquisas; as duas
+        últimas colunas são a espera na fila (segundos) e a lista dos filtros
+        reservados.
+        """
+        sql, params = self._claim_query(limit, filtros, cod_pesquisas)
+        with STAGE_SECONDS.time(stage='claim'):
+            rows = db.execute_returning(sql, params)
+        self.queue_wait.record_many(row[12] for row in rows if row[12] is not None)
+        return rows
+
+    def _next_retry_in(self):
+        """
+        Segundos até a próxima retentativa agendada em pesquisa_pendente (0 se
+        já venceu) ou None se não há nenhuma.
+        """
+        # Uma linha ainda com lease só pode ser reservada quando ele vencer
+        rows = db.fetchall(
+            """
+            SELECT EXTRACT(EPOCH FROM MIN(GREATEST(Proxima_Tentativa, Lease_Ate)) - CURRENT_TIMESTAMP)
+            FROM pesquisa_pendente
+            WHERE Proxima_Tentativa IS NOT NULL
+            """
+        )
+        if not rows or rows[0][0] is None:
+            return None
+        return max(0.0, float(rows[0][0]))
 
 
     def _check_result(self, site_content):
         """
         Enquadra a pesquisa de acordo com o resultado obtido na pesquisa
-        (Nada Consta, Consta Criminal e Consta Cível).
-        """
-        final_result = 7 
-        if Config.NADA_CONSTA in site_content:
-            final_result = 1
-        elif (Config.CONSTA01 in site_content or Config.CONSTA02 in site_content) and \
-             ('Criminal' in site_content or 'criminal' in site_content):
-            final_result = 2
-        elif (Config.CONSTA01 in site_content or Config.CONSTA02 in site_content):
-            final_result = 5
-        return final_result
+        (Nada Consta, Consta Criminal e Consta Cível) e extrai os processos
+        encontrados. Retorna uma `Classificacao`.
+        """
+        with STAGE_SECONDS.time(stage='classify'):
+            return classify(site_content)
 
     def _load_site(self, search_type, document):
         """
-        Busca a pesquisa na plataforma online utilizando o Selenoid.
+        Busca a pesquisa na plataforma online. Quando o motor do tipo de
+        consulta é 'http', tenta primeiro a requisição direta ao eSAJ e só usa
+        o Selenoid se a página exigir o navegador.
+        Retorna o page_source se sucesso, None em caso de falha.
+        """
+        if engine_for(search_type) == 'http':
+            try:
+                with STAGE_SECONDS.time(stage='lookup_http'), self.http_limiter.slot():
+                    page = self.http_client.search(search_type, document)
+                LOOKUPS.inc(engine='http', outcome='ok')
+                return page
+            except BrowserRequired as br:
+                LOOKUPS.inc(engine='http', outcome='browser_required')
+                events.warning('http_navegador', "Consulta HTTP exige navegador. Usando Selenoid.", motivo=str(br))
+            except Exception as e:
+                LOOKUPS.inc(engine='http', outcome='error')
+                events.warning('http_erro', "Erro na consulta HTTP ao eSAJ. Usando Selenoid.", erro=str(e))
+
+        return self._load_site_browser(search_type, document)
+
+    def _load_site_browser(self, search_type, document):
+        """
+        Busca a pesquisa no eSAJ por uma sessão do Selenoid emprestada do pool.
         Retorna o page_source se sucesso, None em caso de falha.
         """
+        self._update_browser_limit()
         try:
-            self._init_selenium_driver() 
-            self.driver.get("https://esaj.tjsp.jus.br/cpopg/open.do")
-
-            wait = WebDriverWait(self.driver, 30) 
+            with STAGE_SECONDS.time(stage='lookup_browser'), self.browser_limiter.slot() as slot, \
+                    self.browser_pool.session() as driver:
+                page = self._search(driver, search_type, document)
+                if is_blocked(page):
+                    slot.outcome = BLOCKED
+            LOOKUPS.inc(engine='selenium', outcome='ok')
+            return page
+
+        except (ConnectionError, TimeoutError) as ce:
+            LOOKUPS.inc(engine='selenium', outcome='error')
+            events.error('selenoid_erro', "Erro de conexão com Selenoid.", erro=str(ce))
+            return None
+        except Exception as e:
+            LOOKUPS.inc(engine='selenium', outcome='error')
+            events.error('navegador_erro', "Erro ao carregar o site ou interagir com elementos.", erro=str(e))
+            return None
 
-            if search_type in [0, 1, 3]: 
-                select_el = wait.until(EC.presence_of_element_located((By.XPATH, '//*[@id="cbPesquisa"]')))
-                select_ob = Select(select_el)
-                select_ob.select_by_value('DOCPARTE')
+    def _load_next_page(self, search_type, href):
+        """
+        Outra página da lista de resultados (link de paginação do eSAJ), pelo
+        mesmo motor da consulta: HTTP com fallback para o Selenoid, ou só o
+        Selenoid. Ao contrário de `_load_site`, falhas no navegador são
+        relançadas: a consulta inteira é reagendada.
+        """
+        if engine_for(search_type) == 'http':
+            try:
+                with STAGE_SECONDS.time(stage='lookup_http'), self.http_limiter.slot():
+                    page = self.http_client.get_page(href)
+                LOOKUPS.inc(engine='http', outcome='ok')
+                return page
+            except BrowserRequired as br:
+                LOOKUPS.inc(engine='http', outcome='browser_required')
+                events.warning('http_navegador', "Página de resultado exige navegador. Usando Selenoid.",
+                               motivo=str(br), pagina=href)
+            except Exception as e:
+                LOOKUPS.inc(engine='http', outcome='error')
+                events.warning('http_erro', "Erro ao obter página de resultado do eSAJ. Usando Selenoid.",
+                               erro=str(e), pagina=href)
+
+        return self._load_next_page_browser(search_type, href)
+
+    def _load_next_page_browser(self, search_type, href):
+        """Outra página da lista de resultados em uma sessão do Selenoid emprestada do pool."""
+        self._update_browser_limit()
+        try:
+            with STAGE_SECONDS.time(stage='lookup_browser'), self.browser_limiter.slot() as slot, \
+                    self.browser_pool.session() as driver:
+                previous = driver.find_element(By.TAG_NAME, 'body')
+                with span('driver.get'):
+                    driver.get(urljoin(Config.ESAJ_OPEN_URL, href))
+                with STAGE_SECONDS.time(stage='page_wait'):
+                    wait_for_result(driver, previous, self.readiness, search_field(search_type))
+                with span('page_source'):
+                    page = driver.page_source
+                if is_blocked(page):
+                    slot.outcome = BLOCKED
+        except Exception:
+            LOOKUPS.inc(engine='selenium', outcome='error')
+            raise
+        LOOKUPS.inc(engine='selenium', outcome='ok')
+        return page
+
+    def _update_browser_limit(self):
+        """Limita as consultas no navegador às sessões que o Selenoid comporta agora."""
+        capacity = self.selenoid.capacity(self.browser_pool.open_sessions())
+        if capacity is not None:
+            self.browser_limiter.set_maximum(min(self.browser_pool.size, capacity))
+
+    def _search(self, driver, search_type, document):
+        """
+        Preenche e submete o formulário de consulta em uma sessão já
+        posicionada na página inicial do eSAJ pelo pool. O prazo da espera
+        pelo resultado se adapta à latência recente do tipo de consulta.
+        """
+        if "cpopg/open.do" not in driver.current_url:
+            with span('driver.get'):
+                driver.get(Config.ESAJ_OPEN_URL)
 
-                input_field = wait.until(EC.presence_of_element_located((By.XPATH, '//*[@id="campo_DOCPARTE"]')))
-                input_field.send_keys(document)
+        wait = WebDriverWait(driver, 30) 
 
-            elif search_type == 2: 
-                select_el = wait.until(EC.presence_of_element_located((By.XPATH, '//*[@id="cbPesquisa"]')))
-                select_ob = Select(select_el)
-                select_ob.select_by_value('NMPARTE')
-                
-                try:
-                    full_name_checkbox = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="pesquisarPorNomeCompleto"]')))
-                    full_name_checkbox.click()
-                except:
-                    print("Checkbox 'pesquisarPorNomeCompleto' não encontrado ou não clicável (pode ser opcional).")
+        def until(condition, alvo):
+            # Cada espera do formulário é um span nas consultas rastreadas
+            with span('wait.until', alvo=alvo):
+                return wait.until(condition)
 
+        if search_type in [0, 1, 3]: 
+            select_el = until(EC.presence_of_element_located((By.XPATH, '//*[@id="cbPesquisa"]')), 'cbPesquisa')
+            select_ob = Select(select_el)
+            select_ob.select_by_value('DOCPARTE')
 
-                input_field = wait.until(EC.presence_of_element_located((By.XPATH, '//*[@id="campo_NMPARTE"]')))
-                input_field.send_keys(document)
+            input_field = until(EC.presence_of_element_located((By.XPATH, '//*[@id="campo_DOCPARTE"]')), 'campo_DOCPARTE')
+            input_field.send_keys(document)
 
+        elif search_type == 2: 
+            select_el = until(EC.presence_of_element_located((By.XPATH, '//*[@id="cbPesquisa"]')), 'cbPesquisa')
+            select_ob = Select(select_el)
+            select_ob.select_by_value('NMPARTE')
             
-            wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="botaoConsultarProcessos"]'))).click()
+            try:
+                full_name_checkbox = until(EC.element_to_be_clickable((By.XPATH, '//*[@id="pesquisarPorNomeCompleto"]')),
+                                           'pesquisarPorNomeCompleto')
+                full_name_checkbox.click()
+            except:
+                events.debug('checkbox_ausente', "Checkbox 'pesquisarPorNomeCompleto' não encontrado ou não clicável (pode ser opcional).")
 
-            wait.until(EC.url_contains("cpopg/search.do")) 
-            time.sleep(2) 
 
-            return self.driver.page_source
+            input_field = until(EC.presence_of_element_located((By.XPATH, '//*[@id="campo_NMPARTE"]')), 'campo_NMPARTE')
+            input_field.send_keys(document)
 
-        except ConnectionError as ce:
-            print(f"Erro de conexão com Selenoid: {ce}")
-            return None
-        except Exception as e:
-            print(f"Erro ao carregar o site ou interagir com elementos: {e}")
-            
-            return None
-        finally:
-            self._close_selenium_driver() 
+        
+        submit = until(EC.element_to_be_clickable((By.XPATH, '//*[@id="botaoConsultarProcessos"]')), 'botaoConsultarProcessos')
+        with span('submit'):
+            submit.click()
 
-    def _insert_spv_result(self, cod_pesquisa, result, search_filter):
-        """Insere o resultado da pesquisa no banco de dados."""
-        sql = """
-            INSERT INTO pesquisa_spv
-                (Cod_Pesquisa, Cod_SPV, Cod_spv_computador, Cod_Spv_Tipo, Resultado, Cod_Funcionario, filtro, website_id)
-            VALUES
-                (%s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        params = (cod_pesquisa, 1, 36, None, result, -1, search_filter, 1)
-        try:
-            db.execute(sql, params)
-            print(f"Resultado para Cod_Pesquisa {cod_pesquisa} inserido com sucesso.")
-        except Exception as e:
-            print(f"Erro ao inserir resultado para Cod_Pesquisa {cod_pesquisa}: {e}")
-            
+        # Sem espera fixa: retorna assim que algum marcador de resultado aparece
+        with STAGE_SECONDS.time(stage='page_wait'):
+            wait_for_result(driver, submit, self.readiness, search_field(search_type))
 
-    def process_pesquisas(self):
+        with span('page_source'):
+            return driver.page_source
+
+    def _retry_spv_result(self, cod_pesquisa, search_filter, error):
         """
-        Consulta as pesquisas no banco de dados e executa utilizando Selenium/Selenoid.
-        Implementa paginação para processar grandes volumes de dados.
+        Devolve a (pesquisa, filtro) à fila para nova consulta depois da espera
+        da retentativa; esgotadas as tentativas, o ResultWriter grava o 7.
         """
-        page_size = 20 # Quantidade de registros por página
-        offset = 0
-        total_processed = 0
-
-        while True:
-            print(f"Consultando pesquisas com filtro {self.current_filter}, offset {offset}...")
-            
-            qry = self._get_pesquisas(offset, page_size)
+        self.result_writer.retry(cod_pesquisa, search_filter, error)
 
-            if not qry:
-                print(f"Nenhuma pesquisa encontrada para o filtro {self.current_filter} na página atual.")
-                break 
-
-            print(f"Processando {len(qry)} pesquisas...")
-            for dados in tqdm(qry): 
-                codPesquisa = dados[1]
-                nome = dados[4]
-                cpf = dados[5]
-                rg = dados[6]
+    def _insert_spv_result(self, cod_pesquisa, result, search_filter, processos=None, pagina=None):
+        """
+        Registra o resultado da pesquisa, os processos encontrados e a página
+        arquivada. A gravação em pesquisa_spv, pesquisa_spv_processo e
+        spv_pagina (e a liberação do lease) é feita em lote pelo ResultWriter.
+        """
+        RESULTS.inc(filtro=search_filter, resultado=result)
+        self.result_writer.add(cod_pesquisa, result, search_filter, processos, pagina)
 
-                site_content = None
-                result_code = 7 
+    def _document_for(self, dados, search_filter):
+        """
+        Retorna o documento consultado pelo filtro (CPF, RG ou nome) ou None
+        quando a pesquisa não tem o dado exigido.
+        """
+        nome = dados[4]
+        cpf = dados[5]
+        rg = dados[6]
+
+        if search_filter == 0 and cpf:
+            return cpf
+        elif (search_filter == 3 or search_filter == 1) and rg:
+            return rg
+        elif search_filter == 2 and nome:
+            return nome
+        return None
+
+    def _checked_page(self, site_content, search_filter, document):
+        """Página da consulta; LookupFailed quando não há conteúdo ou o eSAJ bloqueou a consulta."""
+        if not site_content:
+            raise LookupFailed(f"Falha ao obter conteúdo do site para o documento {document} com filtro {search_filter}")
+        if is_blocked(site_content):
+            raise LookupFailed(f"Consulta bloqueada pelo eSAJ para o documento {document} com filtro {search_filter}")
+        return site_content
+
+    def _archive_page(self, site_content):
+        """Página comprimida para spv_pagina, ou None com PAGE_ARCHIVE desativado."""
+        if not Config.PAGE_ARCHIVE:
+            return None
+        with STAGE_SECONDS.time(stage='archive'):
+            return archive(site_content)
 
-                try:
-                    if self.current_filter == 0 and cpf:
-                        site_content = self._load_site(self.current_filter, cpf)
-                    elif (self.current_filter == 3 or self.current_filter == 1) and rg:
-                        site_content = self._load_site(self.current_filter, rg)
-                    elif self.current_filter == 2 and nome:
-                        site_content = self._load_site(self.current_filter, nome)
-                    else:
-                        print(f"Dados insuficientes ou filtro incompatível para Cod_Pesquisa {codPesquisa} com filtro {self.current_filter}.")
-                        
-                        self._insert_spv_result(codPesquisa, result_code, self.current_filter)
-                        continue 
+    def _read_name_pages(self, consulta, site_content, load_page):
+        """
+        Lê a lista de resultados de uma consulta por nome a partir da primeira
+        página, com `load_page(href)` para as seguintes, até o resultado de
+        todas as pessoas da consulta estar decidido. Retorna o `NameSearch`,
+        que segue para a classificação no lugar da página.
+        """
+        search = NameSearch(consulta.document, consulta.pessoas)
+        href = search.feed(site_content)
+        while href:
+            page = self._checked_page(load_page(href), consulta.search_filter, consulta.document)
+            href = search.feed(page)
+        NAME_PAGES.inc(len(search.pages), fim=search.stop)
+        return search
+
+    def _classify_targets(self, consulta, content):
+        """
+        Classifica o conteúdo obtido para cada linha atendida pela consulta.
+        A página de uma consulta por documento vale para todas as linhas; nas
+        consultas por nome (`content` é o `NameSearch`) as páginas são as
+        mesmas, mas cada linha é classificada com a sua pessoa e arquiva a
+        captura correspondente. Retorna [(resultado, processos, página
+        arquivada)] na ordem de `consulta.targets`.
+        """
+        if not isinstance(content, NameSearch):
+            classificacao = self._check_result(content)
+            return [(classificacao.result, classificacao.processos, self._archive_page(content))] * len(consulta.targets)
+
+        resultados = {}
+        for pessoa in consulta.pessoas:
+            if pessoa in resultados:
+                continue
+            with STAGE_SECONDS.time(stage='classify'):
+                classificacao = content.classificacao(pessoa)
+            resultados[pessoa] = (classificacao.result, classificacao.processos,
+                                  self._archive_page(content.capture(pessoa)))
+        return [resultados[pessoa] for pessoa in consulta.pessoas]
+
+    def _fetch_result(self, consulta):
+        """
+        Consulta o eSAJ, liberada pelo circuit breaker, e classifica a página
+        (nas consultas por nome, as páginas da lista até o resultado estar
+        decidido). Retorna o resultado de cada linha, como em
+        `_classify_targets`. Lança LookupFailed quando a consulta não trouxe
+        uma página utilizável.
+        """
+        search_filter, document = consulta.search_filter, consulta.document
+        with self.breaker.guard():
+            site_content = self._checked_page(self._load_site(search_filter, document), search_filter, document)
+            if search_field(search_filter) == 'NMPARTE':
+                site_content = self._read_name_pages(
+                    consulta, site_content, lambda href: self._load_next_page(search_filter, href)
+                )
+        return self._classify_targets(consulta, site_content)
+
+    def _lookup_result(self, consulta):
+        """
+        Resultado de uma consulta ao eSAJ para cada linha atendida por ela. O
+        site só é acessado em caso de miss no cache (que guarda apenas o
+        código do resultado, então um acerto no cache não traz processos nem
+        página); consultas simultâneas do mesmo documento aguardam a que já
+        está em andamento. Retorna [(resultado, processos, página arquivada)]
+        na ordem de `consulta.targets`.
+        """
+        fetched = {}
 
-                    if site_content:
-                        result_code = self._check_result(site_content)
-                        self._insert_spv_result(codPesquisa, result_code, self.current_filter)
-                    else:
-                        print(f"Falha ao obter conteúdo do site para Cod_Pesquisa {codPesquisa}. Inserindo resultado de erro.")
-                        self._insert_spv_result(codPesquisa, result_code, self.current_filter) # Insere erro mesmo sem conteúdo
+        def load():
+            fetched['resultados'] = self._fetch_result(consulta)
+            return fetched['resultados'][0][0]
 
-                except Exception as e:
-                    print(f"Erro inesperado ao processar Cod_Pesquisa {codPesquisa}: {e}. Inserindo resultado de erro.")
-                    self._insert_spv_result(codPesquisa, result_code, self.current_filter)
+        result_code = self.result_cache.get_or_load(consulta.key, load)
+        return fetched.get('resultados') or [(result_code, None, None)] * len(consulta.targets)
 
-                total_processed += 1
+    @staticmethod
+    def _consulta_fields(resultados):
+        """Campos do evento 'consulta': resultado (um só ou os distintos), processos e origem."""
+        codes = sorted({result_code for result_code, _, _ in resultados})
+        processos = {p for _, found, _ in resultados for p in found or ()}
+        origem = 'cache' if all(found is None for _, found, _ in resultados) else 'site'
+        return {'resultado': codes[0] if len(codes) == 1 else codes, 'processos': len(processos), 'origem': origem}
 
-            offset += page_size 
+    def _process_consulta(self, consulta, worker_id=None):
+        """
+        Executa uma consulta distinta ao eSAJ e grava em cada linha (pesquisa,
+        filtro) atendida por ela o seu resultado. Se a consulta falhar as
+        linhas são reagendadas em vez de receberem o resultado 7. Os eventos
+        registrados durante a consulta levam as pesquisas, o filtro e o worker.
+        """
+        cod_pesquisas = [cod for cod, _ in consulta.targets]
+        with events.context(cod_pesquisa=cod_pesquisas, filtro=consulta.search_filter, worker=worker_id), \
+                tracer.trace('pesquisa', cod_pesquisa=cod_pesquisas, filtro=consulta.search_filter, worker=worker_id):
+            started = time.monotonic()
+            try:
+                with STAGE_SECONDS.time(stage='consulta'):
+                    resultados = self._lookup_result(consulta)
+            except Exception as e:
+                events.warning('consulta_reagendada', "Erro na consulta; consulta reagendada.",
+                               erro=str(e), duracao_s=round(time.monotonic() - started, 4))
+                for codPesquisa, search_filter in consulta.targets:
+                    self._retry_spv_result(codPesquisa, search_filter, e)
+                return
+
+            for (codPesquisa, search_filter), (result_code, processos, pagina) in zip(consulta.targets, resultados):
+                self._insert_spv_result(codPesquisa, result_code, search_filter, processos, pagina)
+            events.info('consulta', "Consulta concluída.", sample=Config.LOG_SAMPLE_RATE,
+                        duracao_s=round(time.monotonic() - started, 4), **self._consulta_fields(resultados))
+
+    def _plan_page(self, qry):
+        """
+        Agrupa um lote reservado em consultas distintas. Pesquisas sem o dado
+        exigido pelo filtro recebem o resultado de erro imediatamente.
+        """
+        with STAGE_SECONDS.time(stage='plan'):
+            consultas, sem_documento = plan(qry, self._document_for)
+        for codPesquisa, search_filter in sem_documento:
+            events.warning('sem_documento', "Dados insuficientes ou filtro incompatível.",
+                           cod_pesquisa=codPesquisa, filtro=search_filter)
+            self._insert_spv_result(codPesquisa, 7, search_filter) # Insere erro mesmo sem conteúdo
+        return consultas
+
+    def process_pesquisas(self, cod_pesquisas=None):
+        """
+        Consulta as pesquisas no banco de dados e executa utilizando Selenium/Selenoid.
+        Reserva lotes de pesquisas com todos os filtros pendentes até a fila
+        esvaziar; cada lote vira um conjunto de consultas distintas ao eSAJ,
+        cujo resultado é gravado em todos os filtros atendidos. Com
+        SPV_WORKERS > 1 as consultas de cada lote são distribuídas entre
+        workers paralelos, cada um com sua própria sessão do navegador.
+        `cod_pesquisas` restringe o processamento às pesquisas informadas.
+        Retorna a quantidade de pesquisas reservadas.
+        """
+        page_size = max(20, self.workers * 2) # Quantidade de registros por lote
+        total_processed = 0
+        started = time.monotonic()
+
+        def fetch_page():
+            nonlocal total_processed
+            while True:
+                claimed = time.monotonic()
+                qry = self._get_pesquisas(page_size, cod_pesquisas=cod_pesquisas)
+                if not qry:
+                    events.debug('lote_vazio', "Nenhuma pesquisa pendente encontrada na página atual.")
+                    return []
+                consultas = self._plan_page(qry)
+                total_processed += len(qry)
+                events.info('lote', "Lote de pesquisas reservado.", pesquisas=len(qry), consultas=len(consultas),
+                            duracao_s=round(time.monotonic() - claimed, 4))
+                if consultas:
+                    return consultas
+
+        if self.workers > 1:
+            WorkerPool(self._process_consulta, self.workers).run(fetch_page)
+        else:
+            while True:
+                consultas = fetch_page()
+                if not consultas:
+                    break 
+
+                for consulta in progress_bar(consultas): 
+                    self._process_consulta(consulta)
+
+        self.cycle_summary(total_processed, time.monotonic() - started)
+        return total_processed
+
+    def cycle_summary(self, total, elapsed):
+        """Evento de fim de ciclo: pesquisas processadas, espera na fila e limites de consulta."""
+        events.info(
+            'ciclo', "Ciclo concluído.", pesquisas=total, duracao_s=round(elapsed, 3),
+            espera_fila={name: round(value, 3) for name, value in self.queue_wait.percentiles().items()},
+            limites={limiter.name: limiter.stats() for limiter in (self.http_limiter, self.browser_limiter)},
+        )
+
+    def _run_poll(self):
+        """
+        Varredura completa de todas as pesquisas a cada CYCLE_SLEEP_SECONDS;
+        retentativas vencidas entram na varredura seguinte.
+        """
+        while True: # Loop infinito para manter o serviço em execução
+            events.info('ciclo_inicio', "Iniciando processamento das pesquisas pendentes.", motivo='varredura')
+            self.process_pesquisas()
 
-        print(f"Total de pesquisas processadas para o filtro {self.current_filter}: {total_processed}")
+            events.info('ciclo_espera', "Todos os filtros foram processados. Aguardando para reiniciar o ciclo.")
+            time.sleep(Config.CYCLE_SLEEP_SECONDS) 
 
+    def _run_notify(self):
+        """
+        Processa as pesquisas assim que o trigger de `pesquisa` as notifica
+        (LISTEN/NOTIFY), com uma varredura completa de segurança a cada
+        SWEEP_INTERVAL_SECONDS. A espera também termina quando vence a
+        próxima retentativa agendada.
+        """
+        listener = PesquisaListener(db)
+        schedule = SweepSchedule()
+        listener.start()
+        try:
+            while True:
+                if schedule.sweep_due():
+                    events.info('ciclo_inicio', "Iniciando varredura completa das pesquisas pendentes.", motivo='varredura')
+                    self.process_pesquisas()
+                    schedule.swept()
+
+                retry_in = self._next_retry_in()
+                if retry_in == 0:
+                    events.info('ciclo_inicio', "Iniciando as retentativas agendadas.", motivo='retentativas')
+                    schedule.retried(self.process_pesquisas())
+                timeout = schedule.timeout()
+                if retry_in is not None:
+                    timeout = min(timeout, schedule.retry_timeout(retry_in))
+
+                ids = schedule.notified(listener.wait(timeout))
+                if ids:
+                    events.info('ciclo_inicio', "Pesquisas notificadas. Iniciando processamento.",
+                                motivo='notificacao', pesquisas=len(ids))
+                    self.process_pesquisas(ids)
+                    # Sem esperar o flush periódico: o resultado é gravado já
+                    self.result_writer.flush()
+        finally:
+            listener.close()
 
     def run(self):
-        """Orquestra o ciclo de vida da aplicação, iterando pelos filtros."""
-        max_filters = 3 
-        while True: # Loop infinito para manter o serviço em execução
-            for f in range(max_filters + 1):
-                self.current_filter = f
-                print(f"\nIniciando processamento para o filtro: {self.current_filter}")
-                self.process_pesquisas()
-
-            print("\nTodos os filtros foram processados. Aguardando para reiniciar o ciclo.")
-            time.sleep(300) 
\ No newline at end of file
+        """Orquestra o ciclo de vida da aplicação; cada ciclo atende todos os filtros."""
+        try:
+            if Config.SPV_SCHEDULE_MODE == 'notify':
+                self._run_notify()
+            else:
+                self._run_poll()
+        finally:
+            self.close()
\ No newline at end of file
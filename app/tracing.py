@@ -0,0 +1,210 @@
+"""
+Rastreamento opcional das consultas em spans aninhados.
+
+Cada consulta sorteada (TRACE_SAMPLE_RATE) vira um trace: o span raiz
+`pesquisa` (com as pesquisas, o filtro e o worker) e os spans registrados
+durante ela, em qualquer função chamada: todos os estágios medidos por
+`Histogram.time` (STAGE_SECONDS e DB_SECONDS) e os passos do navegador
+(`driver.get`, cada `wait.until`, a leitura do `page_source`). Os traces
+com duração a partir de TRACE_MIN_SECONDS são gravados por uma thread
+própria em TRACE_FILE no formato de eventos do Chrome (chrome://tracing,
+Perfetto, speedscope), uma linha por span e uma faixa (tid) por consulta.
+
+Desligado (TRACE_FILE vazio) o custo é a leitura de uma ContextVar por
+estágio. O rastreamento pode ser ligado e desligado em execução com
+SIGUSR2 (app/main.py), sem reiniciar o serviço.
+"""
+import atexit
+import contextvars
+import itertools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from app.config import Config
+
+_current = contextvars.ContextVar('spv_trace', default=None)
+
+
+def _now_us():
+    return time.time_ns() // 1000
+
+
+class Trace:
+    """Spans de uma consulta, acumulados até o fim do span raiz."""
+
+    def __init__(self, trace_id, name, args):
+        self.id = trace_id
+        self.name = name
+        self.args = args
+        self.start_us = _now_us()
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def add(self, name, cat, start_us, dur_us, args=None):
+        # list.append é atômico: spans podem vir de outras threads (executor do navegador)
+        self.spans.append((name, cat, start_us, dur_us, args))
+
+
+class Tracer:
+    """
+    Inicia, propaga (ContextVar, por thread ou tarefa asyncio) e grava os
+    traces. `path` None desliga o rastreamento.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path=None, sample_rate=None, min_seconds=None):
+        self.path = path
+        self.sample_rate = Config.TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.min_seconds = Config.TRACE_MIN_SECONDS if min_seconds is None else min_seconds
+        self.written = 0
+        self._ids = itertools.count(1)
+        self._queue = queue.Queue(maxsize=1000)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._file = None
+        atexit.register(self.close)
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def enable(self, path):
+        with self._lock:
+            if self._file is not None and self._file.name != path:
+                self._file.close()
+                self._file = None
+            self.path = path
+
+    def disable(self):
+        self.path = None
+
+    def start(self, name, **args):
+        """Novo trace (ou None, desligado ou fora da amostra); veja `attach` e `finish`."""
+        if self.path is None or random.random() >= self.sample_rate:
+            return None
+        return Trace(next(self._ids), name, args)
+
+    @contextmanager
+    def attach(self, trace):
+        """Spans registrados no bloco entram em `trace` (nada muda com None)."""
+        token = _current.set(trace)
+        try:
+            yield trace
+        finally:
+            _current.reset(token)
+
+    def finish(self, trace):
+        """Fecha o span raiz e enfileira o trace para gravação se passou de TRACE_MIN_SECONDS."""
+        if trace is None:
+            return
+        elapsed = time.perf_counter() - trace.started
+        if elapsed < self.min_seconds or self.path is None:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((trace, elapsed))
+        except queue.Full:
+            pass
+
+    @contextmanager
+    def trace(self, name, **args):
+        """`start` + `attach` + `finish`: o bloco é o span raiz do trace."""
+        trace = self.start(name, **args)
+        if trace is None:
+            yield None
+            return
+        try:
+            with self.attach(trace):
+                yield trace
+        finally:
+            self.finish(trace)
+
+    def _events(self, trace, elapsed):
+        pid = os.getpid()
+        root = {'name': trace.name, 'cat': 'spv', 'ph': 'X', 'ts': trace.start_us,
+                'dur': round(elapsed * 1e6), 'pid': pid, 'tid': trace.id, 'args': trace.args}
+        yield root
+        for name, cat, start_us, dur_us, args in trace.spans:
+            event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': start_us, 'dur': dur_us, 'pid': pid, 'tid': trace.id}
+            if args:
+                event['args'] = args
+            yield event
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="spv-tracer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            self._write(*item)
+
+    def _write(self, trace, elapsed):
+        with self._lock:
+            path = self.path
+            if path is None:
+                return
+            if self._file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self._file = open(path, 'a', encoding='utf-8')
+                # Formato "JSON Array" do Chrome: o colchete final é opcional
+                if self._file.tell() == 0:
+                    self._file.write('[\n')
+            self._file.write(''.join(
+                json.dumps(event, default=str, separators=(',', ':')) + ',\n'
+                for event in self._events(trace, elapsed)
+            ))
+            self._file.flush()
+            self.written += 1
+
+    def close(self):
+        """Grava os traces pendentes e fecha o arquivo."""
+        if self._thread is not None:
+            self._queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def record(seconds, cat, labels=None):
+    """
+    Span de `seconds` que acabou de terminar, no trace em andamento (se
+    houver), com o nome formado pelos valores de `labels` (ex.: 'classify').
+    """
+    trace = _current.get()
+    if trace is not None:
+        dur_us = round(seconds * 1e6)
+        name = ' '.join(str(value) for value in labels.values()) if labels else cat
+        trace.add(name, cat, _now_us() - dur_us, dur_us)
+
+
+@contextmanager
+def span(name, cat='spv', **args):
+    """Span explícito no trace em andamento; sem trace o bloco só é executado."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start_us = _now_us()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, cat, start_us, round((time.perf_counter() - started) * 1e6), args)
+
+
+tracer = Tracer(path=Config.TRACE_FILE or None)
@@ -0,0 +1,80 @@
+import queue
+import threading
+
+from tqdm import tqdm
+
+from app.config import Config
+from app.events import events
+
+
+def progress_bar(iterable=None, **kwargs):
+    """
+    Barra do tqdm conforme PROGRESS_BARS: 'auto' só desenha quando o stderr
+    é um terminal (nos logs do container fica desligada), 'false' nunca.
+    """
+    disable = {'true': False, 'false': True}.get(Config.PROGRESS_BARS)
+    return tqdm(iterable, disable=disable, **kwargs)
+
+
+class WorkerPool:
+    """
+    Executa `handler(item, worker_id)` em `size` threads que consomem uma fila
+    compartilhada. A fila é alimentada página a página por `fetch_page`; a
+    próxima página só é buscada quando a anterior foi totalmente processada,
+    preservando a semântica da paginação sequencial.
+    """
+
+    _STOP = object()
+
+    def __init__(self, handler, size):
+        self.handler = handler
+        self.size = size
+        self.processed = [0] * size
+        self._queue = queue.Queue(maxsize=size * 2)
+        self._lock = threading.Lock()
+
+    def _worker(self, worker_id, progress):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is self._STOP:
+                    return
+                try:
+                    self.handler(item, worker_id)
+                except Exception as e:
+                    events.error('worker_erro', "Erro não tratado ao processar item.", worker=worker_id, erro=str(e))
+                with self._lock:
+                    self.processed[worker_id] += 1
+                    progress.update(1)
+            finally:
+                self._queue.task_done()
+
+    def run(self, fetch_page):
+        """Processa todas as páginas retornadas por `fetch_page` até ela vir vazia."""
+        bars = [progress_bar(desc=f"worker {i}", position=i, unit="pesquisa") for i in range(self.size)]
+        threads = [
+            threading.Thread(target=self._worker, args=(i, bars[i]), name=f"spv-worker-{i}", daemon=True)
+            for i in range(self.size)
+        ]
+        for t in threads:
+            t.start()
+
+        try:
+            while True:
+                page = fetch_page()
+                if not page:
+                    break
+                for item in page:
+                    self._queue.put(item)
+                self._queue.join()
+        finally:
+            for _ in threads:
+                self._queue.put(self._STOP)
+            for t in threads:
+                t.join()
+            for bar in bars:
+                bar.close()
+
+        for worker_id, count in enumerate(self.processed):
+            events.info('worker_fim', "Pesquisas processadas pelo worker.", worker=worker_id, consultas=count)
+        return sum(self.processed)
@@ -0,0 +1,129 @@
+"""
+Benchmark dos perfis de navegador (app/browser_profile.py) contra o stub do eSAJ.
+
+Sobe o stub com recursos estáticos (CSS, fonte, imagens e um script de
+analytics, como as páginas do eSAJ) e, para cada perfil, abre uma sessão
+no hub do Selenoid e repete a consulta por CPF do robô: página inicial,
+formulário e espera pelo resultado. Mede a latência de cada consulta
+(p50/p95) e os bytes servidos pelo stub por consulta, por tipo de recurso.
+
+    python benchmarks/bench_browser.py --hub http://localhost:4444/wd/hub \\
+        --stub-host 0.0.0.0 --advertise-host host.docker.internal
+
+O navegador roda no container do Selenoid, então o stub precisa escutar em
+uma interface alcançável por ele (`--stub-host`) e ser anunciado pelo nome
+que o container resolve (`--advertise-host`).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+from esaj_stub import EsajStub
+
+from app.config import Config
+from app.browser_profile import PROFILES, browser_profile
+
+
+def search(driver, open_url, document):
+    """Mesmo caminho do SPVAutomatico._search para uma consulta por documento."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import Select, WebDriverWait
+
+    driver.get(open_url)
+    wait = WebDriverWait(driver, 30)
+    select_el = wait.until(EC.presence_of_element_located((By.ID, 'cbPesquisa')))
+    Select(select_el).select_by_value('DOCPARTE')
+    wait.until(EC.presence_of_element_located((By.ID, 'campo_DOCPARTE'))).send_keys(document)
+    wait.until(EC.element_to_be_clickable((By.ID, 'botaoConsultarProcessos'))).click()
+    wait.until(lambda d: 'mensagemRetorno' in d.page_source or 'contadorDeProcessos' in d.page_source)
+
+
+def run_profile(name, stub, hub, searches):
+    from selenium import webdriver
+
+    profile = browser_profile(name)
+    if profile.blocked_urls:
+        # O script de analytics do stub é bloqueado como os do eSAJ
+        profile.blocked_urls += ('*analytics.js*',)
+
+    started = time.monotonic()
+    driver = webdriver.Remote(command_executor=hub, options=profile.options())
+    session_seconds = time.monotonic() - started
+    try:
+        profile.apply(driver)
+        # Aquecimento: o cache em disco do perfil vale a partir da segunda página
+        search(driver, f"{stub.base_url}/open.do", '00000000000')
+        before = dict(stub.bytes_sent)
+        latencies = []
+        for i in range(searches):
+            started = time.monotonic()
+            search(driver, f"{stub.base_url}/open.do", f"{i:011d}")
+            latencies.append(time.monotonic() - started)
+    finally:
+        driver.quit()
+
+    sent = {kind: stub.bytes_sent.get(kind, 0) - before.get(kind, 0) for kind in stub.bytes_sent}
+    quantiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {
+        'profile': repr(profile),
+        'session_seconds': round(session_seconds, 3),
+        'searches': searches,
+        'p50': round(quantiles[49], 4),
+        'p95': round(quantiles[94], 4),
+        'bytes_per_search': {kind: round(value / searches) for kind, value in sorted(sent.items()) if value},
+        'total_bytes_per_search': round(sum(sent.values()) / searches),
+    }
+
+
+def print_report(reports):
+    print(f"\n{'perfil':<10}{'p50':>10}{'p95':>10}{'KB/consulta':>14}  por tipo")
+    for name, report in reports.items():
+        by_kind = ', '.join(f"{kind} {value / 1024:.1f}" for kind, value in report['bytes_per_search'].items())
+        print(f"{name:<10}{report['p50']:>10.4f}{report['p95']:>10.4f}"
+              f"{report['total_bytes_per_search'] / 1024:>14.1f}  {by_kind}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--profiles', default=','.join(PROFILES), help="perfis separados por vírgula")
+    parser.add_argument('--searches', type=int, default=30, help="consultas por perfil")
+    parser.add_argument('--hub', default=Config.SELENOID_HUB_URL)
+    parser.add_argument('--latency', type=float, default=0.05, help="latência do stub em segundos")
+    parser.add_argument('--stub-host', default='127.0.0.1')
+    parser.add_argument('--advertise-host')
+    parser.add_argument('--output', help="grava o relatório em JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.profiles.split(',') if name.strip()]
+    unknown = [name for name in names if name not in PROFILES]
+    if unknown:
+        parser.error(f"perfis desconhecidos: {', '.join(unknown)}")
+    if args.searches < 2:
+        parser.error("--searches precisa ser ao menos 2")
+    if not args.hub:
+        parser.error("informe o hub do Selenoid (--hub ou SELENOID_HUB_URL)")
+
+    stub = EsajStub(latency=args.latency, assets=True, host=args.stub_host,
+                    advertise_host=args.advertise_host).start()
+    try:
+        reports = {name: run_profile(name, stub, args.hub, args.searches) for name in names}
+    finally:
+        stub.stop()
+
+    print_report(reports)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'params': vars(args), 'reports': reports}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
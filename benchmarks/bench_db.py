@@ -0,0 +1,403 @@
+"""
+Benchmark do banco em escala: reserva de trabalho e gravação de resultados.
+
+Mede, sobre os dados já carregados no PostgreSQL apontado pelas variáveis
+DB_* (veja benchmarks/datagen.py), a latência da reserva de
+`SPVAutomatico._get_pesquisas` para backlogs de tamanhos crescentes em
+pesquisa_pendente e, em cada um, com deslocamentos crescentes (linhas do
+topo da fila já reservadas por outras réplicas, que a reserva precisa
+saltar), e a vazão da gravação em lote do ResultWriter (o caminho de
+`_insert_spv_result`), com a página arquivada e os triggers da fila.
+
+Os planos de ambos são capturados com EXPLAIN (ANALYZE, BUFFERS) e
+guardados, com o relatório, em um diretório de snapshot. O snapshot
+versionado em benchmarks/plans foi capturado na escala padrão do
+datagen.py; medições em outra escala usam o seu próprio `--snapshot`.
+Uma execução seguinte é comparada com o snapshot: mudança de forma de um
+plano (mostrada como diff), blocos lidos (buffers) ou latências acima da
+tolerância terminam com código 1.
+
+    python benchmarks/datagen.py
+    python benchmarks/bench_db.py
+    python benchmarks/bench_db.py --save-snapshot
+
+Nada é gravado: cada medição roda em uma transação desfeita ao final.
+"""
+import argparse
+import difflib
+import json
+import os
+import statistics
+import sys
+import time
+
+import psycopg2.extras
+from psycopg2.extensions import AsIs
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from app.config import Config
+
+SNAPSHOT = os.path.join(os.path.dirname(__file__), 'plans')
+BUSY_WORKER = 'bench-db-outra-replica'
+
+SETTINGS = ('server_version', 'shared_buffers', 'work_mem', 'effective_cache_size', 'random_page_cost', 'jit')
+
+# Métricas comparadas com o snapshot: (chave, maior é melhor)
+GATES = (
+    ('claim_p50', False),
+    ('insert_rows_per_second', True),
+    ('plan_buffers', False),
+)
+
+
+def parse_sizes(text):
+    return sorted({int(value) for value in text.split(',') if value.strip()})
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def scale(cursor):
+    """Tamanho das tabelas (linhas estimadas pelo ANALYZE e bytes com índices) e do backlog."""
+    cursor.execute(
+        """
+        SELECT c.relname, GREATEST(c.reltuples, 0)::bigint, pg_total_relation_size(c.oid)
+        FROM pg_class c
+        WHERE c.relname IN ('pesquisa', 'pesquisa_spv', 'pesquisa_pendente', 'spv_pagina', 'lote_pesquisa')
+          AND c.relkind = 'r'
+        ORDER BY c.relname
+        """
+    )
+    tables = {name: {'rows': rows, 'bytes': size} for name, rows, size in cursor.fetchall()}
+    cursor.execute("SELECT COUNT(*) FROM pesquisa_pendente")
+    return {'tables': tables, 'backlog': cursor.fetchone()[0]}
+
+
+def settings(cursor):
+    cursor.execute("SELECT name, setting, unit FROM pg_settings WHERE name = ANY(%s)", (list(SETTINGS),))
+    return {name: f"{setting}{unit or ''}" for name, setting, unit in cursor.fetchall()}
+
+
+def limit_backlog(cursor, size):
+    """
+    Deixa só as `size` pendências mais antigas na fila (as demais saem como
+    se tivessem sido concluídas). Desfeito com a transação.
+    """
+    cursor.execute(
+        """
+        DELETE FROM pesquisa_pendente pp
+        USING (
+            SELECT Cod_Pesquisa, Filtro FROM pesquisa_pendente
+            ORDER BY Data_Entrada, Cod_Pesquisa, Filtro
+            OFFSET %s
+        ) x
+        WHERE pp.Cod_Pesquisa = x.Cod_Pesquisa AND pp.Filtro = x.Filtro
+        """,
+        (size,)
+    )
+
+
+def lease_ahead(cursor, offset):
+    """Reserva as `offset` pendências mais antigas para outra réplica (lease de uma hora)."""
+    cursor.execute(
+        """
+        UPDATE pesquisa_pendente pp
+        SET Worker_ID = %s, Lease_Ate = CURRENT_TIMESTAMP + INTERVAL '1 hour'
+        FROM (
+            SELECT Cod_Pesquisa, Filtro FROM pesquisa_pendente
+            ORDER BY Data_Entrada, Cod_Pesquisa, Filtro
+            LIMIT %s
+        ) x
+        WHERE pp.Cod_Pesquisa = x.Cod_Pesquisa AND pp.Filtro = x.Filtro
+        """,
+        (BUSY_WORKER, offset)
+    )
+
+
+def timed(cursor, sql, params, repeat):
+    """
+    Executa o comando `repeat` vezes (mais uma de aquecimento), cada uma
+    desfeita por um savepoint. Retorna as durações em segundos e as linhas
+    da última execução.
+    """
+    durations, rows = [], []
+    for attempt in range(repeat + 1):
+        cursor.execute("SAVEPOINT bench")
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall() if cursor.description else []
+        elapsed = time.perf_counter() - started
+        cursor.execute("ROLLBACK TO SAVEPOINT bench")
+        if attempt:
+            durations.append(elapsed)
+    return durations, rows
+
+
+def explain(cursor, sql, params=None):
+    """Plano de EXPLAIN (ANALYZE, BUFFERS) em JSON; o comando é desfeito por um savepoint."""
+    cursor.execute("SAVEPOINT bench")
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+    plan = cursor.fetchone()[0][0]
+    cursor.execute("ROLLBACK TO SAVEPOINT bench")
+    return plan
+
+
+def plan_lines(plan, numbers=True):
+    """Árvore do plano em texto, um nó por linha; sem `numbers` só a forma (para o diff)."""
+    lines = []
+
+    def walk(node, depth):
+        label = node['Node Type']
+        if node.get('Relation Name'):
+            label += f" on {node['Relation Name']}"
+        if node.get('Index Name'):
+            label += f" using {node['Index Name']}"
+        if node.get('CTE Name'):
+            label += f" [{node['CTE Name']}]"
+        if numbers:
+            label += (f" (rows={node.get('Actual Rows')} loops={node.get('Actual Loops')}"
+                      f" time={node.get('Actual Total Time', 0):.3f}ms"
+                      f" hit={node.get('Shared Hit Blocks', 0)} read={node.get('Shared Read Blocks', 0)})")
+        lines.append('  ' * depth + label)
+        for child in node.get('Plans', ()):
+            walk(child, depth + 1)
+
+    walk(plan['Plan'], 0)
+    for trigger in plan.get('Triggers', ()):
+        line = f"Trigger {trigger['Trigger Name']}"
+        if numbers:
+            line += f" (calls={trigger['Calls']} time={trigger['Time']:.3f}ms)"
+        lines.append(line)
+    if numbers:
+        lines.append(f"Planning Time: {plan.get('Planning Time', 0):.3f}ms")
+        lines.append(f"Execution Time: {plan.get('Execution Time', 0):.3f}ms")
+    return lines
+
+
+def plan_totals(plan):
+    root = plan['Plan']
+    return {
+        'execution_ms': round(plan.get('Execution Time', 0), 3),
+        'planning_ms': round(plan.get('Planning Time', 0), 3),
+        'buffers': root.get('Shared Hit Blocks', 0) + root.get('Shared Read Blocks', 0),
+        'read': root.get('Shared Read Blocks', 0),
+        'triggers_ms': round(sum(trigger['Time'] for trigger in plan.get('Triggers', ())), 3),
+        'shape': plan_lines(plan, numbers=False),
+    }
+
+
+def bench_claim(connection, backlogs, offsets, limit, repeat):
+    """
+    Latência da reserva por (backlog, deslocamento) e o plano da reserva no
+    backlog completo, sem deslocamento.
+    """
+    from app.spv_scraper import SPVAutomatico
+
+    sql, params = SPVAutomatico._claim_query(limit)
+    results, plan = [], None
+    with connection.cursor() as cursor:
+        total = scale(cursor)['backlog']
+        for backlog in [size for size in backlogs if size < total] + [total]:
+            for offset in [value for value in offsets if value < backlog]:
+                if backlog < total:
+                    limit_backlog(cursor, backlog)
+                lease_ahead(cursor, offset)
+                durations, rows = timed(cursor, sql, params, repeat)
+                if backlog == total and offset == 0:
+                    plan = explain(cursor, sql, params)
+                connection.rollback()
+                results.append({
+                    'backlog': backlog, 'offset': offset, 'claimed': len(rows),
+                    'p50': round(statistics.median(durations), 4),
+                    'p95': round(percentile(durations, 0.95), 4),
+                    'max': round(max(durations), 4),
+                })
+                print(f"reserva backlog={backlog} deslocamento={offset}: {len(rows)} pesquisas, "
+                      f"p50 {results[-1]['p50'] * 1000:.1f}ms p95 {results[-1]['p95'] * 1000:.1f}ms")
+    return results, plan
+
+
+def synthetic_page(cod_pesquisa, search_filter, size):
+    """HTML com o tamanho aproximado de uma página do eSAJ, distinto por (pesquisa, filtro)."""
+    linha = f"<tr><td>{cod_pesquisa}</td><td>filtro {search_filter}</td><td>Processo 0000000-00.0000.8.26.0000</td></tr>\n"
+    return "<html><body><table>\n" + linha * max(1, size // len(linha)) + "</table></body></html>"
+
+
+def bench_insert(connection, batches, batch_size, page_bytes):
+    """
+    Vazão da gravação do ResultWriter em lotes de `batch_size` resultados
+    para (pesquisa, filtro) pendentes, e o plano de um lote.
+    """
+    from app.page_archive import archive
+    from app.result_writer import ResultWriter
+
+    writer = ResultWriter(None)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT Cod_Pesquisa, Filtro FROM pesquisa_pendente ORDER BY Cod_Pesquisa, Filtro LIMIT %s",
+            ((batches + 1) * batch_size,)
+        )
+        pending = cursor.fetchall()
+        if len(pending) < batch_size * 2:
+            print("Backlog pequeno demais para medir a gravação.")
+            return None, None
+        rows = [
+            writer._row(cod, 1, search_filter,
+                        archive(synthetic_page(cod, search_filter, page_bytes)) if page_bytes else None)
+            for cod, search_filter in pending
+        ]
+        chunks = [rows[start:start + batch_size] for start in range(0, len(rows), batch_size)]
+        sample, chunks = chunks[0], [chunk for chunk in chunks[1:] if len(chunk) == batch_size]
+
+        durations = []
+        for chunk in chunks:
+            started = time.perf_counter()
+            psycopg2.extras.execute_values(cursor, writer.SQL, chunk, template=writer.TEMPLATE, page_size=len(chunk))
+            durations.append(time.perf_counter() - started)
+        values = b','.join(cursor.mogrify(writer.TEMPLATE, row) for row in sample)
+        plan = explain(cursor, cursor.mogrify(writer.SQL, (AsIs(values.decode()),)).decode())
+        connection.rollback()
+
+    result = {
+        'batch_size': batch_size,
+        'batches': len(durations),
+        'rows_per_second': round(len(durations) * batch_size / sum(durations), 1),
+        'p50': round(statistics.median(durations), 4),
+        'p95': round(percentile(durations, 0.95), 4),
+    }
+    print(f"gravação: {result['batches']} lotes de {batch_size}, {result['rows_per_second']} resultados/s, "
+          f"p50 {result['p50'] * 1000:.1f}ms p95 {result['p95'] * 1000:.1f}ms")
+    return result, plan
+
+
+def compare(report, snapshot, tolerance):
+    """
+    Regressões em relação ao snapshot: planos com forma diferente (qualquer
+    mudança, independente da tolerância) e métricas por ponto medido.
+    """
+    regressions = []
+    for name, totals in report['plans'].items():
+        shape = snapshot['plans'].get(name, {}).get('shape')
+        if shape is not None and shape != totals['shape']:
+            regressions.append(f"plano {name}: forma diferente do snapshot")
+    current, previous = gate_values(report), gate_values(snapshot)
+    for key, higher_is_better in GATES:
+        for point, value in current.get(key, {}).items():
+            reference = previous.get(key, {}).get(point)
+            if not reference or value is None:
+                continue
+            change = (value - reference) / reference
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{key} {point}: {reference} -> {value} ({change:+.0%})")
+    return regressions
+
+
+def gate_values(report):
+    return {
+        'claim_p50': {f"backlog={item['backlog']} offset={item['offset']}": item['p50'] for item in report['claim']},
+        'insert_rows_per_second': {'': (report.get('insert') or {}).get('rows_per_second')},
+        'plan_buffers': {name: totals['buffers'] for name, totals in report['plans'].items()},
+    }
+
+
+def save_snapshot(directory, report, plans):
+    os.makedirs(directory, exist_ok=True)
+    for name, plan in plans.items():
+        with open(os.path.join(directory, f"{name}.json"), 'w') as f:
+            json.dump(plan, f, indent=2)
+            f.write('\n')
+        with open(os.path.join(directory, f"{name}.txt"), 'w') as f:
+            f.write('\n'.join(plan_lines(plan)) + '\n')
+    with open(os.path.join(directory, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+    print(f"Snapshot salvo em {directory}")
+
+
+def diff_plans(directory, plans):
+    """Mostra o diff da forma de cada plano em relação ao snapshot. Retorna os planos que mudaram."""
+    changed = []
+    for name, plan in plans.items():
+        path = os.path.join(directory, f"{name}.json")
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            before = plan_lines(json.load(f), numbers=False)
+        after = plan_lines(plan, numbers=False)
+        if before != after:
+            changed.append(name)
+            print(f"Plano de {name} mudou:")
+            print('\n'.join(difflib.unified_diff(before, after, 'snapshot', 'atual', lineterm='')))
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backlogs', type=parse_sizes, default=parse_sizes('1000,10000,100000'),
+                        help="tamanhos de pesquisa_pendente medidos, além do backlog completo")
+    parser.add_argument('--offsets', type=parse_sizes, default=parse_sizes('0,1000,10000'),
+                        help="pendências do topo da fila já reservadas por outra réplica")
+    parser.add_argument('--limit', type=int, default=Config.ASYNC_FETCH_BATCH, help="pesquisas por reserva")
+    parser.add_argument('--repeat', type=int, default=10, help="medições por ponto")
+    parser.add_argument('--batches', type=int, default=20, help="lotes gravados na medição da gravação")
+    parser.add_argument('--batch-size', type=int, default=Config.RESULT_BATCH_SIZE)
+    parser.add_argument('--page-bytes', type=int, default=20000,
+                        help="tamanho da página arquivada com cada resultado (0: sem página)")
+    parser.add_argument('--snapshot', default=SNAPSHOT, help="diretório dos planos e do relatório")
+    parser.add_argument('--save-snapshot', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--output', help="grava o relatório em JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    from app.database import db
+
+    connection = db.dedicated_connection()
+    # Cada medição em uma transação, desfeita ao final
+    connection.autocommit = False
+    try:
+        with connection.cursor() as cursor:
+            report = {'settings': settings(cursor), 'scale': scale(cursor)}
+        connection.rollback()
+        print(f"Backlog: {report['scale']['backlog']} (pesquisa, filtro); tabelas: "
+              + ', '.join(f"{name} ~{table['rows']}" for name, table in report['scale']['tables'].items()))
+        report['claim'], claim_plan = bench_claim(connection, args.backlogs, args.offsets, args.limit, args.repeat)
+        report['insert'], insert_plan = bench_insert(connection, args.batches, args.batch_size, args.page_bytes)
+    finally:
+        connection.close()
+
+    plans = {name: plan for name, plan in (('claim', claim_plan), ('insert', insert_plan)) if plan is not None}
+    report['plans'] = {name: plan_totals(plan) for name, plan in plans.items()}
+    report['params'] = {key: value for key, value in vars(args).items()
+                        if key not in ('snapshot', 'save_snapshot', 'tolerance', 'output')}
+    for name, totals in report['plans'].items():
+        print(f"plano {name}: {totals['execution_ms']}ms, {totals['buffers']} buffers "
+              f"({totals['read']} lidos do disco), triggers {totals['triggers_ms']}ms")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_snapshot:
+        save_snapshot(args.snapshot, report, plans)
+        return 0
+
+    report_path = os.path.join(args.snapshot, 'report.json')
+    if not os.path.exists(report_path):
+        print("Sem snapshot para comparar (use --save-snapshot).")
+        return 0
+    with open(report_path) as f:
+        snapshot = json.load(f)
+    if snapshot['params'] != report['params'] or snapshot['scale']['backlog'] != report['scale']['backlog']:
+        print(f"Aviso: parâmetros ou backlog diferentes do snapshot {snapshot['params']}")
+    diff_plans(args.snapshot, plans)
+    regressions = compare(report, snapshot, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSÃO {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+Benchmark ponta a ponta do SPVAutomatico sem serviços externos.
+
+Sobe o stub do eSAJ (tests/esaj_stub.py) com latência, taxa de erro e
+distribuição de resultados configuráveis, semeia N pesquisas no PostgreSQL
+apontado pelas variáveis DB_* e processa só essas pesquisas, em todos os
+filtros, pelo modo síncrono (workers) ou pelo pipeline assíncrono.
+
+Mede consultas por segundo, p50/p95/p99 de cada estágio (a partir dos
+histogramas de app.metrics) e idas ao banco por consulta. O resultado é
+comparado com o baseline salvo; uma regressão acima da tolerância termina
+com código 1.
+
+    python benchmarks/bench_e2e.py --pesquisas 500 --workers 8
+    python benchmarks/bench_e2e.py --save-baseline
+
+Use um banco descartável: as pesquisas do benchmark são criadas com
+Cod_Cliente = BENCH_CLIENTE e removidas ao final.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+from esaj_stub import EsajStub, RESULT_KINDS
+
+from app.config import Config
+
+BENCH_CLIENTE = 990000
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline_e2e.json')
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Métricas comparadas com o baseline: (chave, maior é melhor)
+GATES = (
+    ('lookups_per_second', True),
+    ('db_round_trips_per_lookup', False),
+)
+
+
+def parse_mix(text):
+    """'nada_consta=2,criminal=1,civel=1' -> {'nada_consta': 2.0, ...}"""
+    mix = {}
+    for item in text.split(','):
+        kind, _, weight = item.partition('=')
+        if kind.strip() not in RESULT_KINDS:
+            raise argparse.ArgumentTypeError(f"Tipo de resultado desconhecido: {kind!r}")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+
+def cleanup(db):
+    for table in ('pesquisa_spv_processo', 'pesquisa_spv', 'lote_pesquisa'):
+        db.execute(
+            f"DELETE FROM {table} WHERE Cod_Pesquisa IN (SELECT Cod_Pesquisa FROM pesquisa WHERE Cod_Cliente = %s)",
+            (BENCH_CLIENTE,)
+        )
+    db.execute("DELETE FROM pesquisa WHERE Cod_Cliente = %s", (BENCH_CLIENTE,))
+
+
+def seed(db, total):
+    """Cria `total` pesquisas pendentes em SP, metade delas com RG. Retorna os Cod_Pesquisa."""
+    rows = db.execute_returning(
+        """
+        INSERT INTO pesquisa (Cod_Cliente, Cod_Servico, Cod_UF, Data_Entrada, Nome, CPF, RG,
+                              Nascimento, Mae, Tipo)
+        SELECT %(cliente)s, (SELECT MIN(Cod_Servico) FROM servico),
+               (SELECT Cod_UF FROM estado WHERE UF = 'SP'), CURRENT_TIMESTAMP,
+               'Pessoa Benchmark ' || g, lpad((%(cliente)s::bigint * 100000 + g)::text, 11, '0'),
+               CASE WHEN g %% 2 = 0 THEN 'RG' || g END, DATE '1980-01-01', 'Mae Benchmark ' || g, 0
+        FROM generate_series(1, %(total)s) g
+        RETURNING Cod_Pesquisa
+        """,
+        {'cliente': BENCH_CLIENTE, 'total': total}
+    )
+    return {row[0] for row in rows}
+
+
+def run_sync(spv, cods):
+    spv.process_pesquisas(cods)
+    spv.result_writer.flush()
+
+
+def run_async(spv, cods, concurrency):
+    from app.async_pipeline import AsyncPipeline
+
+    async def cycle():
+        pipeline = AsyncPipeline(spv, lookup_concurrency=concurrency)
+        await pipeline.open()
+        try:
+            await pipeline.process_cycle(cods)
+            await pipeline.adb.run(spv.result_writer.flush)
+        finally:
+            await pipeline.close()
+
+    asyncio.run(cycle())
+
+
+def collect(elapsed, pesquisas, stub):
+    from app.metrics import STAGE_SECONDS, DB_SECONDS, LOOKUPS, RESULTS
+
+    # Cada consulta termina no HTTP (ok) ou no Selenoid (fallback incluído)
+    lookups = sum(value for key, value in LOOKUPS.values().items()
+                  if dict(key)['engine'] == 'selenium' or dict(key)['outcome'] == 'ok')
+    round_trips = sum(count for key, count in DB_SECONDS.counts().items()
+                      if dict(key).get('operation') != 'checkout')
+    stages = {}
+    for key in sorted(STAGE_SECONDS.counts()):
+        labels = dict(key)
+        stages[labels['stage']] = {
+            f"p{round(q * 100)}": round(STAGE_SECONDS.quantile(q, **labels), 4) for q in QUANTILES
+        }
+    results = {}
+    for key, value in RESULTS.values().items():
+        resultado = str(dict(key)['resultado'])
+        results[resultado] = results.get(resultado, 0) + value
+
+    return {
+        'pesquisas': pesquisas,
+        'seconds': round(elapsed, 3),
+        'lookups': lookups,
+        'stub_requests': stub.requests,
+        'lookups_per_second': round(lookups / elapsed, 2) if elapsed else 0.0,
+        'db_round_trips': round_trips,
+        'db_round_trips_per_lookup': round(round_trips / lookups, 3) if lookups else 0.0,
+        'results': dict(sorted(results.items())),
+        'stages': stages,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Lista de regressões em relação ao baseline (vazia se nenhuma)."""
+    regressions = []
+    for key, higher_is_better in GATES:
+        expected, actual = baseline['report'].get(key), report.get(key)
+        if not expected:
+            continue
+        change = (actual - expected) / expected
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f"{key}: {actual} (baseline {expected}, {change:+.0%})")
+    return regressions
+
+
+def print_report(report):
+    print(f"\n{report['pesquisas']} pesquisas, {report['lookups']} consultas em {report['seconds']}s")
+    print(f"Consultas/s: {report['lookups_per_second']}")
+    print(f"Idas ao banco: {report['db_round_trips']} ({report['db_round_trips_per_lookup']} por consulta)")
+    print(f"Resultados por código: {report['results']}")
+    print(f"{'estágio':<16}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for stage, values in report['stages'].items():
+        print(f"{stage:<16}" + ''.join(f"{values[name]:>10.4f}" for name in ('p50', 'p95', 'p99')))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pesquisas', type=int, default=500)
+    parser.add_argument('--mode', choices=('sync', 'async'), default='sync')
+    parser.add_argument('--workers', type=int, default=8, help="workers (sync) ou consultas simultâneas (async)")
+    parser.add_argument('--latency', type=float, default=0.05, help="latência do stub em segundos")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--captcha-rate', type=float, default=0.0)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('nada_consta=2,criminal=1,civel=1'))
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--output', help="grava o relatório em JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    stub = EsajStub(latency=args.latency, error_rate=args.error_rate,
+                    captcha_rate=args.captcha_rate, mix=args.mix).start()
+    # Todas as consultas pelo stub; o cache persistente faria as execuções
+    # seguintes não consultarem nada
+    Config.ESAJ_BASE_URL = stub.base_url
+    Config.ESAJ_OPEN_URL = f"{stub.base_url}/open.do"
+    Config.ESAJ_ENGINE_DOCPARTE = 'http'
+    Config.ESAJ_ENGINE_NMPARTE = 'http'
+    Config.RESULT_CACHE_PERSISTENT = False
+
+    from app.database import db
+    from app.metrics import registry
+    from app.spv_scraper import SPVAutomatico
+
+    cleanup(db)
+    cods = seed(db, args.pesquisas)
+    spv = SPVAutomatico(workers=args.workers)
+    registry.reset()
+    try:
+        started = time.monotonic()
+        if args.mode == 'async':
+            run_async(spv, cods, args.workers)
+        else:
+            run_sync(spv, cods)
+        report = collect(time.monotonic() - started, len(cods), stub)
+    finally:
+        if args.mode == 'sync':
+            spv.close()
+        cleanup(db)
+        stub.stop()
+
+    params = {key: value for key, value in vars(args).items()
+              if key not in ('baseline', 'save_baseline', 'tolerance', 'output')}
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'params': params, 'report': report}, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'params': params, 'report': report}, f, indent=2)
+            f.write('\n')
+        print(f"Baseline salvo em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("Sem baseline para comparar (use --save-baseline).")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['params'] != params:
+        print(f"Aviso: parâmetros diferentes do baseline {baseline['params']}")
+    regressions = compare(report, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSÃO {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
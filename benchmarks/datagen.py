@@ -0,0 +1,244 @@
+"""
+Gerador de dados sintéticos para o benchmark do banco em escala.
+
+Carrega por COPY, no esquema de docker-entrypoint-initdb.d/init.sql,
+pesquisas com nomes, documentos, clientes e lotes verossímeis e os
+resultados já gravados em pesquisa_spv. As pesquisas mais antigas estão
+concluídas (Data_Conclusao preenchida e um resultado por filtro aplicável,
+cerca de 4 por pesquisa); as `--pendentes` mais novas formam o backlog de
+pesquisa_pendente, parte delas com algum filtro já resolvido. Os nomes são
+combinações de listas curtas, de modo que há homônimos como no cadastro
+real. Os triggers ficam ligados: a fila é montada pelo próprio banco a cada
+bloco copiado.
+
+    python benchmarks/datagen.py --pesquisas 10000000 --pendentes 200000
+    python benchmarks/datagen.py --cleanup
+
+Use um banco descartável: as pesquisas geradas têm Cod_Cliente a partir de
+DATAGEN_CLIENTE e os lotes a descrição 'datagen ...'; --cleanup remove tudo.
+"""
+import argparse
+import datetime
+import io
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+DATAGEN_CLIENTE = 900000
+
+PRIMEIROS = (
+    'Ana', 'Maria', 'José', 'João', 'Antônio', 'Francisco', 'Carlos', 'Paulo', 'Pedro', 'Lucas',
+    'Luiz', 'Marcos', 'Luís', 'Gabriel', 'Rafael', 'Daniel', 'Marcelo', 'Bruno', 'Eduardo', 'Felipe',
+    'Raimundo', 'Rodrigo', 'Manoel', 'Mateus', 'André', 'Fernando', 'Fábio', 'Leonardo', 'Gustavo', 'Guilherme',
+    'Juliana', 'Márcia', 'Adriana', 'Fernanda', 'Patrícia', 'Aline', 'Sandra', 'Camila', 'Amanda', 'Bruna',
+    'Jéssica', 'Letícia', 'Júlia', 'Luciana', 'Vanessa', 'Mariana', 'Gabriela', 'Vera', 'Vitória', 'Larissa',
+    'Cláudia', 'Beatriz', 'Conceição', 'Luana', 'Rita', 'Sônia', 'Renata', 'Eliane', 'Josefa', 'Simone',
+)
+SOBRENOMES = (
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+    'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira', 'Barbosa',
+    'Rocha', 'Dias', 'Nascimento', 'Andrade', 'Moreira', 'Nunes', 'Marques', 'Machado', 'Mendes', 'Freitas',
+    'Cardoso', 'Ramos', 'Gonçalves', 'Santana', 'Teixeira', 'Araújo', 'Pinto', 'Moraes', 'Correia', 'Cavalcanti',
+    'Batista', 'Monteiro', 'Dantas', 'Campos', 'Azevedo', 'Conceição', 'Brito', 'Castro', 'Falcão', 'Simões',
+    "D'Ávila", 'Peixoto', 'Magalhães', 'Assunção', 'Guimarães', 'Xavier', 'Pimentel', 'Sá', 'Leão', 'Brandão',
+)
+
+# Distribuição dos resultados gravados: nada consta, criminal, cível, erro
+RESULTADOS = (1, 2, 5, 7)
+PESOS_RESULTADOS = (80, 6, 12, 2)
+
+PESQUISA_COLUMNS = ('Cod_Pesquisa', 'Cod_Cliente', 'Cod_Servico', 'Cod_UF', 'Data_Entrada', 'Data_Conclusao',
+                    'Nome', 'CPF', 'RG', 'Nascimento', 'Mae', 'Tipo')
+SPV_COLUMNS = ('Cod_Pesquisa', 'Cod_SPV', 'Cod_spv_computador', 'Resultado', 'Cod_Funcionario', 'Filtro',
+               'Website_ID', 'Data_Registro')
+NULL = r'\N'
+
+
+def copy_line(values):
+    """Linha no formato texto do COPY (os valores gerados não têm tabulação nem barra invertida)."""
+    return '\t'.join(NULL if value is None else str(value) for value in values) + '\n'
+
+
+def reserve(cursor, table, column, total):
+    """Reserva `total` valores da sequência da coluna SERIAL e retorna o primeiro."""
+    cursor.execute(
+        "SELECT setval(pg_get_serial_sequence(%s, %s), nextval(pg_get_serial_sequence(%s, %s)) + %s - 1)",
+        (table, column, table, column, total)
+    )
+    return cursor.fetchone()[0] - total + 1
+
+
+class Generator:
+    """
+    Gera as linhas de blocos consecutivos de pesquisas. Cada grupo de `lote`
+    pesquisas pertence a um cliente (sorteado com peso maior para os
+    primeiros, como os poucos clientes grandes do cadastro) e, com `lote`
+    maior que zero, a um lote criado na entrada da primeira delas. Data_Entrada
+    cresce com o Cod_Pesquisa ao longo de `dias` até agora.
+    """
+
+    def __init__(self, total, pendentes, clientes=200, lote=500, rg_rate=0.95, parcial=0.3, dias=365, seed=1):
+        self.total = total
+        self.pendentes = min(pendentes, total)
+        self.clientes = clientes
+        self.lote = lote
+        self.rg_rate = rg_rate
+        self.parcial = parcial
+        self.seed = seed
+        self.now = datetime.datetime.now().replace(microsecond=0)
+        self.start = self.now - datetime.timedelta(days=dias)
+        self.span = (self.now - self.start).total_seconds()
+        self.spv_rows = 0
+
+    def _group(self, group):
+        rng = random.Random(self.seed * 1000003 + group)
+        cliente = DATAGEN_CLIENTE + int(self.clientes * rng.random() ** 3)
+        return cliente, rng
+
+    def block(self, first, size, cod_base, lote_base, cod_uf, cod_servico):
+        """
+        Linhas COPY de pesquisa, pesquisa_spv, lote e lote_pesquisa para as
+        pesquisas de índice first .. first + size - 1 (índices múltiplos de `lote`).
+        """
+        pesquisas, resultados, lotes, lote_pesquisas = io.StringIO(), io.StringIO(), io.StringIO(), io.StringIO()
+        concluidas = self.total - self.pendentes
+        group_size = self.lote or 500
+        for group in range(first // group_size, (first + size + group_size - 1) // group_size):
+            cliente, rng = self._group(group)
+            indices = range(max(first, group * group_size), min(first + size, (group + 1) * group_size, self.total))
+            for index in indices:
+                cod = cod_base + index
+                entrada = self.start + datetime.timedelta(
+                    seconds=self.span * index / self.total + rng.uniform(-1800, 1800)
+                )
+                entrada = min(entrada, self.now)
+                if self.lote and index == indices[0]:
+                    cod_lote = lote_base + group
+                    lotes.write(copy_line((cod_lote, f"datagen {cliente} {group}", entrada)))
+                concluida = index < concluidas
+                pf = rng.random() < 0.97
+                nome = f"{rng.choice(PRIMEIROS)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+                mae = f"{rng.choice(PRIMEIROS)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+                rg = f"{cod * 7919 % 10 ** 9:09d}" if rng.random() < self.rg_rate else None
+                nascimento = datetime.date(1940, 1, 1) + datetime.timedelta(days=rng.randrange(365 * 65))
+                conclusao = entrada + datetime.timedelta(minutes=rng.randrange(5, 2880)) if concluida else None
+                if conclusao is not None and conclusao > self.now:
+                    conclusao = self.now
+                pesquisas.write(copy_line((
+                    cod, cliente, cod_servico, cod_uf, entrada, conclusao, nome, f"{cod:011d}", rg,
+                    nascimento, mae, 0 if pf else 1,
+                )))
+                if self.lote:
+                    lote_pesquisas.write(copy_line((lote_base + group, cod)))
+
+                if not pf:
+                    continue
+                for filtro in (0, 1, 2, 3):
+                    if filtro in (1, 3) and rg is None:
+                        continue
+                    if not concluida and rng.random() >= self.parcial:
+                        continue
+                    registro = (conclusao or self.now) - datetime.timedelta(seconds=rng.randrange(60))
+                    resultado = rng.choices(RESULTADOS, PESOS_RESULTADOS)[0]
+                    resultados.write(copy_line((cod, 1, 36, resultado, -1, filtro, 1, registro)))
+                    self.spv_rows += 1
+        return {'lote': lotes, 'pesquisa': pesquisas, 'lote_pesquisa': lote_pesquisas, 'pesquisa_spv': resultados}
+
+
+def copy(cursor, table, columns, data):
+    data.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", data)
+
+
+def load(connection, generator, chunk=100000):
+    """
+    Copia os blocos em ordem (lote, pesquisa, lote_pesquisa, pesquisa_spv),
+    um COPY por tabela e bloco em autocommit. Retorna os segundos gastos.
+    """
+    started = time.monotonic()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT Cod_UF FROM estado WHERE UF = 'SP'")
+        cod_uf = cursor.fetchone()[0]
+        cursor.execute("SELECT MIN(Cod_Servico) FROM servico")
+        cod_servico = cursor.fetchone()[0]
+        cod_base = reserve(cursor, 'pesquisa', 'cod_pesquisa', generator.total)
+        lote_base = reserve(cursor, 'lote', 'cod_lote', -(-generator.total // generator.lote)) if generator.lote else None
+
+        if generator.lote:
+            # Blocos alinhados aos lotes: cada lote é criado em um único bloco
+            chunk = max(generator.lote, chunk - chunk % generator.lote)
+        for first in range(0, generator.total, chunk):
+            data = generator.block(first, chunk, cod_base, lote_base, cod_uf, cod_servico)
+            copy(cursor, 'lote', ('Cod_Lote', 'Descricao_Lote', 'Data_Criacao'), data['lote'])
+            copy(cursor, 'pesquisa', PESQUISA_COLUMNS, data['pesquisa'])
+            copy(cursor, 'lote_pesquisa', ('Cod_Lote', 'Cod_Pesquisa'), data['lote_pesquisa'])
+            copy(cursor, 'pesquisa_spv', SPV_COLUMNS, data['pesquisa_spv'])
+            done = min(first + chunk, generator.total)
+            elapsed = time.monotonic() - started
+            print(f"{done}/{generator.total} pesquisas, {generator.spv_rows} resultados "
+                  f"({done / elapsed:.0f} pesquisas/s)")
+
+        print("Atualizando estatísticas (VACUUM ANALYZE)...")
+        for table in ('lote', 'pesquisa', 'lote_pesquisa', 'pesquisa_spv', 'pesquisa_pendente'):
+            cursor.execute(f"VACUUM ANALYZE {table}")
+    return time.monotonic() - started
+
+
+def cleanup(connection):
+    with connection.cursor() as cursor:
+        for table in ('pesquisa_spv_processo', 'pesquisa_spv', 'lote_pesquisa'):
+            cursor.execute(
+                f"DELETE FROM {table} WHERE Cod_Pesquisa IN "
+                "(SELECT Cod_Pesquisa FROM pesquisa WHERE Cod_Cliente >= %s AND Cod_Cliente < %s)",
+                (DATAGEN_CLIENTE, DATAGEN_CLIENTE + 90000)
+            )
+        cursor.execute("DELETE FROM pesquisa WHERE Cod_Cliente >= %s AND Cod_Cliente < %s",
+                       (DATAGEN_CLIENTE, DATAGEN_CLIENTE + 90000))
+        removed = cursor.rowcount
+        cursor.execute("DELETE FROM lote WHERE Descricao_Lote LIKE 'datagen %'")
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pesquisas', type=int, default=100000)
+    parser.add_argument('--pendentes', type=int, default=20000, help="pesquisas mais novas ainda em aberto")
+    parser.add_argument('--clientes', type=int, default=200)
+    parser.add_argument('--lote', type=int, default=500, help="pesquisas por lote (0: sem lotes)")
+    parser.add_argument('--rg-rate', type=float, default=0.95, help="fração das pesquisas com RG")
+    parser.add_argument('--parcial', type=float, default=0.3,
+                        help="chance de cada filtro de uma pesquisa pendente já ter resultado")
+    parser.add_argument('--dias', type=int, default=365, help="período de Data_Entrada, até agora")
+    parser.add_argument('--chunk', type=int, default=100000, help="pesquisas por bloco do COPY")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--cleanup', action='store_true', help="remove os dados gerados e termina")
+    args = parser.parse_args(argv)
+    if args.clientes > 90000:
+        parser.error("--clientes deve ser no máximo 90000")
+
+    from app.database import db
+
+    connection = db.dedicated_connection()
+    try:
+        if args.cleanup:
+            print(f"{cleanup(connection)} pesquisas removidas.")
+            return 0
+        generator = Generator(args.pesquisas, args.pendentes, clientes=args.clientes, lote=args.lote,
+                              rg_rate=args.rg_rate, parcial=args.parcial, dias=args.dias, seed=args.seed)
+        elapsed = load(connection, generator, chunk=args.chunk)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM pesquisa_pendente")
+            backlog = cursor.fetchone()[0]
+    finally:
+        connection.close()
+    print(f"{args.pesquisas} pesquisas e {generator.spv_rows} resultados carregados em {elapsed:.1f}s; "
+          f"{backlog} (pesquisa, filtro) em pesquisa_pendente.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
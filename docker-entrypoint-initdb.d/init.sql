@@ -47,6 +47,16 @@ CREATE TABLE IF NOT EXISTS lote_pesquisa (
     PRIMARY KEY (Cod_Lote, Cod_Pesquisa)
 );
 
+-- Criação da tabela spv_pagina (páginas do eSAJ consultadas, comprimidas e deduplicadas pelo SHA-256 do HTML;
+-- usadas para reclassificar resultados sem consultar o site de novo)
+CREATE TABLE IF NOT EXISTS spv_pagina (
+    Hash BYTEA PRIMARY KEY,
+    Compressao VARCHAR(10) NOT NULL, -- zstd ou gzip
+    Conteudo BYTEA NOT NULL,
+    Tamanho INT NOT NULL, -- Bytes do HTML original
+    Data_Captura TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Criação da tabela pesquisa_spv
 CREATE TABLE IF NOT EXISTS pesquisa_spv (
     Cod_Pesquisa_SPV SERIAL PRIMARY KEY, 
@@ -58,7 +68,71 @@ CREATE TABLE IF NOT EXISTS pesquisa_spv (
     Cod_Funcionario INT,
     Filtro INT,
     Website_ID INT,
-    Data_Registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    Data_Registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    Hash_Pagina BYTEA REFERENCES spv_pagina(Hash) -- Página que originou o resultado (NULL: cache ou erro)
+);
+
+-- Criação da tabela pesquisa_spv_processo (processos encontrados na consulta de cada filtro)
+CREATE TABLE IF NOT EXISTS pesquisa_spv_processo (
+    Cod_Pesquisa INT REFERENCES pesquisa(Cod_Pesquisa),
+    Filtro INT,
+    Numero_Processo VARCHAR(30),
+    Classe VARCHAR(255),
+    Assunto VARCHAR(255),
+    Foro VARCHAR(255),
+    Area VARCHAR(50), -- Criminal ou Cível
+    Data_Distribuicao DATE,
+    Data_Registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (Cod_Pesquisa, Filtro, Numero_Processo)
+);
+
+-- Forma canônica dos nomes, a mesma de app/names.py: sem apóstrofos, decomposta (NFKD) e sem os diacríticos
+-- combinantes, só as letras ASCII em maiúsculas (independente do locale) e os demais sinais trocados por um
+-- espaço simples. Usada para agrupar as consultas por nome.
+CREATE OR REPLACE FUNCTION normaliza_nome(nome TEXT) RETURNS TEXT AS $$
+    SELECT NULLIF(btrim(regexp_replace(
+        translate(
+            regexp_replace(
+                normalize(regexp_replace(nome, '[''´`’]', '', 'g'), NFKD),
+                '[\u0300-\u036F\u1AB0-\u1AFF\u1DC0-\u1DFF\u20D0-\u20FF\uFE20-\uFE2F]', '', 'g'
+            ),
+            'abcdefghijklmnopqrstuvwxyz', 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+        ),
+        '[^A-Z0-9]+', ' ', 'g'
+    )), '')
+$$ LANGUAGE SQL IMMUTABLE;
+
+-- Criação da tabela pesquisa_pendente (fila de trabalho: uma linha por pesquisa e filtro ainda sem resultado,
+-- mantida pelos triggers abaixo, com os dados já resolvidos, o lease da réplica/worker que a reservou e o
+-- estado das retentativas de consultas que falharam)
+CREATE TABLE IF NOT EXISTS pesquisa_pendente (
+    Cod_Pesquisa INT REFERENCES pesquisa(Cod_Pesquisa) ON DELETE CASCADE,
+    Filtro INT,
+    Cod_Cliente INT NOT NULL, -- -1 para pesquisas sem cliente
+    Data_Entrada TIMESTAMP NOT NULL,
+    Cod_Lote INT,
+    Data_Lote TIMESTAMP,
+    Nome VARCHAR(255), -- COALESCE(Nome_Corrigido, Nome)
+    CPF VARCHAR(14),
+    RG VARCHAR(20), -- COALESCE(RG_Corrigido, RG)
+    Nascimento DATE,
+    Mae VARCHAR(255), -- COALESCE(Mae_Corrigido, Mae)
+    Nome_Normalizado VARCHAR(255) GENERATED ALWAYS AS (normaliza_nome(Nome)) STORED,
+    Worker_ID VARCHAR(100),
+    Lease_Ate TIMESTAMP,
+    Tentativas INT NOT NULL DEFAULT 0, -- Consultas que falharam
+    Proxima_Tentativa TIMESTAMP, -- Fora da fila até este momento (espera da retentativa)
+    Ultimo_Erro VARCHAR(255),
+    PRIMARY KEY (Cod_Pesquisa, Filtro)
+);
+
+-- Criação da tabela spv_cache_consulta (cache persistente de resultados por documento consultado)
+CREATE TABLE IF NOT EXISTS spv_cache_consulta (
+    Tipo_Consulta VARCHAR(10), -- DOCPARTE ou NMPARTE
+    Documento VARCHAR(255), -- Documento normalizado
+    Resultado INT NOT NULL,
+    Data_Consulta TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (Tipo_Consulta, Documento)
 );
 
 -- Índices para otimização de consultas comuns
@@ -68,6 +142,162 @@ CREATE INDEX IF NOT EXISTS idx_pesquisa_nome ON pesquisa(Nome);
 CREATE INDEX IF NOT EXISTS idx_pesquisa_data_conclusao ON pesquisa(Data_Conclusao);
 CREATE INDEX IF NOT EXISTS idx_pesquisa_spv_pesquisa ON pesquisa_spv(Cod_Pesquisa);
 CREATE INDEX IF NOT EXISTS idx_pesquisa_spv_filtro ON pesquisa_spv(Filtro);
+CREATE INDEX IF NOT EXISTS idx_pesquisa_spv_pagina ON pesquisa_spv(Hash_Pagina) WHERE Hash_Pagina IS NOT NULL;
+-- Fila de trabalho por cliente e idade (prioridade em _get_pesquisas)
+CREATE INDEX IF NOT EXISTS idx_pesquisa_pendente_fila ON pesquisa_pendente (Cod_Cliente, Data_Entrada, Cod_Pesquisa);
+-- Próxima retentativa agendada (só as linhas em espera)
+CREATE INDEX IF NOT EXISTS idx_pesquisa_pendente_retentativa ON pesquisa_pendente (Proxima_Tentativa)
+    WHERE Proxima_Tentativa IS NOT NULL;
+-- Pendências do filtro 2 com o mesmo nome (reservadas juntas, atendidas por uma única consulta)
+CREATE INDEX IF NOT EXISTS idx_pesquisa_pendente_nome ON pesquisa_pendente (Nome_Normalizado) WHERE Filtro = 2;
+CREATE INDEX IF NOT EXISTS idx_lote_pesquisa_pesquisa ON lote_pesquisa(Cod_Pesquisa);
+-- Chave usada pelo ON CONFLICT da gravação em lote (evita resultados duplicados)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_pesquisa_spv_pesquisa_spv_filtro ON pesquisa_spv(Cod_Pesquisa, Cod_SPV, Filtro);
+
+-- Notifica o serviço (LISTEN pesquisa_pendente) sobre pesquisas novas ou alteradas ainda em aberto
+CREATE OR REPLACE FUNCTION notifica_pesquisa_pendente() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('pesquisa_pendente', NEW.Cod_Pesquisa::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_pesquisa_pendente ON pesquisa;
+CREATE TRIGGER trg_pesquisa_pendente
+    AFTER INSERT OR UPDATE ON pesquisa
+    FOR EACH ROW
+    WHEN (NEW.Data_Conclusao IS NULL AND NEW.Tipo = 0)
+    EXECUTE FUNCTION notifica_pesquisa_pendente();
+
+-- Recalcula as linhas de pesquisa_pendente das pesquisas informadas: uma por filtro (0 a 3) que se aplica
+-- à pesquisa e ainda não tem resultado. Os filtros 1 e 3 consultam pelo RG e só se aplicam a quem tem RG.
+-- O lease das linhas que continuam pendentes é preservado.
+CREATE OR REPLACE FUNCTION atualiza_pesquisa_pendente(cods INT[]) RETURNS void AS $$
+BEGIN
+    WITH atual AS (
+        SELECT p.Cod_Pesquisa, f.Filtro, COALESCE(p.Cod_Cliente, -1) AS Cod_Cliente, p.Data_Entrada,
+               lt.Cod_Lote, lt.Data_Criacao AS Data_Lote,
+               COALESCE(p.Nome_Corrigido, p.Nome) AS Nome, p.CPF,
+               COALESCE(p.RG_Corrigido, p.RG) AS RG, p.Nascimento,
+               COALESCE(p.Mae_Corrigido, p.Mae) AS Mae
+        FROM pesquisa p
+        LEFT JOIN estado e ON e.Cod_UF = p.Cod_UF
+        CROSS JOIN (VALUES (0), (1), (2), (3)) AS f(Filtro)
+        LEFT JOIN LATERAL (
+            SELECT l.Cod_Lote, l.Data_Criacao
+            FROM lote_pesquisa lp
+            INNER JOIN lote l ON l.Cod_Lote = lp.Cod_Lote
+            WHERE lp.Cod_Pesquisa = p.Cod_Pesquisa
+            ORDER BY l.Data_Criacao, l.Cod_Lote
+            LIMIT 1
+        ) lt ON TRUE
+        WHERE p.Cod_Pesquisa = ANY(cods)
+          AND p.Data_Conclusao IS NULL
+          AND p.Tipo = 0
+          AND p.CPF IS NOT NULL AND p.CPF <> ''
+          AND (e.UF = 'SP' OR p.Cod_UF_Nascimento = 26 OR p.Cod_UF_RG = 26)
+          AND (f.Filtro NOT IN (1, 3) OR (p.RG IS NOT NULL AND p.RG <> ''))
+          AND NOT EXISTS (
+              SELECT 1 FROM pesquisa_spv ps
+              WHERE ps.Cod_Pesquisa = p.Cod_Pesquisa AND ps.Cod_SPV = 1
+                AND ps.Filtro = f.Filtro AND ps.Resultado IS NOT NULL
+          )
+    ),
+    removidas AS (
+        DELETE FROM pesquisa_pendente pp
+        WHERE pp.Cod_Pesquisa = ANY(cods)
+          AND NOT EXISTS (
+              SELECT 1 FROM atual a WHERE a.Cod_Pesquisa = pp.Cod_Pesquisa AND a.Filtro = pp.Filtro
+          )
+    )
+    INSERT INTO pesquisa_pendente
+        (Cod_Pesquisa, Filtro, Cod_Cliente, Data_Entrada, Cod_Lote, Data_Lote, Nome, CPF, RG, Nascimento, Mae)
+    SELECT * FROM atual
+    ON CONFLICT (Cod_Pesquisa, Filtro) DO UPDATE
+        SET Cod_Cliente = EXCLUDED.Cod_Cliente, Data_Entrada = EXCLUDED.Data_Entrada,
+            Cod_Lote = EXCLUDED.Cod_Lote, Data_Lote = EXCLUDED.Data_Lote,
+            Nome = EXCLUDED.Nome, CPF = EXCLUDED.CPF, RG = EXCLUDED.RG,
+            Nascimento = EXCLUDED.Nascimento, Mae = EXCLUDED.Mae
+        WHERE (pesquisa_pendente.Cod_Cliente, pesquisa_pendente.Data_Entrada, pesquisa_pendente.Cod_Lote,
+               pesquisa_pendente.Data_Lote, pesquisa_pendente.Nome, pesquisa_pendente.CPF, pesquisa_pendente.RG,
+               pesquisa_pendente.Nascimento, pesquisa_pendente.Mae)
+            IS DISTINCT FROM
+              (EXCLUDED.Cod_Cliente, EXCLUDED.Data_Entrada, EXCLUDED.Cod_Lote, EXCLUDED.Data_Lote,
+               EXCLUDED.Nome, EXCLUDED.CPF, EXCLUDED.RG, EXCLUDED.Nascimento, EXCLUDED.Mae);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers por comando (com as linhas afetadas em tabelas de transição): um lote de N pesquisas ou
+-- resultados atualiza a fila em uma única passada
+CREATE OR REPLACE FUNCTION sincroniza_pesquisa_pendente() RETURNS trigger AS $$
+BEGIN
+    PERFORM atualiza_pesquisa_pendente(ARRAY(SELECT DISTINCT Cod_Pesquisa FROM alteradas WHERE Cod_Pesquisa IS NOT NULL));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Resultado gravado: a (pesquisa, filtro) sai da fila, liberando o lease. Resultado removido ou
+-- anulado: a pesquisa é recalculada e volta para a fila.
+CREATE OR REPLACE FUNCTION conclui_pesquisa_pendente() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM pesquisa_pendente pp
+    USING alteradas a
+    WHERE pp.Cod_Pesquisa = a.Cod_Pesquisa AND pp.Filtro = a.Filtro
+      AND a.Cod_SPV = 1 AND a.Resultado IS NOT NULL;
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM atualiza_pesquisa_pendente(ARRAY(
+            SELECT DISTINCT Cod_Pesquisa FROM alteradas WHERE Cod_SPV = 1 AND Resultado IS NULL
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_pesquisa_pendente_insert ON pesquisa;
+CREATE TRIGGER trg_pesquisa_pendente_insert
+    AFTER INSERT ON pesquisa
+    REFERENCING NEW TABLE AS alteradas
+    FOR EACH STATEMENT EXECUTE FUNCTION sincroniza_pesquisa_pendente();
+
+DROP TRIGGER IF EXISTS trg_pesquisa_pendente_update ON pesquisa;
+CREATE TRIGGER trg_pesquisa_pendente_update
+    AFTER UPDATE ON pesquisa
+    REFERENCING NEW TABLE AS alteradas
+    FOR EACH STATEMENT EXECUTE FUNCTION sincroniza_pesquisa_pendente();
+
+DROP TRIGGER IF EXISTS trg_pesquisa_spv_pendente_insert ON pesquisa_spv;
+CREATE TRIGGER trg_pesquisa_spv_pendente_insert
+    AFTER INSERT ON pesquisa_spv
+    REFERENCING NEW TABLE AS alteradas
+    FOR EACH STATEMENT EXECUTE FUNCTION conclui_pesquisa_pendente();
+
+DROP TRIGGER IF EXISTS trg_pesquisa_spv_pendente_update ON pesquisa_spv;
+CREATE TRIGGER trg_pesquisa_spv_pendente_update
+    AFTER UPDATE ON pesquisa_spv
+    REFERENCING NEW TABLE AS alteradas
+    FOR EACH STATEMENT EXECUTE FUNCTION conclui_pesquisa_pendente();
+
+DROP TRIGGER IF EXISTS trg_pesquisa_spv_pendente_delete ON pesquisa_spv;
+CREATE TRIGGER trg_pesquisa_spv_pendente_delete
+    AFTER DELETE ON pesquisa_spv
+    REFERENCING OLD TABLE AS alteradas
+    FOR EACH STATEMENT EXECUTE FUNCTION sincroniza_pesquisa_pendente();
+
+-- Entrada ou saída de um lote muda a ordem da pesquisa na fila
+DROP TRIGGER IF EXISTS trg_lote_pesquisa_pendente_insert ON lote_pesquisa;
+CREATE TRIGGER trg_lote_pesquisa_pendente_insert
+    AFTER INSERT ON lote_pesquisa
+    REFERENCING NEW TABLE AS alteradas
+    FOR EACH STATEMENT EXECUTE FUNCTION sincroniza_pesquisa_pendente();
+
+DROP TRIGGER IF EXISTS trg_lote_pesquisa_pendente_delete ON lote_pesquisa;
+CREATE TRIGGER trg_lote_pesquisa_pendente_delete
+    AFTER DELETE ON lote_pesquisa
+    REFERENCING OLD TABLE AS alteradas
+    FOR EACH STATEMENT EXECUTE FUNCTION sincroniza_pesquisa_pendente();
+
+-- Carga inicial da fila para pesquisas já existentes
+SELECT atualiza_pesquisa_pendente(ARRAY(SELECT Cod_Pesquisa FROM pesquisa WHERE Data_Conclusao IS NULL));
 
 -- Exemplo de inserção de dados iniciais (opcional, para testes)
 INSERT INTO estado (UF, Nome_Estado) VALUES ('SP', 'São Paulo') ON CONFLICT (UF) DO NOTHING;
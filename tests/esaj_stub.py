@@ -0,0 +1,254 @@
+"""
+Servidor local que imita o `cpopg` do eSAJ para testes e benchmarks.
+Permite configurar latência, taxa de erro e a distribuição dos resultados.
+Com `assets` as páginas referenciam CSS, fonte, imagem e um script de
+analytics, como as do eSAJ, e os bytes enviados são contados por tipo.
+"""
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode, urlparse, parse_qs
+
+NADA_CONSTA = 'Não existem informações disponíveis para os parâmetros informados.'
+
+OPEN_PAGE = """<html><body>
+<form action="search.do" method="get">
+<select id="cbPesquisa" name="cbPesquisa">
+<option value="NUMPROC">Número do Processo</option>
+<option value="NMPARTE">Nome da parte</option>
+<option value="DOCPARTE">Documento da Parte</option>
+</select>
+<input type="text" id="campo_NMPARTE" name="dadosConsulta.valorConsulta">
+<input type="checkbox" id="pesquisarPorNomeCompleto" name="chNmCompleto" value="true">
+<input type="text" id="campo_DOCPARTE" name="dadosConsulta.valorConsulta">
+<input type="submit" id="botaoConsultarProcessos" value="Consultar">
+</form>
+</body></html>"""
+
+NADA_CONSTA_PAGE = """<html><body>
+<table><tr><td id="mensagemRetorno"><li>{mensagem}</li></td></tr></table>
+</body></html>""".format(mensagem=NADA_CONSTA)
+
+PROCESS_ITEM = """<li>
+<div class="row unj-ai-c home__lista-de-processos">
+<div class="col-md-3"><a class="linkProcesso" href="/cpopg/show.do?processo.codigo={codigo}">{numero}</a></div>
+{parte}<div class="col-md-3"><div class="classeProcesso">{classe}</div>
+<div class="assuntoPrincipalProcesso">{assunto}</div></div>
+<div class="col-md-3"><div class="dataLocalDistribuicaoProcesso">01/02/2020 - {foro}</div></div>
+</div>
+</li>"""
+
+PROCESS_LIST_PAGE = """<html><body>
+<div id="contadorDeProcessos">{total} Processos encontrados</div>
+<div id="listagemDeProcessos"><ul>{items}</ul></div>
+{pagination}</body></html>"""
+
+PAGE_LINK = """<a class="unj-pagination__link" href="trocarPagina.do?paginaConsulta={pagina}&amp;{query}">{pagina}</a>"""
+
+# Itens por página da lista de resultados, como no eSAJ
+PAGE_SIZE = 25
+
+CAPTCHA_PAGE = """<html><body><div class="g-recaptcha" data-sitekey="stub"></div></body></html>"""
+
+RESULT_KINDS = ('nada_consta', 'criminal', 'civel')
+
+# Recursos estáticos referenciados pelas páginas com `assets`: caminho -> (tipo, Content-Type, tamanho)
+STATIC_ASSETS = {
+    'esaj.css': ('css', 'text/css', 15 * 1024),
+    'fonte.woff2': ('font', 'font/woff2', 40 * 1024),
+    'logo.png': ('image', 'image/png', 30 * 1024),
+    'banner.jpg': ('image', 'image/jpeg', 60 * 1024),
+    'analytics.js': ('script', 'application/javascript', 25 * 1024),
+}
+
+ASSETS_HEAD = """<head>
+<link rel="stylesheet" href="static/esaj.css">
+<script src="static/analytics.js"></script>
+</head>
+<body><img src="static/logo.png"><img src="static/banner.jpg">"""
+
+
+def static_asset(name):
+    """(tipo, Content-Type, corpo) do recurso estático ou None."""
+    if name not in STATIC_ASSETS:
+        return None
+    kind, content_type, size = STATIC_ASSETS[name]
+    if kind == 'css':
+        body = '@font-face { font-family: esaj; src: url(fonte.woff2); }\nbody { font-family: esaj; }\n'
+        body += '/*' + 'x' * (size - len(body) - 4) + '*/'
+    elif kind == 'script':
+        body = '/*' + 'x' * (size - 4) + '*/'
+    else:
+        body = 'x' * size
+    return kind, content_type, body
+
+
+def _party(parte):
+    if not parte:
+        return ''
+    if isinstance(parte, str):
+        parte = (parte,)
+    nome, mae, nascimento = (tuple(parte) + (None, None))[:3]
+    html = f'<div class="nomeParte">{nome}</div>'
+    if mae:
+        html += f'<div class="nomeMaeParte">{mae}</div>'
+    if nascimento:
+        html += f'<div class="dataNascimentoParte">{nascimento}</div>'
+    return html + '\n'
+
+
+def process_list_page(kind, count=1, page=1, parte=None, query=None, kinds=None):
+    """
+    Lista de resultados com `count` processos no total, na página `page`
+    (PAGE_SIZE por página, com links de paginação quando `query` é informada).
+    `parte` é o nome (ou (nome, mãe, nascimento)) exibido em cada item e
+    `kinds`, quando informado, o tipo ('criminal' ou 'civel') de cada processo.
+    """
+    first = (page - 1) * PAGE_SIZE
+    items = []
+    for i in range(first, min(count, first + PAGE_SIZE)):
+        item_kind = kinds[i] if kinds else kind
+        if item_kind == 'criminal':
+            classe, assunto, foro = 'Ação Penal - Procedimento Ordinário', 'Furto', 'Foro Central Criminal Barra Funda'
+        else:
+            classe, assunto, foro = 'Procedimento Comum Cível', 'Indenização por Dano Moral', 'Foro Central Cível'
+        item_parte = parte(i) if callable(parte) else parte
+        items.append(PROCESS_ITEM.format(
+            codigo=f"STUB{i}", numero=f"000{i:04d}-12.2020.8.26.0050", classe=classe, assunto=assunto, foro=foro,
+            parte=_party(item_parte),
+        ))
+    pagination = ''
+    pages = (count + PAGE_SIZE - 1) // PAGE_SIZE
+    if query is not None and pages > 1:
+        pagination = ''.join(PAGE_LINK.format(pagina=n, query=query) for n in range(1, pages + 1) if n != page)
+    return PROCESS_LIST_PAGE.format(total=count, items=''.join(items), pagination=pagination)
+
+
+class EsajStub:
+    """
+    Sobe um ThreadingHTTPServer em uma porta livre. Os resultados são
+    determinísticos por documento: `results` fixa o tipo por documento e os
+    demais seguem a distribuição `mix` (pesos por tipo de resultado). As
+    consultas por nome com processos listam `name_processes` itens com o nome
+    da parte, paginados como no eSAJ (`trocarPagina.do`).
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, captcha_rate=0.0, mix=None, results=None, seed=0,
+                 assets=False, host='127.0.0.1', advertise_host=None, name_processes=1):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.captcha_rate = captcha_rate
+        self.mix = mix or {'nada_consta': 1.0}
+        self.results = results or {}
+        self.random = random.Random(seed)
+        self.assets = assets
+        self.host = host
+        # Nome pelo qual o navegador (ex.: no Selenoid) alcança o stub
+        self.advertise_host = advertise_host
+        self.name_processes = name_processes
+        self.requests = 0
+        # Bytes de corpo enviados por tipo de recurso (html, css, font, image, script)
+        self.bytes_sent = {}
+        self._lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{self.advertise_host or host}:{port}/cpopg"
+
+    def result_kind(self, document):
+        if document in self.results:
+            return self.results[document]
+        digest = int(hashlib.sha1(document.encode('utf-8')).hexdigest(), 16)
+        point = (digest % 10000) / 10000 * sum(self.mix.values())
+        for kind in RESULT_KINDS:
+            weight = self.mix.get(kind, 0)
+            if point < weight:
+                return kind
+            point -= weight
+        return 'nada_consta'
+
+    def render(self, path, query):
+        status, body = self._render(path, query)
+        if self.assets:
+            body = body.replace('<html><body>', '<html>' + ASSETS_HEAD, 1)
+        return status, body
+
+    def _render(self, path, query):
+        if path.endswith('/open.do'):
+            return 200, OPEN_PAGE
+        if not path.endswith(('/search.do', '/trocarPagina.do')):
+            return 404, '<html><body>Not found</body></html>'
+
+        with self._lock:
+            roll = self.random.random()
+        if roll < self.error_rate:
+            return 500, '<html><body>Erro interno</body></html>'
+        if roll < self.error_rate + self.captcha_rate:
+            return 200, CAPTCHA_PAGE
+
+        document = query.get('dadosConsulta.valorConsulta', [''])[0]
+        kind = self.result_kind(document)
+        if kind == 'nada_consta':
+            return 200, NADA_CONSTA_PAGE
+        if query.get('cbPesquisa', [''])[0] != 'NMPARTE':
+            return 200, process_list_page(kind)
+        page = int(query.get('paginaConsulta', ['1'])[0])
+        link_query = urlencode({k: v[0] for k, v in query.items() if k != 'paginaConsulta'}).replace('&', '&amp;')
+        return 200, process_list_page(kind, self.name_processes, page=page, parte=document, query=link_query)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                url = urlparse(self.path)
+                asset = static_asset(url.path.rsplit('/static/', 1)[-1]) if '/static/' in url.path else None
+                if asset is not None:
+                    kind, content_type, body = asset
+                    status = 200
+                else:
+                    kind, content_type = 'html', 'text/html; charset=utf-8'
+                    status, body = stub.render(url.path, parse_qs(url.query, keep_blank_values=True))
+                data = body.encode('utf-8')
+                with stub._lock:
+                    stub.bytes_sent[kind] = stub.bytes_sent.get(kind, 0) + len(data)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
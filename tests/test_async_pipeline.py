@@ -0,0 +1,201 @@
+import unittest
+import asyncio
+import datetime
+import os
+import sys
+import threading
+from collections import Counter
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.async_pipeline import AsyncPipeline
+from app.concurrency import AimdLimiter, CircuitBreaker
+from app.names import pessoa
+from app.planner import Consulta
+from app.result_cache import ResultCache, cache_key
+from app.scheduler import QueueWaitTracker
+from app.spv_scraper import SPVAutomatico
+from esaj_stub import NADA_CONSTA_PAGE, process_list_page
+
+
+class FakeWriter:
+    """ResultWriter sem banco: guarda os resultados e as retentativas recebidos."""
+
+    def __init__(self):
+        self.results = []
+        self.retries = []
+        self._lock = threading.Lock()
+
+    def add(self, cod_pesquisa, result, search_filter, processos=None, pagina=None):
+        with self._lock:
+            self.results.append((cod_pesquisa, search_filter, result))
+
+    def retry(self, cod_pesquisa, search_filter, error):
+        with self._lock:
+            self.retries.append((cod_pesquisa, search_filter))
+
+    def flush(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+class FakeSPV(SPVAutomatico):
+    """
+    SPVAutomatico sem banco nem navegador: `pages` são os lotes de consultas
+    devolvidos por `_get_pesquisas` (já planejados) e `browser_pages` as
+    páginas do Selenoid por documento.
+    """
+
+    def __init__(self, pages, browser_pages=None):
+        self.pages = list(pages)
+        self.browser_pages = browser_pages or {}
+        self.browser_lookups = []
+        self.browser_pool = SimpleNamespace(size=2)
+        self.result_writer = FakeWriter()
+        self.result_cache = ResultCache(None)
+        self.queue_wait = QueueWaitTracker()
+        self.http_limiter = AimdLimiter('http-teste', maximum=4)
+        self.browser_limiter = AimdLimiter('selenium-teste', maximum=2)
+        self.breaker = CircuitBreaker('esaj-teste')
+
+    def _get_pesquisas(self, limit, filtros=None, cod_pesquisas=None):
+        return self.pages.pop(0) if self.pages else []
+
+    def _plan_page(self, qry):
+        return qry
+
+    def _load_site_browser(self, search_filter, document):
+        self.browser_lookups.append(document)
+        return self.browser_pages[document]
+
+    def close(self):
+        pass
+
+
+class FakeHttp:
+    """AsyncEsajHttpClient sem rede: páginas por documento, com uma pequena latência."""
+
+    pages = {}
+
+    def __init__(self, pool_size=None):
+        self.lookups = Counter()
+
+    async def search(self, search_filter, document):
+        self.lookups[document] += 1
+        await asyncio.sleep(0.05)
+        page = self.pages[document]
+        if isinstance(page, Exception):
+            raise page
+        return page
+
+    async def get_page(self, href):
+        raise AssertionError("listas de uma página só")
+
+    async def close(self):
+        pass
+
+
+def consulta(search_filter, document, *targets, pessoas=()):
+    item = Consulta(cache_key(search_filter, document), search_filter, document)
+    item.targets = list(targets)
+    item.pessoas = list(pessoas)
+    return item
+
+
+def run_cycle(spv, http_pages, **kwargs):
+    """Um ciclo do pipeline com o cliente HTTP falso; retorna (total, pipeline)."""
+
+    async def scenario():
+        pipeline = AsyncPipeline(spv, fetch_batch=10, lookup_concurrency=4, **kwargs)
+        with patch('app.async_pipeline.AsyncEsajHttpClient', FakeHttp), patch.object(FakeHttp, 'pages', http_pages):
+            await pipeline.open()
+            try:
+                total = await asyncio.wait_for(pipeline.process_cycle(), timeout=10)
+            finally:
+                await pipeline.close()
+        return total, pipeline
+
+    return asyncio.run(scenario())
+
+
+class TestAsyncPipeline(unittest.TestCase):
+
+    def test_every_target_is_persisted_once(self):
+        maria = pessoa('Maria Silva', datetime.date(1980, 1, 15))
+        tereza = pessoa('Tereza Souza', None)
+        parte = lambda i: ('JOAO DA SILVA', 'TEREZA SOUZA', None)
+        spv = FakeSPV(
+            [
+                [consulta(0, '111.111.111-11', (1, 0)), consulta(1, '12.345.678-9', (1, 1), (1, 3))],
+                [consulta(2, 'JOAO DA SILVA', (1, 2), (2, 2), pessoas=[maria, tereza])],
+            ],
+            browser_pages={'JOAO DA SILVA': process_list_page('criminal', 3, parte=parte)},
+        )
+        classify_targets = spv._classify_targets
+        threads = set()
+
+        def classify_in_thread(consulta, content):
+            threads.add(threading.current_thread().name.split('_')[0])
+            return classify_targets(consulta, content)
+
+        spv._classify_targets = classify_in_thread
+        total, pipeline = run_cycle(spv, {
+            '111.111.111-11': NADA_CONSTA_PAGE,
+            '12.345.678-9': process_list_page('civel', 2, parte='JOAO DA SILVA'),
+        })
+
+        self.assertEqual(total, 3)
+        self.assertEqual(sorted(spv.result_writer.results), [
+            (1, 0, 1), (1, 1, 5), (1, 2, 1), (1, 3, 5), (2, 2, 2),
+        ])
+        self.assertEqual(spv.result_writer.retries, [])
+        self.assertEqual(spv.browser_lookups, ['JOAO DA SILVA'])
+        # Classificação fora do event loop, no executor do estágio
+        self.assertEqual(threads, {'spv-classify'})
+        self.assertEqual(pipeline._inflight, {})
+
+    def test_duplicate_keys_are_looked_up_once(self):
+        spv = FakeSPV([[
+            consulta(0, '111.111.111-11', (1, 0)),
+            consulta(0, '11111111111', (2, 0)),
+            consulta(0, '111.111.111-11', (3, 0)),
+        ]])
+        total, pipeline = run_cycle(spv, {'111.111.111-11': NADA_CONSTA_PAGE, '11111111111': NADA_CONSTA_PAGE})
+
+        self.assertEqual(sum(pipeline.http.lookups.values()), 1)
+        self.assertEqual(sorted(spv.result_writer.results), [(1, 0, 1), (2, 0, 1), (3, 0, 1)])
+
+    def test_cache_hit_skips_the_lookup(self):
+        spv = FakeSPV([[consulta(0, '111.111.111-11', (1, 0))]])
+        spv.result_cache.put(cache_key(0, '111.111.111-11'), 2)
+        total, pipeline = run_cycle(spv, {})
+
+        self.assertEqual(sum(pipeline.http.lookups.values()), 0)
+        self.assertEqual(spv.result_writer.results, [(1, 0, 2)])
+
+    def test_failures_are_retried_instead_of_hanging(self):
+        spv = FakeSPV([[consulta(0, f'{n:011d}', (n, 0)) for n in range(1, 21)]])
+        classify_targets = spv._classify_targets
+
+        def failing(consulta, content):
+            if consulta.targets[0][0] % 2:
+                raise ValueError("página inesperada")
+            return classify_targets(consulta, content)
+
+        spv._classify_targets = failing
+        pages = {f'{n:011d}': NADA_CONSTA_PAGE for n in range(1, 21)}
+        pages['00000000020'] = ConnectionError("recusada")
+        total, pipeline = run_cycle(spv, pages, classify_concurrency=1)
+
+        self.assertEqual(total, 20)
+        self.assertEqual(sorted(spv.result_writer.retries), [(n, 0) for n in range(1, 21, 2)] + [(20, 0)])
+        self.assertEqual(sorted(spv.result_writer.results), [(n, 0, 1) for n in range(2, 20, 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock, PropertyMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.browser_pool import BrowserPool
+
+
+class TestBrowserPool(unittest.TestCase):
+
+    def setUp(self):
+        self.drivers = []
+
+        def factory():
+            driver = MagicMock()
+            self.drivers.append(driver)
+            return driver
+
+        self.pool = BrowserPool(factory, size=2, max_uses=3, start_url='http://stub/cpopg/open.do', acquire_timeout=1)
+
+    def test_session_is_reused_and_reset(self):
+        with self.pool.session() as first:
+            pass
+        with self.pool.session() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.drivers), 1)
+        first.delete_all_cookies.assert_called()
+        first.get.assert_called_with('http://stub/cpopg/open.do')
+
+    def test_session_recycled_after_max_uses(self):
+        for _ in range(3):
+            with self.pool.session():
+                pass
+
+        self.drivers[0].quit.assert_called_once()
+        with self.pool.session() as driver:
+            self.assertIs(driver, self.drivers[1])
+
+    def test_dead_session_is_replaced(self):
+        with self.pool.session():
+            pass
+        type(self.drivers[0]).current_url = PropertyMock(side_effect=Exception("session deleted"))
+
+        with self.pool.session() as driver:
+            self.assertIs(driver, self.drivers[1])
+        self.drivers[0].quit.assert_called_once()
+
+    def test_session_discarded_when_reset_fails(self):
+        with self.pool.session() as driver:
+            driver.delete_all_cookies.side_effect = Exception("session deleted")
+
+        driver.quit.assert_called_once()
+        self.assertEqual(self.pool._total, 0)
+
+    def test_acquire_times_out_when_pool_exhausted(self):
+        self.pool.acquire()
+        self.pool.acquire()
+        with self.assertRaises(TimeoutError):
+            self.pool.acquire()
+
+    def test_warm_up_fills_idle_sessions(self):
+        self.assertEqual(self.pool.warm_up(), 2)
+        self.assertEqual(len(self.drivers), 2)
+        for driver in self.drivers:
+            driver.get.assert_called_with('http://stub/cpopg/open.do')
+
+        # Sessões aquecidas são usadas sem criar novas
+        with self.pool.session(), self.pool.session():
+            pass
+        self.assertEqual(len(self.drivers), 2)
+        self.assertEqual(self.pool.warm_up(), 0)
+
+    def test_close_quits_idle_sessions(self):
+        with self.pool.session() as driver:
+            pass
+        self.pool.close()
+        driver.quit.assert_called_once()
+        with self.assertRaises(RuntimeError):
+            self.pool.acquire()
+
+
+if __name__ == '__main__':
+    unittest.main()
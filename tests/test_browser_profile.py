@@ -0,0 +1,74 @@
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import Config
+from app.browser_profile import BrowserProfile, PROFILES, browser_profile
+
+
+class TestBrowserProfile(unittest.TestCase):
+
+    def test_full_profile_keeps_original_options(self):
+        options = PROFILES['full'].options()
+        self.assertEqual(options.arguments, ["--no-sandbox", "--disable-dev-shm-usage", "--headless"])
+        self.assertEqual(options.page_load_strategy, 'normal')
+        self.assertEqual(PROFILES['full'].blocked_patterns(), [])
+
+    def test_lean_profile_blocks_resources(self):
+        profile = PROFILES['lean']
+        options = profile.options()
+        self.assertEqual(options.page_load_strategy, 'eager')
+        self.assertIn("--blink-settings=imagesEnabled=false", options.arguments)
+        self.assertIn(f"--disk-cache-size={32 * 1024 * 1024}", options.arguments)
+        self.assertEqual(options.experimental_options['prefs']['profile.managed_default_content_settings.images'], 2)
+        patterns = profile.blocked_patterns()
+        for pattern in ('*.css*', '*.woff*', '*.png*', '*google-analytics.com*'):
+            self.assertIn(pattern, patterns)
+
+    def test_disabled_disk_cache(self):
+        options = BrowserProfile('teste', disk_cache_mb=0).options()
+        self.assertIn("--disk-cache-size=1", options.arguments)
+
+    def test_unknown_resource_type(self):
+        with self.assertRaises(ValueError):
+            BrowserProfile('teste', block=('videos',))
+
+    @patch.multiple(Config, BROWSER_PAGE_LOAD_STRATEGY='none', BROWSER_BLOCKED_URLS='*anuncios*, *chat*',
+                    BROWSER_DISK_CACHE_MB=8.0)
+    def test_env_overrides_selected_profile(self):
+        profile = browser_profile('lean')
+        self.assertEqual(profile.page_load_strategy, 'none')
+        self.assertEqual(profile.disk_cache_mb, 8.0)
+        self.assertEqual(profile.blocked_patterns()[-2:], ['*anuncios*', '*chat*'])
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            browser_profile('turbo')
+
+    def test_apply_sends_blocked_urls_through_devtools(self):
+        driver = MagicMock()
+        driver.command_executor.get_command.return_value = None
+        PROFILES['lean'].apply(driver)
+
+        driver.command_executor.add_command.assert_called_once_with(
+            'executeCdpCommand', 'POST', '/session/$sessionId/goog/cdp/execute'
+        )
+        name, params = driver.execute.call_args[0]
+        self.assertEqual(params['cmd'], 'Network.setBlockedURLs')
+        self.assertIn('*.css*', params['params']['urls'])
+
+    def test_apply_failure_keeps_session(self):
+        driver = MagicMock()
+        driver.execute.side_effect = Exception("comando desconhecido")
+        PROFILES['lean'].apply(driver)
+
+        driver = MagicMock()
+        PROFILES['full'].apply(driver)
+        driver.execute.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
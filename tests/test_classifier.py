@@ -0,0 +1,59 @@
+import unittest
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.classifier import classify, extract_processes
+from esaj_stub import NADA_CONSTA_PAGE, process_list_page
+
+
+class TestClassifier(unittest.TestCase):
+
+    def test_result_codes(self):
+        self.assertEqual(classify(NADA_CONSTA_PAGE).result, 1)
+        self.assertEqual(classify(process_list_page('criminal')).result, 2)
+        self.assertEqual(classify(process_list_page('civel')).result, 5)
+        self.assertEqual(classify('<html><body>Erro interno</body></html>').result, 7)
+        self.assertEqual(classify(None).result, 7)
+
+    def test_nada_consta_takes_precedence(self):
+        page = process_list_page('criminal') + NADA_CONSTA_PAGE
+        classificacao = classify(page)
+        self.assertEqual(classificacao.result, 1)
+        self.assertEqual(classificacao.processos, [])
+
+    def test_extracts_process_list(self):
+        processos = classify(process_list_page('criminal', count=3)).processos
+
+        self.assertEqual(len(processos), 3)
+        self.assertEqual(processos[0].numero, '0000000-12.2020.8.26.0050')
+        self.assertEqual(processos[0].classe, 'Ação Penal - Procedimento Ordinário')
+        self.assertEqual(processos[0].assunto, 'Furto')
+        self.assertEqual(processos[0].foro, 'Foro Central Criminal Barra Funda')
+        self.assertEqual(processos[0].area, 'Criminal')
+        self.assertEqual(processos[0].data_distribuicao, datetime.date(2020, 2, 1))
+
+    def test_extracts_single_process_page(self):
+        page = """<html><body>
+        <span id="numeroProcesso">1000123-45.2021.8.26.0100</span>
+        <span id="classeProcesso">Procedimento Comum Cível</span>
+        <span id="foroProcesso">Foro Central Cível</span>
+        <div id="areaProcesso"><span>Cível</span></div>
+        <h2>Audiências</h2>
+        </body></html>"""
+        classificacao = classify(page)
+
+        self.assertEqual(classificacao.result, 5)
+        self.assertEqual(classificacao.processos[0].numero, '1000123-45.2021.8.26.0100')
+        self.assertEqual(classificacao.processos[0].area, 'Cível')
+        self.assertIsNone(classificacao.processos[0].data_distribuicao)
+
+    def test_no_processes_without_links(self):
+        self.assertEqual(extract_processes('<div class="classeProcesso">Solta</div>'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+import unittest
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import Config
+from app.concurrency import AimdLimiter, CircuitBreaker, SelenoidStatus, OK, TIMEOUT, BLOCKED, ERROR, CLOSED, OPEN, HALF_OPEN
+
+
+@patch.multiple(Config, LOOKUP_RATE_MAX=1000, LOOKUP_RATE_STEP=1, LOOKUP_DECREASE_FACTOR=0.5,
+                LOOKUP_LATENCY_TOLERANCE=2, LOOKUP_COOLDOWN_SECONDS=60, LOOKUP_BLOCK_PAUSE_SECONDS=10)
+class TestAimdLimiter(unittest.TestCase):
+
+    def limiter(self, **kwargs):
+        options = dict(maximum=8, initial=2, minimum=1, rate=100)
+        options.update(kwargs)
+        return AimdLimiter('teste', **options)
+
+    def test_slow_start_grows_per_success(self):
+        limiter = self.limiter()
+        for _ in range(2):
+            limiter.acquire()
+            limiter.release(OK, 0.1)
+        self.assertEqual(limiter.stats()['limit'], 4)
+        self.assertEqual(limiter.stats()['rate'], 102)
+
+        for _ in range(10):
+            limiter.acquire()
+            limiter.release(OK, 0.1)
+        self.assertEqual(limiter.stats()['limit'], 8)
+
+    def test_additive_increase_after_first_decrease(self):
+        limiter = self.limiter(initial=8)
+        limiter.acquire()
+        limiter.release(TIMEOUT, 1)
+        self.assertEqual(limiter.stats()['limit'], 4)
+
+        for _ in range(4):
+            limiter.acquire()
+            limiter.release(OK, 0.1)
+        self.assertEqual(limiter.stats()['limit'], 5)
+        self.assertEqual(limiter.stats()['rate'], 51)
+
+    def test_failures_halve_once_per_cooldown(self):
+        limiter = self.limiter(initial=8)
+        for outcome in (TIMEOUT, ERROR, TIMEOUT):
+            limiter.acquire()
+            limiter.release(outcome, 1)
+        stats = limiter.stats()
+        self.assertEqual((stats['limit'], stats['rate'], stats['decreases']), (4, 50, 1))
+
+    def test_latency_above_baseline_reduces_only_the_limit(self):
+        limiter = self.limiter(initial=7)
+        limiter.acquire()
+        limiter.release(OK, 0.1)
+        limiter.acquire()
+        limiter.release(OK, 0.5)
+        stats = limiter.stats()
+        self.assertEqual((stats['limit'], stats['rate']), (4, 101))
+        self.assertEqual(stats['baseline_ms'], 104.0)
+
+    def test_block_pauses_new_lookups(self):
+        limiter = self.limiter()
+        limiter.acquire()
+        limiter.release(BLOCKED, 0.1)
+        with limiter._cond:
+            self.assertGreater(limiter._try_acquire(), 9)
+
+    def test_acquire_waits_for_release_at_limit(self):
+        limiter = self.limiter(initial=1)
+        limiter.acquire()
+        acquired = threading.Event()
+        thread = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+        thread.start()
+        self.assertFalse(acquired.wait(0.1))
+        limiter.release(OK, 0.1)
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+
+    def test_rate_spaces_lookup_starts(self):
+        limiter = self.limiter(initial=8, rate=20)
+        started = time.monotonic()
+        for _ in range(4):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.14)
+
+    def test_slot_classifies_exceptions(self):
+        limiter = self.limiter(initial=8, classify=lambda error: BLOCKED)
+        with self.assertRaises(ValueError):
+            with limiter.slot():
+                raise ValueError
+        self.assertEqual(limiter.stats()['in_flight'], 0)
+        self.assertEqual(limiter.stats()['limit'], 4)
+
+    def test_slot_async(self):
+        limiter = self.limiter(initial=1, maximum=1)
+
+        async def lookup(seen):
+            async with limiter.slot_async():
+                seen.append(limiter.in_flight)
+                await asyncio.sleep(0.01)
+
+        async def scenario():
+            seen = []
+            await asyncio.gather(*(lookup(seen) for _ in range(3)))
+            return seen
+
+        self.assertEqual(asyncio.run(scenario()), [1, 1, 1])
+
+    def test_set_maximum_caps_limit(self):
+        limiter = self.limiter(initial=6)
+        limiter.set_maximum(0)
+        self.assertEqual((limiter.stats()['limit'], limiter.stats()['maximum']), (1, 1))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def breaker(self, **kwargs):
+        options = dict(window=10, min_calls=4, failure_ratio=0.5, open_seconds=0.1)
+        options.update(kwargs)
+        return CircuitBreaker('teste', **options)
+
+    def test_opens_when_failure_ratio_is_reached(self):
+        breaker = self.breaker()
+        for success in (True, False, True):
+            breaker.record(success)
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record(False)
+        self.assertEqual(breaker.state, OPEN)
+        with breaker._cond:
+            self.assertGreater(breaker._try_acquire(), 0)
+
+    def test_half_open_allows_a_single_probe(self):
+        breaker = self.breaker(min_calls=1)
+        breaker.record(False)
+        time.sleep(0.12)
+        breaker.acquire()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        with breaker._cond:
+            self.assertIsNone(breaker._try_acquire())
+
+        breaker.record(True)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.stats()['calls'], 0)
+
+    def test_failed_probe_reopens(self):
+        breaker = self.breaker(min_calls=1)
+        breaker.record(False)
+        time.sleep(0.12)
+        with self.assertRaises(ValueError):
+            with breaker.guard():
+                raise ValueError
+        self.assertEqual((breaker.state, breaker.opens), (OPEN, 2))
+
+    def test_guard_async_waits_while_open(self):
+        breaker = self.breaker(min_calls=1, open_seconds=0.2)
+        breaker.record(False)
+
+        async def probe():
+            started = time.monotonic()
+            async with breaker.guard_async():
+                pass
+            return time.monotonic() - started
+
+        self.assertGreaterEqual(asyncio.run(probe()), 0.15)
+        self.assertEqual(breaker.state, CLOSED)
+
+
+class TestSelenoidStatus(unittest.TestCase):
+
+    def setUp(self):
+        status = {'total': 5, 'used': 3, 'queued': 0, 'pending': 1, 'browsers': {}}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(status).encode()
+                self.send_response(200 if self.path == '/status' else 404)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.hub = f"http://127.0.0.1:{self.server.server_address[1]}/wd/hub"
+
+    def test_capacity_counts_free_and_own_sessions(self):
+        selenoid = SelenoidStatus(self.hub, interval=60)
+        self.assertEqual(selenoid.capacity(own_sessions=2), 3)
+        self.assertEqual(selenoid.status['total'], 5)
+
+    def test_unreachable_hub_keeps_unknown_capacity(self):
+        selenoid = SelenoidStatus('http://127.0.0.1:1/wd/hub', interval=0, timeout=0.5)
+        self.assertIsNone(selenoid.capacity())
+
+
+if __name__ == '__main__':
+    unittest.main()
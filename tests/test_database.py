@@ -1,6 +1,7 @@
 import unittest
 import os
 import time
+import psycopg2
 from unittest.mock import patch, MagicMock
 from database import Database
 from config import Config 
@@ -9,6 +10,9 @@ from config import Config
 
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../app')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.names import normalize_name
 
 
 # Configurações para o banco de dados de teste (devem vir do docker-compose.yml)
@@ -52,15 +56,13 @@ class TestDatabase(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         # Este método será executado uma vez após todos os testes da classe
-        if cls.db.connection:
-            cls.db.close()
-            print("Conexão com PostgreSQL de teste fechada.")
+        cls.db.close()
+        print("Conexões com PostgreSQL de teste fechadas.")
         cls.patcher.stop() # Parar o patch
 
     def setUp(self):
-        # Garante que a conexão está aberta para cada teste individual
-        if self.db.connection and self.db.connection.closed:
-            self.db.connect()
+        # Garante que o pool está aberto para cada teste individual
+        self.db.connect()
 
     def tearDown(self):
         # Não precisa fechar a conexão após cada teste, já que setUpClass a gerencia
@@ -69,8 +71,9 @@ class TestDatabase(unittest.TestCase):
     @patch('time.sleep', return_value=None) 
     def test_connect_success(self, mock_sleep):
         db_instance = Database()
-        self.assertIsNotNone(db_instance.connection)
-        self.assertFalse(db_instance.connection.closed)
+        self.assertEqual(db_instance.stats()['idle'], 1)
+        with db_instance.connection() as connection:
+            self.assertFalse(connection.closed)
         db_instance.close()
 
     @patch('psycopg2.connect', side_effect=psycopg2.OperationalError("Mocked Connection Error"))
@@ -84,9 +87,11 @@ class TestDatabase(unittest.TestCase):
 
     def test_close_connection(self):
         db_instance = Database()
-        self.assertIsNotNone(db_instance.connection)
+        with db_instance.connection() as connection:
+            pass
         db_instance.close()
-        self.assertTrue(db_instance.connection.closed)
+        self.assertTrue(connection.closed)
+        self.assertEqual(db_instance.stats()['opened'], 0)
 
     def test_fetchall(self):
         rows = self.db.fetchall("SELECT * FROM test_table ORDER BY id;")
@@ -117,20 +122,34 @@ class TestDatabase(unittest.TestCase):
         self.assertEqual(remaining_items[0][1], 'Test Item 2') 
 
     def test_fetchall_reconnect(self):
-        # Força o fechamento da conexão para testar a reconexão automática
-        self.db.close()
+        # Fecha a conexão ociosa por fora do pool para testar a validação no empréstimo
+        with self.db.connection() as connection:
+            pass
+        connection.close()
         rows = self.db.fetchall("SELECT * FROM test_table;")
         self.assertIsNotNone(rows)
-        self.assertFalse(self.db.connection.closed) # Verifica que a conexão foi reaberta
 
     def test_execute_reconnect(self):
-        # Força o fechamento da conexão para testar a reconexão automática
-        self.db.close()
+        # Fecha a conexão ociosa por fora do pool para testar a validação no empréstimo
+        with self.db.connection() as connection:
+            pass
+        connection.close()
         self.db.execute("INSERT INTO test_table (name) VALUES ('Another Item');")
-        self.assertFalse(self.db.connection.closed)
         item = self.db.fetchall("SELECT name FROM test_table WHERE name = 'Another Item';")
         self.assertIsNotNone(item)
 
+    def test_normaliza_nome_matches_normalize_name(self):
+        # pesquisa_pendente.Nome_Normalizado (banco) e o planner (Python) agrupam as consultas por nome
+        nomes = [
+            'João da Silva', "JOSÉ  D'ÁVILA", 'Ana D´Ávila', 'Zoë Ângela O’Connor', 'Françoise Müller',
+            'Ñuñez-Peña', 'Strauß', 'Øyvind Æsir', 'ﬁlipe ﬂores', 'Ｊｏãｏ', 'Łukasz Żółć', 'İlker',
+            'café\u0301', 'Maria  das Dores.', ' .- ',
+        ]
+        rows = self.db.fetchall(
+            "SELECT normaliza_nome(n) FROM unnest(%s::text[]) WITH ORDINALITY AS t(n, i) ORDER BY i;", (nomes,)
+        )
+        self.assertEqual([row[0] for row in rows], [normalize_name(nome) or None for nome in nomes])
+
 
 if __name__ == '__main__':
    
@@ -0,0 +1,93 @@
+import unittest
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import psycopg2.pool
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import Database
+
+
+class FakeConnection:
+    """Conexão do psycopg2 sem servidor: só o que o pool consulta."""
+
+    def __init__(self, **kwargs):
+        self.closed = 0
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def cursor(self):
+        return MagicMock()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class TestDatabasePool(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch('app.database.psycopg2.connect', side_effect=FakeConnection)
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pool_is_bounded_and_reuses_connections(self):
+        database = Database(pool_size=2, wait_timeout=0.1, lazy=True)
+        self.addCleanup(database.close)
+        with database.connection() as first:
+            with database.connection() as second:
+                self.assertIsNot(first, second)
+                with self.assertRaises(psycopg2.pool.PoolError):
+                    with database.connection():
+                        pass
+        with database.connection() as again:
+            self.assertIn(again, (first, second))
+
+        stats = database.stats()
+        self.assertEqual((stats['opened'], stats['in_use'], stats['idle']), (2, 0, 2))
+        self.assertEqual(self.connect.call_count, 2)
+
+    def test_idle_connection_expires(self):
+        database = Database(max_idle=0, lazy=True)
+        self.addCleanup(database.close)
+        with database.connection() as first:
+            pass
+        time.sleep(0.01)
+        with database.connection() as second:
+            self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+        self.assertEqual(database.stats()['opened'], 1)
+
+    def test_open_transaction_is_rolled_back_on_checkin(self):
+        database = Database(pool_size=1, lazy=True)
+        self.addCleanup(database.close)
+        with database.connection() as connection:
+            connection.status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        self.assertEqual(connection.rollbacks, 1)
+        with database.connection() as again:
+            self.assertIs(again, connection)
+
+    def test_broken_connection_is_discarded(self):
+        database = Database(pool_size=1, lazy=True)
+        self.addCleanup(database.close)
+        with self.assertRaises(psycopg2.OperationalError):
+            with database.connection() as broken:
+                raise psycopg2.OperationalError("servidor encerrou a conexão")
+        self.assertTrue(broken.closed)
+        with database.connection() as connection:
+            self.assertIsNot(connection, broken)
+        self.assertEqual(database.stats()['opened'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import unittest
+import asyncio
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.config import Config
+from app.esaj_http import (
+    EsajHttpClient, AsyncEsajHttpClient, BrowserRequired, SiteBlocked, check_page, engine_for, is_blocked,
+    search_field,
+)
+from esaj_stub import EsajStub
+
+
+class TestEsajHttpClient(unittest.TestCase):
+
+    def setUp(self):
+        self.stub = EsajStub(results={
+            '111.111.111-11': 'nada_consta',
+            '222.222.222-22': 'criminal',
+            'Joao Da Silva': 'civel',
+        }).start()
+        self.client = EsajHttpClient(base_url=self.stub.base_url, pool_size=2, timeout=5)
+
+    def tearDown(self):
+        self.client.close()
+        self.stub.stop()
+
+    def test_docparte_nada_consta(self):
+        page = self.client.search(0, '111.111.111-11')
+        self.assertIn(Config.NADA_CONSTA, page)
+
+    def test_docparte_consta_criminal(self):
+        page = self.client.search(1, '222.222.222-22')
+        self.assertIn(Config.CONSTA01, page)
+        self.assertIn('Criminal', page)
+
+    def test_nmparte_uses_full_name_search(self):
+        page = self.client.search(2, 'Joao Da Silva')
+        self.assertIn(Config.CONSTA01, page)
+
+    def test_connections_are_reused(self):
+        for _ in range(5):
+            self.client.search(0, '111.111.111-11')
+        pool = self.client.http.connection_from_url(self.stub.base_url)
+        self.assertEqual(pool.num_connections, 1)
+        self.assertEqual(self.stub.requests, 5)
+
+    def test_captcha_requires_browser(self):
+        self.stub.captcha_rate = 1.0
+        with self.assertRaises(BrowserRequired):
+            self.client.search(0, '111.111.111-11')
+
+    def test_http_error_requires_browser(self):
+        self.stub.error_rate = 1.0
+        with self.assertRaises(BrowserRequired):
+            self.client.search(0, '111.111.111-11')
+
+
+class TestAsyncEsajHttpClient(unittest.TestCase):
+
+    def setUp(self):
+        self.stub = EsajStub(latency=0.05, results={
+            '111.111.111-11': 'nada_consta',
+            '222.222.222-22': 'criminal',
+        }).start()
+
+    def tearDown(self):
+        self.stub.stop()
+
+    def test_concurrent_searches_share_keep_alive_connections(self):
+        async def scenario():
+            client = AsyncEsajHttpClient(base_url=self.stub.base_url, pool_size=5, timeout=5)
+            try:
+                documents = ['111.111.111-11', '222.222.222-22'] * 10
+                pages = await asyncio.gather(*(client.search(0, doc) for doc in documents))
+                connections = client.client.http.connection_from_url(self.stub.base_url).num_connections
+                return pages, connections
+            finally:
+                await client.close()
+
+        pages, connections = asyncio.run(scenario())
+        self.assertIn(Config.NADA_CONSTA, pages[0])
+        self.assertIn('Criminal', pages[1])
+        self.assertEqual(self.stub.requests, 20)
+        self.assertLessEqual(connections, 5)
+
+    def test_captcha_requires_browser(self):
+        self.stub.captcha_rate = 1.0
+
+        async def scenario():
+            client = AsyncEsajHttpClient(base_url=self.stub.base_url, pool_size=1, timeout=5)
+            try:
+                await client.search(0, '111.111.111-11')
+            finally:
+                await client.close()
+
+        with self.assertRaises(BrowserRequired):
+            asyncio.run(scenario())
+
+
+class TestEngineSelection(unittest.TestCase):
+
+    def test_search_fields(self):
+        self.assertEqual(search_field(0), 'DOCPARTE')
+        self.assertEqual(search_field(1), 'DOCPARTE')
+        self.assertEqual(search_field(2), 'NMPARTE')
+        self.assertEqual(search_field(3), 'DOCPARTE')
+
+    @patch.object(Config, 'ESAJ_ENGINE_DOCPARTE', 'http')
+    @patch.object(Config, 'ESAJ_ENGINE_NMPARTE', 'selenium')
+    def test_engine_is_selected_per_search_field(self):
+        self.assertEqual(engine_for(0), 'http')
+        self.assertEqual(engine_for(3), 'http')
+        self.assertEqual(engine_for(2), 'selenium')
+
+
+class TestBlockDetection(unittest.TestCase):
+
+    def test_rendered_challenge_is_blocked(self):
+        page = '<html><body><div class="g-recaptcha" data-sitekey="x"></div></body></html>'
+        self.assertTrue(is_blocked(page))
+        self.assertTrue(is_blocked("<div id='h-captcha'></div>"))
+        with self.assertRaises(SiteBlocked):
+            check_page(200, page)
+
+    def test_results_page_loading_recaptcha_script_is_not_blocked(self):
+        page = (
+            '<html><head>'
+            '<script src="https://www.google.com/recaptcha/api.js?render=explicit"></script>'
+            '<script>var captchaHabilitado = false; grecaptcha.ready(function () {});</script>'
+            '<style>.g-recaptcha { display: none; }</style>'
+            f'</head><body><span>{Config.NADA_CONSTA}</span></body></html>'
+        )
+        self.assertFalse(is_blocked(page))
+        self.assertEqual(check_page(200, page), page)
+
+
+if __name__ == '__main__':
+    unittest.main()
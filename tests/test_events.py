@@ -0,0 +1,84 @@
+import unittest
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.events import EventLog, DROPPED
+
+
+class BlockingStream(io.StringIO):
+    """Stream cuja escrita fica presa até `release`, simulando um destino lento."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.release.wait(5)
+        return super().write(text)
+
+
+class TestEventLog(unittest.TestCase):
+
+    def read(self, stream):
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    def test_json_lines_carry_context(self):
+        stream = io.StringIO()
+        log = EventLog(stream=stream, level='info')
+        with log.context(cod_pesquisa=[10, 11], filtro=0, worker=2):
+            log.info('consulta', "Consulta concluída.", resultado=1, duracao_s=0.25)
+        log.info('ciclo', pesquisas=2)
+        log.close()
+
+        first, second = self.read(stream)
+        self.assertEqual(first['event'], 'consulta')
+        self.assertEqual(first['msg'], "Consulta concluída.")
+        self.assertEqual((first['cod_pesquisa'], first['filtro'], first['worker']), ([10, 11], 0, 2))
+        self.assertEqual((first['resultado'], first['duracao_s']), (1, 0.25))
+        self.assertIn('ts', first)
+        self.assertNotIn('cod_pesquisa', second)
+
+    def test_level_and_sampling(self):
+        stream = io.StringIO()
+        log = EventLog(stream=stream, level='info')
+        log.debug('detalhe')
+        for _ in range(20):
+            log.info('consulta', sample=0)
+        log.info('consulta', sample=1)
+        log.close()
+
+        events = self.read(stream)
+        self.assertEqual([event['event'] for event in events], ['consulta'])
+        self.assertEqual(events[0]['amostra'], 1)
+
+    def test_full_queue_drops_without_blocking(self):
+        stream = BlockingStream()
+        log = EventLog(stream=stream, level='info', queue_size=2, batch_size=1)
+        dropped = DROPPED.value()
+
+        started = time.monotonic()
+        for i in range(20):
+            log.info('consulta', n=i)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertGreater(DROPPED.value(), dropped)
+
+        stream.release.set()
+        log.close()
+        self.assertLess(len(self.read(stream)), 20)
+
+    def test_events_after_close_are_written(self):
+        stream = io.StringIO()
+        log = EventLog(stream=stream, level='info')
+        log.close()
+        log.error('erro_fatal', erro='x')
+        self.assertEqual(self.read(stream)[0]['erro'], 'x')
+
+
+if __name__ == '__main__':
+    unittest.main()
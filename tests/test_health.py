@@ -0,0 +1,122 @@
+import unittest
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import Database
+from app.health import Health
+from app.metrics import MetricsServer
+
+
+class TestHealth(unittest.TestCase):
+
+    def test_not_ready_until_warm_up_finishes(self):
+        health = Health(cache_seconds=0)
+        health.set_phase('aquecimento')
+
+        self.assertEqual(health.liveness()[0], 200)
+        self.assertEqual(health.readiness(), (503, {'ready': False, 'phase': 'aquecimento'}))
+
+        health.set_ready()
+        self.assertEqual(health.readiness()[0], 200)
+
+    def test_failing_check_makes_readiness_fail(self):
+        health = Health(cache_seconds=0)
+        check = MagicMock()
+        health.add_check('database', check)
+        health.set_ready()
+        self.assertEqual(health.readiness()[1]['checks'], {'database': 'ok'})
+
+        check.side_effect = Exception("timeout")
+        status, body = health.readiness()
+        self.assertEqual((status, body['ready'], body['checks']), (503, False, {'database': 'timeout'}))
+
+    def test_check_results_are_cached(self):
+        health = Health(cache_seconds=60)
+        check = MagicMock()
+        health.add_check('database', check)
+        health.set_ready()
+
+        for _ in range(3):
+            health.readiness()
+        self.assertEqual(check.call_count, 1)
+
+    def test_http_probes(self):
+        health = Health(cache_seconds=0)
+        with patch('app.metrics.health', health):
+            server = MetricsServer(port=0, host='127.0.0.1').start()
+            self.addCleanup(server.stop)
+            url = f"http://127.0.0.1:{server.port}"
+
+            with urllib.request.urlopen(f"{url}/healthz") as response:
+                self.assertEqual(json.loads(response.read())['status'], 'ok')
+            with self.assertRaises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(f"{url}/readyz")
+            self.assertEqual(error.exception.code, 503)
+
+            health.set_ready()
+            with urllib.request.urlopen(f"{url}/readyz") as response:
+                self.assertTrue(json.loads(response.read())['ready'])
+
+
+def fake_connection(**kwargs):
+    connection = MagicMock(closed=0)
+    connection.get_transaction_status.return_value = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    return connection
+
+
+class TestLazyDatabase(unittest.TestCase):
+
+    def test_lazy_pool_connects_on_warm_up(self):
+        with patch('app.database.psycopg2.connect', side_effect=fake_connection) as connect:
+            database = Database(pool_size=3, lazy=True)
+            self.assertEqual(connect.call_count, 0)
+
+            self.assertEqual(database.warm_up(), 3)
+            self.assertEqual(connect.call_count, 3)
+            # As conexões aquecidas atendem o uso sem abrir novas
+            database.ping(timeout=1)
+            self.assertEqual(connect.call_count, 3)
+            self.assertEqual(database.warm_up(), 0)
+
+    def test_ping_is_bounded_by_its_timeout(self):
+        connections = []
+
+        def connect(**kwargs):
+            connections.append(fake_connection())
+            return connections[-1]
+
+        with patch('app.database.psycopg2.connect', side_effect=connect) as connect_mock:
+            database = Database(pool_size=1, lazy=True)
+            database.ping(timeout=2.5)
+        self.assertEqual(connect_mock.call_args.kwargs['connect_timeout'], 2)
+        cursor = connections[0].cursor.return_value.__enter__.return_value
+        self.assertEqual(cursor.execute.call_args_list[0].args, ("SET LOCAL statement_timeout = %s", (2500,)))
+
+        with patch('app.database.psycopg2.connect', side_effect=psycopg2.OperationalError("sem rota")) as connect_mock, \
+                patch('app.database.time.sleep') as sleep:
+            with self.assertRaises(psycopg2.OperationalError):
+                Database(pool_size=1, lazy=True).ping(timeout=0.2)
+        # Uma única tentativa, com o menor connect_timeout aceito
+        self.assertEqual(connect_mock.call_count, 1)
+        self.assertEqual(connect_mock.call_args.kwargs['connect_timeout'], 1)
+        sleep.assert_not_called()
+
+    def test_warm_up_fails_when_no_connection_opens(self):
+        with patch('app.database.psycopg2.connect', side_effect=psycopg2.OperationalError("recusada")), \
+                patch('app.database.time.sleep'):
+            database = Database(pool_size=2, lazy=True)
+            with self.assertRaises(psycopg2.OperationalError):
+                database.warm_up()
+            self.assertEqual(database._opened, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import os
+import sys
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.metrics import Counter, Histogram, Registry, MetricsServer, registry, RESULTS, error_ratio
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_counter_exposition(self):
+        counter = Counter('spv_test_total', 'Teste.')
+        counter.inc(filtro=0, resultado=1)
+        counter.inc(2, filtro=0, resultado=1)
+        counter.inc(filtro=2, resultado=7)
+
+        self.assertEqual(counter.value(resultado=1, filtro=0), 3)
+        lines = counter.expose()
+        self.assertEqual(lines[1], '# TYPE spv_test_total counter')
+        self.assertIn('spv_test_total{filtro="0",resultado="1"} 3', lines)
+        self.assertIn('spv_test_total{filtro="2",resultado="7"} 1', lines)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('spv_test_seconds', 'Teste.', buckets=(0.1, 1))
+        histogram.observe(0.05, stage='a')
+        histogram.observe(0.5, stage='a')
+        histogram.observe(5, stage='a')
+
+        lines = histogram.expose()
+        self.assertIn('spv_test_seconds_bucket{stage="a",le="0.1"} 1', lines)
+        self.assertIn('spv_test_seconds_bucket{stage="a",le="1.0"} 2', lines)
+        self.assertIn('spv_test_seconds_bucket{stage="a",le="+Inf"} 3', lines)
+        self.assertIn('spv_test_seconds_sum{stage="a"} 5.55', lines)
+        self.assertIn('spv_test_seconds_count{stage="a"} 3', lines)
+
+    def test_histogram_quantile_interpolates_within_bucket(self):
+        histogram = Histogram('spv_test_seconds', 'Teste.', buckets=(1, 2, 4))
+        self.assertIsNone(histogram.quantile(0.5))
+        for value in (0.5, 1.5, 1.5, 3):
+            histogram.observe(value)
+        self.assertAlmostEqual(histogram.quantile(0.5), 1.5)
+        self.assertAlmostEqual(histogram.quantile(1.0), 4)
+        histogram.observe(100)
+        self.assertEqual(histogram.quantile(0.99), 4)
+
+    def test_histogram_times_failing_block(self):
+        histogram = Histogram('spv_test_seconds', 'Teste.')
+        with self.assertRaises(ValueError):
+            with histogram.time(stage='falha'):
+                raise ValueError
+        self.assertEqual(histogram.count(stage='falha'), 1)
+
+    def test_gauge_errors_do_not_break_exposition(self):
+        reg = Registry()
+        reg.gauge('spv_ok', 'Ok.', lambda: 4)
+        reg.gauge('spv_falha', 'Falha.', lambda: 1 / 0)
+        with patch('app.events.events.error') as error:
+            text = reg.expose()
+        self.assertIn('spv_ok 4\n', text)
+        self.assertIn('# TYPE spv_falha gauge', text)
+        error.assert_called_once()
+        self.assertEqual((error.call_args.args[0], error.call_args.kwargs['metrica']), ('metrica_erro', 'spv_falha'))
+
+    def test_error_ratio_per_filter(self):
+        RESULTS.reset()
+        self.addCleanup(RESULTS.reset)
+        RESULTS.inc(3, filtro=1, resultado=1)
+        RESULTS.inc(filtro=1, resultado=7)
+        self.assertEqual(error_ratio(), {(('filtro', '1'),): 0.25})
+
+    def test_http_endpoint(self):
+        server = MetricsServer(port=0, host='127.0.0.1').start()
+        self.addCleanup(server.stop)
+        registry.counter('spv_http_test_total', 'Teste.').inc()
+
+        url = f"http://127.0.0.1:{server.port}"
+        with urllib.request.urlopen(f"{url}/metrics") as response:
+            self.assertTrue(response.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+            self.assertIn('spv_http_test_total 1', response.read().decode())
+        with self.assertRaises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/outro")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import unittest
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.classifier import classify
+from app.esaj_http import EsajHttpClient
+from app.names import NameSearch, normalize_name, pessoa
+from app.planner import plan
+from esaj_stub import EsajStub, NADA_CONSTA_PAGE, process_list_page
+
+QUERY = 'cbPesquisa=NMPARTE&amp;dadosConsulta.valorConsulta=JOAO+DA+SILVA'
+
+
+def pages(kind, count, **kwargs):
+    total = (count + 24) // 25
+    return {
+        n: process_list_page(kind, count, page=n, query=QUERY, **kwargs)
+        for n in range(1, total + 1)
+    }
+
+
+def read(search, by_number):
+    """Alimenta `search` como o robô: página 1 e depois os links retornados."""
+    href = search.feed(by_number[1])
+    while href:
+        number = int(href.split('paginaConsulta=')[1].split('&')[0])
+        href = search.feed(by_number[number])
+    return search.classificacao()
+
+
+class TestNormalizeName(unittest.TestCase):
+
+    def test_variants_share_canonical_form(self):
+        variants = ['João da Silva', 'JOAO  DA SILVA ', 'joão da silva', 'Joao-da-Silva', 'JOÃO DA SILVA.']
+        self.assertEqual({normalize_name(v) for v in variants}, {'JOAO DA SILVA'})
+
+    def test_apostrophes_and_empty(self):
+        self.assertEqual(normalize_name("Ana D'Ávila"), 'ANA DAVILA')
+        self.assertEqual(normalize_name(None), '')
+        self.assertEqual(normalize_name(' .- '), '')
+
+    def test_planner_merges_name_variants(self):
+        def document_for(dados, search_filter):
+            return dados[4]
+
+        rows = [
+            (100, 1, 'SP', None, 'José Santos', None, None, datetime.date(1975, 11, 10), 'Paula Santos', None, None, None, [2]),
+            (100, 2, 'SP', None, 'JOSE  SANTOS', None, None, None, 'Paula  Santos', None, None, None, [2]),
+            (100, 3, 'SP', None, '  ...  ', None, None, None, None, None, None, None, [2]),
+        ]
+        consultas, sem_documento = plan(rows, document_for)
+
+        self.assertEqual(sem_documento, [(3, 2)])
+        self.assertEqual(len(consultas), 1)
+        self.assertEqual(consultas[0].document, 'JOSE SANTOS')
+        self.assertEqual(consultas[0].targets, [(1, 2), (2, 2)])
+        self.assertEqual(consultas[0].pessoas[0], pessoa('Paula Santos', datetime.date(1975, 11, 10)))
+
+
+class TestNameSearch(unittest.TestCase):
+
+    def test_nada_consta_reads_one_page(self):
+        search = NameSearch('Joao da Silva')
+        self.assertIsNone(search.feed(NADA_CONSTA_PAGE))
+        self.assertEqual((search.classificacao().result, search.stop), (1, 'decidido'))
+
+    def test_criminal_stops_on_first_page(self):
+        search = NameSearch('Joao da Silva')
+        classificacao = read(search, pages('criminal', 80, parte='JOAO DA SILVA'))
+
+        self.assertEqual(classificacao.result, 2)
+        self.assertEqual((len(search.pages), search.stop), (1, 'decidido'))
+
+    def test_civel_reads_until_last_page(self):
+        search = NameSearch('Joao da Silva')
+        classificacao = read(search, pages('civel', 60, parte='JOAO DA SILVA'))
+
+        self.assertEqual(classificacao.result, 5)
+        self.assertEqual(len(classificacao.processos), 60)
+        self.assertEqual((len(search.pages), search.stop), (3, 'ultima'))
+
+    def test_stops_when_criminal_process_appears(self):
+        kinds = ['civel'] * 30 + ['criminal'] + ['civel'] * 40
+        search = NameSearch('Joao da Silva')
+        classificacao = read(search, pages('civel', 71, parte='JOAO DA SILVA', kinds=kinds))
+
+        self.assertEqual(classificacao.result, 2)
+        self.assertEqual(len(search.pages), 2)
+
+    def test_page_limit(self):
+        search = NameSearch('Joao da Silva', max_pages=2)
+        read(search, pages('civel', 100, parte='JOAO DA SILVA'))
+        self.assertEqual((len(search.pages), search.stop), (2, 'limite'))
+
+    def test_homonyms_are_discarded(self):
+        nascimento = datetime.date(1980, 1, 15)
+        homonimo = ('JOAO DA SILVA', 'TEREZA SOUZA', '02/03/1970')
+        search = NameSearch('Joao da Silva', [pessoa('Maria Silva', nascimento)])
+        classificacao = read(search, pages('criminal', 30, parte=homonimo))
+
+        self.assertEqual(classificacao.result, 1)
+        self.assertEqual((search.homonimos, len(search.pages)), (30, 2))
+
+        search = NameSearch('Joao da Silva', [pessoa('Maria Silva', nascimento)])
+        parte = lambda i: homonimo if i < 10 else ('JOÃO DA SILVA', 'Maria  Silva', '15/01/1980')
+        self.assertEqual(read(search, pages('civel', 30, parte=parte)).result, 5)
+        self.assertEqual((search.homonimos, len(search.processos)), (10, 20))
+
+    def test_namesakes_are_classified_with_their_own_person(self):
+        maria = pessoa('Maria Silva', datetime.date(1980, 1, 15))
+        tereza = pessoa('Tereza Souza', None)
+        kinds = ['civel'] * 30 + ['criminal'] + ['civel'] * 9
+        parte = lambda i: ('JOAO DA SILVA', 'TEREZA SOUZA', None) if i == 30 else ('JOAO DA SILVA', 'MARIA SILVA', '15/01/1980')
+        search = NameSearch('Joao da Silva', [maria, tereza, maria])
+        read(search, pages('civel', 40, parte=parte, kinds=kinds))
+
+        self.assertEqual(len(search.pages), 2)
+        self.assertEqual(search.classificacao(maria).result, 5)
+        self.assertEqual(len(search.classificacao(maria).processos), 39)
+        self.assertEqual(search.classificacao(tereza).result, 2)
+        self.assertEqual([p.area for p in search.classificacao(tereza).processos], ['Criminal'])
+
+        for p in (maria, tereza):
+            reclassified = classify(search.capture(p))
+            self.assertEqual(reclassified.result, search.classificacao(p).result)
+            self.assertEqual(reclassified.processos, search.classificacao(p).processos)
+
+    def test_reading_stops_when_every_person_is_decided(self):
+        maria = pessoa('Maria Silva', None)
+        tereza = pessoa('Tereza Souza', None)
+        parte = lambda i: ('JOAO DA SILVA', 'MARIA SILVA' if i % 2 else 'TEREZA SOUZA', None)
+        search = NameSearch('Joao da Silva', [maria, tereza])
+        read(search, pages('criminal', 80, parte=parte))
+
+        self.assertEqual((len(search.pages), search.stop), (1, 'decidido'))
+        self.assertEqual({search.classificacao(p).result for p in (maria, tereza)}, {2})
+
+    def test_capture_reclassifies_like_the_lookup(self):
+        homonimo = ('JOAO DA SILVA', 'TEREZA SOUZA', None)
+        search = NameSearch('Joao da Silva', [pessoa('Maria Silva', None)])
+        expected = read(search, pages('criminal', 30, parte=homonimo))
+
+        reclassified = classify(search.capture())
+        self.assertEqual(reclassified.result, expected.result)
+        self.assertEqual(reclassified.processos, expected.processos)
+
+
+class TestNameSearchHttp(unittest.TestCase):
+
+    def test_follows_pagination_links(self):
+        with EsajStub(mix={'civel': 1.0}, name_processes=60) as stub:
+            client = EsajHttpClient(base_url=stub.base_url, pool_size=2, timeout=5)
+            try:
+                search = NameSearch('JOAO DA SILVA')
+                href = search.feed(client.search(2, 'JOAO DA SILVA'))
+                while href:
+                    href = search.feed(client.get_page(href))
+            finally:
+                client.close()
+
+        self.assertEqual(stub.requests, 3)
+        self.assertEqual(search.classificacao().result, 5)
+        self.assertEqual(len(search.processos), 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import asyncio
+import os
+import socket
+import sys
+import threading
+from collections import namedtuple
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import psycopg2
+
+from app.config import Config
+from app.notifier import PesquisaListener, SweepSchedule
+
+Notify = namedtuple('Notify', 'channel payload')
+
+
+class FakeConnection:
+    """Conexão cujo socket recebe uma linha por notificação enviada por `send`."""
+
+    def __init__(self):
+        self.sock, self.peer = socket.socketpair()
+        self.sock.setblocking(False)
+        self.notifies = []
+        self.closed = False
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def cursor(self):
+        return MagicMock()
+
+    def poll(self):
+        try:
+            data = self.sock.recv(4096)
+        except BlockingIOError:
+            return
+        if not data:
+            raise psycopg2.OperationalError("server closed the connection")
+        self.notifies.extend(Notify('pesquisa_pendente', p) for p in data.decode().split())
+
+    def send(self, *payloads):
+        self.peer.send(''.join(f"{p}\n" for p in payloads).encode())
+
+    def close(self):
+        self.closed = True
+        self.sock.close()
+        self.peer.close()
+
+
+class TestPesquisaListener(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = FakeConnection()
+        self.database = MagicMock()
+        self.database.dedicated_connection.return_value = self.connection
+        self.listener = PesquisaListener(self.database, debounce=0.05)
+        self.assertTrue(self.listener.start())
+
+    def tearDown(self):
+        self.listener.close()
+
+    def test_wait_times_out_without_notifications(self):
+        self.assertEqual(self.listener.wait(0.05), set())
+
+    def test_wait_collects_burst(self):
+        self.connection.send(1, 2)
+        threading.Timer(0.02, self.connection.send, args=(3, 'x')).start()
+        self.assertEqual(self.listener.wait(1), {1, 2, 3})
+
+    def test_lost_connection_requests_sweep(self):
+        self.connection.peer.close()
+        self.assertIsNone(self.listener.wait(1))
+        self.assertIsNone(self.listener.connection)
+
+    def test_wait_async(self):
+        async def scenario():
+            asyncio.get_running_loop().call_later(0.02, self.connection.send, 7)
+            return await self.listener.wait_async(1)
+
+        self.assertEqual(asyncio.run(scenario()), {7})
+
+
+class TestSweepSchedule(unittest.TestCase):
+
+    def test_first_sweep_is_immediate(self):
+        schedule = SweepSchedule(interval=60, max_ids=10)
+        self.assertTrue(schedule.sweep_due())
+        schedule.swept()
+        self.assertFalse(schedule.sweep_due())
+        self.assertGreater(schedule.timeout(), 59)
+
+    def test_lost_or_large_notifications_bring_sweep_forward(self):
+        schedule = SweepSchedule(interval=60, max_ids=2)
+        schedule.swept()
+
+        self.assertEqual(schedule.notified({1, 2}), {1, 2})
+        self.assertFalse(schedule.sweep_due())
+        self.assertIsNone(schedule.notified({1, 2, 3}))
+        self.assertTrue(schedule.sweep_due())
+
+        schedule.swept()
+        self.assertIsNone(schedule.notified(None))
+        self.assertTrue(schedule.sweep_due())
+
+    def test_retry_cycles_that_claim_nothing_back_off(self):
+        schedule = SweepSchedule(interval=60, max_ids=10)
+        self.assertEqual(schedule.retry_timeout(0), 1.0)
+
+        # Retentativa vencida, mas travada por outra réplica: nada reservado
+        waits = []
+        for _ in range(8):
+            schedule.retried(0)
+            waits.append(schedule.retry_timeout(0))
+        self.assertEqual(waits[:4], [1.0, 2.0, 4.0, 8.0])
+        self.assertEqual(waits[-1], Config.RETRY_BASE_SECONDS)
+
+        schedule.retried(3)
+        self.assertEqual(schedule.retry_timeout(0), 1.0)
+        self.assertEqual(schedule.retry_timeout(12.5), 12.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import Config
+from app import page_archive
+from app.page_archive import archive, decompress, default_codec
+
+
+class TestPageArchive(unittest.TestCase):
+
+    PAGE = "<html><body>Não existem informações disponíveis para os parâmetros informados.</body></html>" * 20
+
+    def test_gzip_round_trip(self):
+        pagina = archive(self.PAGE, codec='gzip')
+        self.assertEqual(pagina.codec, 'gzip')
+        self.assertEqual(pagina.tamanho, len(self.PAGE.encode('utf-8')))
+        self.assertLess(len(pagina.conteudo), pagina.tamanho)
+        self.assertEqual(decompress(memoryview(pagina.conteudo), 'gzip'), self.PAGE)
+
+    def test_same_page_same_hash(self):
+        self.assertEqual(archive(self.PAGE, codec='gzip').hash, archive(self.PAGE, codec='gzip').hash)
+        self.assertEqual(archive(self.PAGE, codec='gzip').conteudo, archive(self.PAGE, codec='gzip').conteudo)
+        self.assertNotEqual(archive(self.PAGE, codec='gzip').hash, archive(self.PAGE + ' ', codec='gzip').hash)
+
+    @patch.object(page_archive, 'zstandard', None)
+    def test_auto_falls_back_to_gzip_without_zstandard(self):
+        with patch.object(Config, 'PAGE_ARCHIVE_CODEC', 'auto'):
+            self.assertEqual(default_codec(), 'gzip')
+        with patch.object(Config, 'PAGE_ARCHIVE_CODEC', 'zstd'):
+            with self.assertRaises(ValueError):
+                default_codec()
+
+    @unittest.skipIf(page_archive.zstandard is None, "zstandard não instalado")
+    def test_zstd_round_trip(self):
+        pagina = archive(self.PAGE, codec='zstd')
+        self.assertEqual(decompress(pagina.conteudo, 'zstd'), self.PAGE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.planner import plan
+
+
+def document_for(dados, search_filter):
+    nome, cpf, rg = dados[4], dados[5], dados[6]
+    if search_filter == 0:
+        return cpf
+    if search_filter in (1, 3):
+        return rg
+    return nome
+
+
+def pesquisa(cod, nome, cpf, rg, filtros):
+    return (100, cod, 'SP', None, nome, cpf, rg, None, None, None, None, None, filtros)
+
+
+class TestPlanner(unittest.TestCase):
+
+    def test_rg_filters_share_one_lookup(self):
+        consultas, sem_documento = plan([pesquisa(1, 'Ana', '111', '22.333', [0, 1, 2, 3])], document_for)
+
+        self.assertEqual(sem_documento, [])
+        self.assertEqual(len(consultas), 3)
+        por_chave = {c.key: c.targets for c in consultas}
+        self.assertEqual(por_chave[('DOCPARTE', '22333')], [(1, 1), (1, 3)])
+        self.assertEqual(por_chave[('NMPARTE', 'ANA')], [(1, 2)])
+
+    def test_same_document_across_pesquisas(self):
+        rows = [
+            pesquisa(1, 'José', '111.111.111-11', None, [0, 2]),
+            pesquisa(2, 'JOSE', '11111111111', None, [0, 2]),
+        ]
+        consultas, _ = plan(rows, document_for)
+
+        self.assertEqual(len(consultas), 2)
+        for consulta in consultas:
+            self.assertEqual([cod for cod, _ in consulta.targets], [1, 2])
+
+    def test_missing_document(self):
+        consultas, sem_documento = plan([pesquisa(1, None, '111', None, [0, 2])], document_for)
+
+        self.assertEqual(len(consultas), 1)
+        self.assertEqual(sem_documento, [(1, 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import os
+import sys
+import time
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
+
+from app.readiness import LatencyTracker, percentile, wait_for_result
+
+
+class FakeDriver:
+    """Driver que passa a exibir `marker` depois de `delay` segundos."""
+
+    def __init__(self, marker, delay):
+        self.marker = marker
+        self.ready_at = time.monotonic() + delay
+
+    def find_element(self, by, value):
+        if self.marker == value and time.monotonic() >= self.ready_at:
+            return MagicMock()
+        raise NoSuchElementException(value)
+
+
+def stale_element():
+    element = MagicMock()
+    element.is_enabled.side_effect = StaleElementReferenceException()
+    return element
+
+
+class TestLatencyTracker(unittest.TestCase):
+
+    def test_percentile(self):
+        self.assertEqual(percentile([5, 1, 3, 2, 4], 50), 3)
+        self.assertEqual(percentile(range(1, 101), 95), 95)
+        self.assertIsNone(percentile([], 95))
+
+    def test_timeout_follows_percentile(self):
+        tracker = LatencyTracker(window=100, pct=95, factor=2, minimum=1, maximum=30, min_samples=10)
+        self.assertEqual(tracker.timeout('DOCPARTE'), 30)
+
+        for _ in range(20):
+            tracker.record('DOCPARTE', 2.0)
+        self.assertEqual(tracker.timeout('DOCPARTE'), 4.0)
+        self.assertEqual(tracker.timeout('NMPARTE'), 30)
+
+        for _ in range(20):
+            tracker.record('DOCPARTE', 0.1)
+        self.assertEqual(tracker.timeout('DOCPARTE'), 4.0)
+
+    def test_timeout_is_bounded(self):
+        tracker = LatencyTracker(window=10, pct=95, factor=3, minimum=5, maximum=30, min_samples=1)
+        tracker.record('DOCPARTE', 0.2)
+        self.assertEqual(tracker.timeout('DOCPARTE'), 5)
+        tracker.record('DOCPARTE', 60, timed_out=True)
+        self.assertEqual(tracker.timeout('DOCPARTE'), 30)
+        self.assertEqual(tracker.stats()['DOCPARTE']['timeouts'], 1)
+
+
+class TestWaitForResult(unittest.TestCase):
+
+    def test_returns_when_marker_appears(self):
+        tracker = LatencyTracker(min_samples=1, maximum=5)
+        started = time.monotonic()
+        wait_for_result(FakeDriver('listagemDeProcessos', 0.2), stale_element(), tracker, 'DOCPARTE')
+
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(tracker.stats()['DOCPARTE']['samples'], 1)
+
+    def test_waits_for_previous_page_to_go_away(self):
+        tracker = LatencyTracker(min_samples=100, maximum=0.5)
+        previous = MagicMock()
+
+        with self.assertRaises(TimeoutException):
+            wait_for_result(FakeDriver('mensagemRetorno', 0), previous, tracker, 'NMPARTE')
+        self.assertEqual(tracker.stats()['NMPARTE']['timeouts'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
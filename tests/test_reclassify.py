@@ -0,0 +1,60 @@
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from esaj_stub import NADA_CONSTA_PAGE, process_list_page
+
+from app.page_archive import archive
+from app.reclassify import Reclassifier, classify_pages, UPDATE_SQL, PREVIEW_SQL, CLEAR_PROCESSES_SQL
+
+
+class TestReclassify(unittest.TestCase):
+
+    def setUp(self):
+        self.nada = archive(NADA_CONSTA_PAGE, codec='gzip')
+        self.criminal = archive(process_list_page('criminal', 2), codec='gzip')
+
+    def test_classify_pages(self):
+        rows = [(p.hash, p.codec, p.conteudo) for p in (self.nada, self.criminal)]
+        rows.append((b'\x00' * 32, 'gzip', b'corrompida'))
+
+        classified = classify_pages(rows)
+        self.assertEqual([(h, r) for h, r, _ in classified], [(self.nada.hash, 1), (self.criminal.hash, 2)])
+        self.assertEqual(len(classified[1][2]), 2)
+
+    def test_apply_updates_results_and_processes(self):
+        db = MagicMock()
+        db.execute_values.side_effect = [
+            [(10, 0, self.criminal.hash, 7, 2), (11, 2, self.nada.hash, 7, 1)],
+            None,
+            None,
+        ]
+        reclassifier = Reclassifier(db, processes=1, filtro=None)
+        reclassifier.apply(classify_pages([(p.hash, p.codec, p.conteudo) for p in (self.nada, self.criminal)]))
+
+        sql, values = db.execute_values.call_args_list[0][0][:2]
+        self.assertIs(sql, UPDATE_SQL)
+        self.assertEqual(values[0], (self.nada.hash, 1, None, None, False))
+        processes = db.execute_values.call_args_list[1][0][1]
+        self.assertEqual([row[:2] for row in processes], [(10, 0), (10, 0)])
+        self.assertEqual(db.execute_values.call_args_list[2][0][:2], (CLEAR_PROCESSES_SQL, [(11, 2)]))
+        self.assertEqual((reclassifier.pages, reclassifier.rows), (2, 2))
+        self.assertEqual(reclassifier.transitions[(7, 2)], 1)
+
+    def test_dry_run_only_counts(self):
+        db = MagicMock()
+        db.execute_values.return_value = [(10, 0, self.nada.hash, 7, 1)]
+        reclassifier = Reclassifier(db, processes=1, dry_run=True)
+        reclassifier.apply(classify_pages([(self.nada.hash, 'gzip', self.nada.conteudo)]))
+
+        db.execute_values.assert_called_once()
+        self.assertIs(db.execute_values.call_args[0][0], PREVIEW_SQL)
+        self.assertIn("seriam alterados", reclassifier.summary(1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
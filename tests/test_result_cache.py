@@ -0,0 +1,112 @@
+import unittest
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.result_cache import ResultCache, cache_key, normalize_document
+
+
+class TestCacheKey(unittest.TestCase):
+
+    def test_documents_are_normalized(self):
+        self.assertEqual(cache_key(0, '111.111.111-11'), ('DOCPARTE', '11111111111'))
+        self.assertEqual(cache_key(1, '12.345.678-x'), cache_key(3, '12345678X'))
+        self.assertEqual(cache_key(2, '  José  da Silva '), ('NMPARTE', 'JOSE DA SILVA'))
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_document('NMPARTE', 'João Conceição'), 'JOAO CONCEICAO')
+
+
+class TestResultCache(unittest.TestCase):
+
+    def test_miss_then_hit(self):
+        cache = ResultCache(ttl=60, max_entries=10, persistent=False)
+        loader = MagicMock(return_value=1)
+
+        self.assertEqual(cache.get_or_load(('DOCPARTE', '1'), loader), 1)
+        self.assertEqual(cache.get_or_load(('DOCPARTE', '1'), loader), 1)
+        loader.assert_called_once()
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_error_results_are_not_cached(self):
+        cache = ResultCache(ttl=60, max_entries=10, persistent=False)
+        loader = MagicMock(return_value=7)
+
+        cache.get_or_load(('DOCPARTE', '1'), loader)
+        cache.get_or_load(('DOCPARTE', '1'), loader)
+        self.assertEqual(loader.call_count, 2)
+
+    def test_entries_expire(self):
+        cache = ResultCache(ttl=0.01, max_entries=10, persistent=False)
+        cache.put(('DOCPARTE', '1'), 5)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get(('DOCPARTE', '1')))
+
+    def test_lru_eviction(self):
+        cache = ResultCache(ttl=60, max_entries=2, persistent=False)
+        cache.put(('DOCPARTE', '1'), 1)
+        cache.put(('DOCPARTE', '2'), 2)
+        cache.get(('DOCPARTE', '1'))
+        cache.put(('DOCPARTE', '3'), 5)
+
+        self.assertEqual(cache.get(('DOCPARTE', '1')), 1)
+        self.assertIsNone(cache.get(('DOCPARTE', '2')))
+        self.assertEqual(cache.get(('DOCPARTE', '3')), 5)
+
+    def test_concurrent_loads_are_coalesced(self):
+        cache = ResultCache(ttl=60, max_entries=10, persistent=False)
+        release = threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            release.wait(1)
+            return 2
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_load(('DOCPARTE', 'X'), loader)))
+                   for _ in range(5)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        release.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [2] * 5)
+
+    def test_namesakes_with_different_mothers_do_not_share_results(self):
+        mock_db = MagicMock()
+        cache = ResultCache(mock_db, ttl=60, max_entries=10, persistent=True)
+        # Mesmo nome, mães diferentes: a primeira tem processo criminal, a segunda não
+        key_reu = cache_key(2, 'José da Silva')
+        key_homonimo = cache_key(2, 'JOSE DA SILVA')
+        self.assertEqual(key_reu, key_homonimo)
+
+        self.assertEqual(cache.get_or_load(key_reu, MagicMock(return_value=2)), 2)
+        self.assertEqual(cache.get_or_load(key_homonimo, MagicMock(return_value=1)), 1)
+        cache.put(key_reu, 2)
+        self.assertIsNone(cache.get(key_homonimo))
+        mock_db.fetchall.assert_not_called()
+        mock_db.execute.assert_not_called()
+
+    def test_persistent_tier(self):
+        mock_db = MagicMock()
+        mock_db.fetchall.return_value = [(5, 100.0)]
+        cache = ResultCache(mock_db, ttl=60, max_entries=10, persistent=True)
+
+        self.assertEqual(cache.get(('DOCPARTE', '1')), 5)
+        self.assertEqual(cache.get(('DOCPARTE', '1')), 5)
+        mock_db.fetchall.assert_called_once()
+
+        cache.put(('DOCPARTE', '2'), 1)
+        self.assertIn('ON CONFLICT (Tipo_Consulta, Documento)', mock_db.execute.call_args[0][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
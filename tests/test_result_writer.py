@@ -0,0 +1,114 @@
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.result_writer import ResultWriter
+
+
+class TestResultWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_db = MagicMock()
+        self.writer = ResultWriter(self.mock_db, batch_size=3, flush_interval=60)
+
+    def tearDown(self):
+        self.writer.close()
+
+    def test_flushes_when_batch_is_full(self):
+        self.writer.add(1, 1, 0)
+        self.writer.add(2, 5, 0)
+        self.mock_db.execute_values.assert_not_called()
+
+        self.writer.add(3, 2, 0)
+        self.mock_db.execute_values.assert_called_once()
+        rows = self.mock_db.execute_values.call_args[0][1]
+        self.assertEqual(sorted(row[0] for row in rows), [1, 2, 3])
+        self.assertEqual(rows[0], (1, 1, 36, None, 1, -1, 0, 1, None, None, None, None))
+        self.assertEqual(self.writer.pending(), 0)
+
+    def test_same_key_keeps_latest_result(self):
+        self.writer.add(1, 7, 2)
+        self.writer.add(1, 1, 2)
+        self.writer.flush()
+
+        rows = self.mock_db.execute_values.call_args[0][1]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][4], 1)
+
+    def test_failed_flush_keeps_results_for_retry(self):
+        self.mock_db.execute_values.side_effect = [Exception("conexão perdida"), None]
+        self.writer.add(1, 1, 0)
+
+        self.assertEqual(self.writer.flush(), 0)
+        self.assertEqual(self.writer.pending(), 1)
+
+        self.assertEqual(self.writer.flush(), 1)
+        self.assertEqual(self.writer.pending(), 0)
+
+    def test_close_flushes_pending_results(self):
+        self.writer.add(1, 1, 0)
+        self.writer.close()
+        self.mock_db.execute_values.assert_called_once()
+
+    def test_processes_are_written_with_results(self):
+        processo = ('0001-12.2020.8.26.0050', 'Ação Penal', 'Furto', 'Foro Criminal', 'Criminal', None)
+        self.writer.add(1, 2, 0, [processo])
+        self.writer.add(2, 1, 0)
+        self.writer.flush()
+
+        self.assertEqual(self.mock_db.execute_values.call_count, 2)
+        sql, rows = self.mock_db.execute_values.call_args[0][:2]
+        self.assertIs(sql, ResultWriter.PROCESS_SQL)
+        self.assertEqual(rows, [(1, 0) + processo])
+
+    def test_failed_process_flush_keeps_only_processes(self):
+        self.mock_db.execute_values.side_effect = [None, Exception("conexão perdida"), None]
+        self.writer.add(1, 2, 0, [('0001', 'Ação Penal', None, None, 'Criminal', None)])
+
+        self.assertEqual(self.writer.flush(), 0)
+        self.assertEqual(self.writer.pending(), 0)
+
+        self.writer.flush()
+        self.assertIs(self.mock_db.execute_values.call_args[0][0], ResultWriter.PROCESS_SQL)
+
+    def test_upsert_uses_unique_key(self):
+        self.assertIn("ON CONFLICT (Cod_Pesquisa, Cod_SPV, Filtro)", ResultWriter.SQL)
+
+    def test_retry_reschedules_failed_lookups(self):
+        self.mock_db.execute_values.return_value = [(1, 0, False), (2, 0, True)]
+        self.writer.retry(1, 0, "sem conteúdo")
+        self.writer.retry(2, 0, TimeoutError("timeout"))
+        self.assertEqual(self.writer.pending(), 2)
+        self.writer.flush()
+
+        sql, rows = self.mock_db.execute_values.call_args[0][:2]
+        self.assertIn("UPDATE pesquisa_pendente", sql)
+        self.assertIn("WHERE Esgotada", sql)
+        self.assertTrue(self.mock_db.execute_values.call_args[1]['fetch'])
+        self.assertEqual(rows[0][:3], (1, 0, "sem conteúdo"))
+        self.assertEqual(rows[1][2], "timeout")
+        self.assertEqual(self.writer.pending(), 0)
+
+    def test_result_replaces_pending_retry(self):
+        self.writer.retry(1, 0, "falha")
+        self.writer.add(1, 1, 0)
+        self.writer.flush()
+
+        self.mock_db.execute_values.assert_called_once()
+        self.assertIn("INSERT INTO pesquisa_spv", self.mock_db.execute_values.call_args[0][0])
+
+    def test_failed_retry_flush_keeps_retries(self):
+        self.mock_db.execute_values.side_effect = [Exception("conexão perdida"), []]
+        self.writer.retry(1, 2, "falha")
+
+        self.writer.flush()
+        self.assertEqual(self.writer.pending(), 1)
+        self.writer.flush()
+        self.assertEqual(self.writer.pending(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
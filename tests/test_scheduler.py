@@ -0,0 +1,35 @@
+import unittest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.scheduler import QueueWaitTracker
+
+
+class TestQueueWaitTracker(unittest.TestCase):
+
+    def test_percentiles(self):
+        tracker = QueueWaitTracker(window=1000)
+        tracker.record_many(range(1, 101))
+
+        self.assertEqual(tracker.percentiles(), {'p50': 50.0, 'p90': 90.0, 'p99': 99.0})
+        self.assertEqual(tracker.count, 100)
+
+    def test_window_keeps_recent_samples(self):
+        tracker = QueueWaitTracker(window=10)
+        tracker.record_many([1000] * 10)
+        tracker.record_many([1] * 10)
+
+        self.assertEqual(tracker.percentiles()['p99'], 1.0)
+        self.assertEqual(tracker.count, 20)
+
+    def test_summary_without_samples(self):
+        self.assertEqual(QueueWaitTracker().summary(), "Espera na fila: sem amostras.")
+        tracker = QueueWaitTracker()
+        tracker.record_many([2.5])
+        self.assertEqual(tracker.summary(), "Espera na fila: p50 2.5s, p90 2.5s, p99 2.5s")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.metrics import Histogram
+from app.profiler import SamplingProfiler
+from app.tracing import Tracer, span
+
+
+def read_trace(path):
+    # O arquivo fica sem o colchete final (formato "JSON Array" do Chrome)
+    with open(path, encoding='utf-8') as trace_file:
+        return json.loads(trace_file.read().rstrip().rstrip(',') + ']')
+
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, 'trace.json')
+
+    def test_spans_nest_inside_the_consulta(self):
+        tracer = Tracer(path=self.path, sample_rate=1, min_seconds=0)
+        histogram = Histogram('spv_test_seconds', 'Teste.')
+        with tracer.trace('pesquisa', cod_pesquisa=[7], filtro=0, worker=1):
+            with span('wait.until', alvo='cbPesquisa'):
+                time.sleep(0.01)
+            with histogram.time(stage='classify'):
+                pass
+        tracer.close()
+
+        root, wait, classify = read_trace(self.path)
+        self.assertEqual((root['name'], root['args']), ('pesquisa', {'cod_pesquisa': [7], 'filtro': 0, 'worker': 1}))
+        self.assertEqual((wait['name'], wait['args']), ('wait.until', {'alvo': 'cbPesquisa'}))
+        self.assertEqual((classify['name'], classify['cat']), ('classify', 'spv_test_seconds'))
+        for event in (wait, classify):
+            self.assertEqual((event['ph'], event['tid']), ('X', root['tid']))
+            self.assertGreaterEqual(event['ts'] + event['dur'], root['ts'])
+        self.assertGreaterEqual(wait['dur'], 10000)
+        self.assertGreaterEqual(root['dur'], wait['dur'])
+
+    def test_only_slow_consultas_are_written(self):
+        tracer = Tracer(path=self.path, sample_rate=1, min_seconds=0.02)
+        with tracer.trace('pesquisa'):
+            pass
+        with tracer.trace('pesquisa'):
+            time.sleep(0.03)
+        tracer.close()
+
+        self.assertEqual(tracer.written, 1)
+        self.assertEqual(len(read_trace(self.path)), 1)
+
+    def test_disabled_tracer_records_nothing(self):
+        tracer = Tracer(path=None)
+        with tracer.trace('pesquisa') as trace, span('driver.get'):
+            self.assertIsNone(trace)
+        tracer.close()
+        self.assertFalse(os.path.exists(self.path))
+
+        tracer.enable(self.path)
+        with tracer.trace('pesquisa') as trace:
+            self.assertIsNotNone(trace)
+        tracer.close()
+        self.assertEqual(len(read_trace(self.path)), 1)
+
+
+def busy_wait(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+
+class TestSamplingProfiler(unittest.TestCase):
+
+    def test_collapsed_stacks(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_wait, args=(stop,), name='spv-teste')
+        worker.start()
+        try:
+            profiler = SamplingProfiler(interval=1)
+            for _ in range(5):
+                profiler.sample()
+        finally:
+            stop.set()
+            worker.join()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = profiler.dump(os.path.join(directory, 'perfil.folded'))
+            with open(path, encoding='utf-8') as output:
+                lines = output.read().splitlines()
+
+        stacks = [line.rsplit(' ', 1) for line in lines]
+        worker_stacks = [stack for stack, count in stacks if stack.startswith('spv-teste;')]
+        self.assertTrue(worker_stacks)
+        self.assertTrue(all('busy_wait (test_tracing.py:' in stack for stack in worker_stacks))
+        self.assertEqual(sum(int(count) for stack, count in stacks if stack in worker_stacks), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.workers import WorkerPool
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def test_processes_all_pages_across_workers(self):
+        pages = [[1, 2, 3, 4], [5, 6], []]
+        seen = []
+        lock = threading.Lock()
+
+        def handler(item, worker_id):
+            with lock:
+                seen.append((item, worker_id))
+
+        pool = WorkerPool(handler, size=3)
+        total = pool.run(lambda: pages.pop(0))
+
+        self.assertEqual(total, 6)
+        self.assertEqual(sorted(item for item, _ in seen), [1, 2, 3, 4, 5, 6])
+        self.assertTrue(all(0 <= worker_id < 3 for _, worker_id in seen))
+        self.assertEqual(sum(pool.processed), 6)
+
+    def test_next_page_waits_for_current_page(self):
+        pages = [[1, 2], [3], []]
+        done = []
+        done_at_fetch = []
+
+        def fetch_page():
+            done_at_fetch.append(len(done))
+            return pages.pop(0)
+
+        pool = WorkerPool(lambda item, worker_id: done.append(item), size=2)
+        pool.run(fetch_page)
+        self.assertEqual(done_at_fetch, [0, 2, 3])
+
+    def test_handler_error_does_not_stop_worker(self):
+        pages = [[1, 2, 3], []]
+
+        def handler(item, worker_id):
+            if item == 2:
+                raise ValueError("falha")
+
+        pool = WorkerPool(handler, size=1)
+        self.assertEqual(pool.run(lambda: pages.pop(0)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()